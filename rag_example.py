@@ -1,8 +1,10 @@
 import asyncio
 from augmented.agent import Agent
+from augmented.agent_host import AgentHost
 from rich import print as rprint
 
 from augmented.embedding_retriever import EembeddingRetriever
+from augmented.ingestion import IngestionService
 from augmented.mcp_client import MCPClient
 from augmented.mcp_tools import PresetMcpTools
 from augmented.utils import pretty
@@ -25,60 +27,61 @@ KNOWLEDGE_BASE_DIR.mkdir(parents=True, exist_ok=True)
 PRETTY_LOGGER = pretty.ALogger("[RAG]")
 
 
-async def prepare_knowleage_data():
+async def prepare_knowleage_data(host: AgentHost):
     PRETTY_LOGGER.title("PREPARE_KNOWLEAGE_DATA")
     if list(KNOWLEDGE_BASE_DIR.glob("*.md")):
         rprint(
             "[green]knowledge base already exists, skip prepare_knowleage_data[/green]"
         )
         return
-    agent = Agent(
-        model=DEFAULT_MODEL_NAME,
-        mcp_clients=ENABLED_MCP_CLIENTS,
-    )
+    session_id = host.open_session()
     try:
-        await agent.init()
-        resp = await agent.invoke(
-            f"爬取 https://jsonplaceholder.typicode.com/users 的内容, 在 {KNOWLEDGE_BASE_DIR!s} 每个人创建一个md文件, 保存基本信息"
+        resp = await host.invoke(
+            session_id,
+            f"爬取 https://jsonplaceholder.typicode.com/users 的内容, 在 {KNOWLEDGE_BASE_DIR!s} 每个人创建一个md文件, 保存基本信息",
         )
         rprint(resp)
     finally:
-        await agent.cleanup()
+        host.close_session(session_id)
 
 
 async def retrieve_context(prompt: str):
     er = EembeddingRetriever("BAAI/bge-m3")
-    for path in KNOWLEDGE_BASE_DIR.glob("*.md"):
-        document = path.read_text()
-        await er.embed_documents(document)
-
-    context: list[VectorStoreItem] = await er.retrieve(prompt)
-    PRETTY_LOGGER.title("CONTEXT")
+    # 通过摄取流水线读取、分块、嵌入并写入知识库文件
+    stats = await IngestionService(er).ingest(KNOWLEDGE_BASE_DIR.glob("*.md"))
+    rprint(f"ingested {stats.chunks_stored} chunks in {stats.elapsed:.2f}s")
+
+    # 嵌入接口过慢时退回词法检索，保证检索延迟有上限
+    result = await er.retrieve_with_deadline(prompt, timeout_s=5.0)
+    context: list[VectorStoreItem] = result.items
+    PRETTY_LOGGER.title("CONTEXT (degraded)" if result.degraded else "CONTEXT")
     rprint(context)
     return "\n".join([c.document for c in context])
 
 
-async def rag():
+async def rag(host: AgentHost):
     prompt = f"根据Bret的信息, 创作一个他的故事, 并且把他的故事保存到 {KNOWLEDGE_BASE_DIR.parent / 'story.md'!s} , 要包含他的基本信息和故事"
 
     context = await retrieve_context(prompt)
 
-    agent = Agent(
-        model=DEFAULT_MODEL_NAME,
-        mcp_clients=ENABLED_MCP_CLIENTS,
-        context=context,
-    )
+    # 检索到的上下文只属于这个会话
+    session_id = host.open_session(context=context)
     try:
-        await agent.init()
-        resp = await agent.invoke(prompt)
+        resp = await host.invoke(session_id, prompt)
         rprint(resp)
     finally:
-        await agent.cleanup()
+        host.close_session(session_id)
 
 
 async def main():
-    await prepare_knowleage_data()
-    await rag()
+    # MCP服务器只启动一次，两个步骤在各自的会话中复用
+    agent = Agent(
+        model=DEFAULT_MODEL_NAME,
+        mcp_clients=ENABLED_MCP_CLIENTS,
+    )
+    async with AgentHost(agent) as host:
+        await prepare_knowleage_data(host)
+        await rag(host)
 
 
 if __name__ == "__main__":
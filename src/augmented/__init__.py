@@ -14,16 +14,56 @@ augmented 包初始化文件
 - mcp_tools: MCP工具配置
 - embedding_retriever: 嵌入检索器
 - vector_store: 向量存储实现
+- chunking: 文档流式分块
+- embedding_cache: 查询嵌入缓存
+- embedding_provider: 嵌入提供者（HTTP / 本地）
+- ingestion: 异步摄取流水线
+- knowledge_watcher: 知识库目录监听与增量索引
+- lexical_index: BM25词法索引（检索降级兜底）
+- chat_history: 按token预算管理对话历史
+- tool_selector: 按对话相关性挑选发送的工具
+- response_cache: 聊天响应缓存（精确 + 语义）
+- llm_router: 多端点LLM路由（对冲请求、故障转移）
+- circuit_breaker: 熔断器
+- usage: token用量、延迟、费用统计与预算
+- retry: LLM请求的重试策略
+- tool_registry: 工具注册表（名称路由、冲突命名空间、参数校验）
+- schema_validator: 预编译的JSON Schema校验
+- tool_result_cache: 幂等MCP工具的结果缓存
+- tool_output: 工具输出压缩（提取文本、截断、产物落盘）
+- tool_scheduler: 多会话公平的工具调用调度
+- agent_host: 共享预热MCP会话的多会话Agent宿主
 - _client: 内部客户端实现
 """
 
 # 导出主要的类和函数
-from .chat_openai import AsyncChatOpenAI, ChatOpenAIChatResponse
-from .agent import Agent
+from .chat_openai import AsyncChatOpenAI, ChatOpenAIChatResponse, ChatStreamEvent
+from .agent import Agent, AgentEvent
+from .agent_host import AgentHost
 from .mcp_client import MCPClient
 from .mcp_tools import PresetMcpTools, McpToolInfo
-from .embedding_retriever import EembeddingRetriever
+from .embedding_retriever import EembeddingRetriever, RetrievalResult
 from .vector_store import VectorStore, VectorStoreItem
+from .chunking import MarkdownChunker, TextChunk
+from .embedding_cache import QueryEmbeddingCache
+from .embedding_provider import (
+    EmbeddingProvider,
+    LocalHashingEmbeddingProvider,
+    OpenAIEmbeddingProvider,
+)
+from .ingestion import IngestionService, IngestionStats
+from .knowledge_watcher import KnowledgeBaseWatcher
+from .chat_history import HistoryManager
+from .tool_selector import ToolSelector
+from .response_cache import ResponseCache
+from .llm_router import EndpointRouter, LLMEndpoint
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, shared_breaker
+from .retry import RetryPolicy
+from .tool_registry import ToolRegistry
+from .tool_result_cache import ToolResultCache
+from .tool_output import ToolOutputCompactor
+from .tool_scheduler import FairToolScheduler
+from .usage import PROCESS_USAGE, TokenPricing, UsageBudget, UsageStats
 
 # 包版本信息
 __version__ = "0.1.0"
@@ -34,11 +74,41 @@ __description__ = "Enhanced AI agent with MCP and RAG capabilities"
 __all__ = [
     "AsyncChatOpenAI",
     "ChatOpenAIChatResponse",
+    "ChatStreamEvent",
     "Agent",
+    "AgentEvent",
+    "AgentHost",
     "MCPClient",
     "PresetMcpTools",
     "McpToolInfo",
     "EembeddingRetriever",
+    "RetrievalResult",
     "VectorStore",
     "VectorStoreItem",
+    "MarkdownChunker",
+    "TextChunk",
+    "QueryEmbeddingCache",
+    "EmbeddingProvider",
+    "OpenAIEmbeddingProvider",
+    "LocalHashingEmbeddingProvider",
+    "IngestionService",
+    "IngestionStats",
+    "KnowledgeBaseWatcher",
+    "HistoryManager",
+    "ToolSelector",
+    "ResponseCache",
+    "EndpointRouter",
+    "LLMEndpoint",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "shared_breaker",
+    "RetryPolicy",
+    "ToolRegistry",
+    "ToolResultCache",
+    "ToolOutputCompactor",
+    "FairToolScheduler",
+    "UsageStats",
+    "TokenPricing",
+    "UsageBudget",
+    "PROCESS_USAGE",
 ]
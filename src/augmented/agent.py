@@ -1,14 +1,34 @@
 # 导入必要的库和模块
 import asyncio  # 异步编程支持
-from dataclasses import dataclass  # 用于创建数据类
+import contextlib  # 异步上下文管理器
+from contextlib import aclosing  # 确保流式生成器被关闭
+import copy  # 浅拷贝（对话分叉）
+from dataclasses import dataclass, field  # 用于创建数据类
 import json  # JSON数据处理
+import time  # 计时
+from typing import AsyncIterator, Literal, Self  # 类型注解
 
+from pydantic import BaseModel  # 事件模型
 from rich import print as rprint  # 美化输出打印
 
 # 导入自定义模块
-from augmented.chat_openai import AsyncChatOpenAI  # 异步OpenAI聊天客户端
+from augmented.chat_openai import (  # 异步OpenAI聊天客户端及其流式事件
+    AsyncChatOpenAI,
+    ChatOpenAIChatResponse,
+    ChatStreamEvent,
+    ResponseDoneEvent,
+    TextDeltaEvent,
+    ToolCall,
+    ToolCallReadyEvent,
+)
+from augmented.chat_history import HistoryManager  # 对话历史管理
 from augmented.mcp_client import MCPClient  # MCP客户端
 from augmented.mcp_tools import PresetMcpTools  # 预设MCP工具
+from augmented.tool_output import DEFAULT_ARTIFACT_DIR, ToolOutputCompactor  # 工具输出压缩
+from augmented.tool_registry import ToolRegistry  # 工具名称到客户端的路由与参数校验
+from augmented.tool_scheduler import FairToolScheduler  # 多会话公平的工具调用调度
+from augmented.tool_selector import ToolSelector  # 按相关性挑选工具
+from augmented.usage import TokenPricing, UsageBudget, UsageStats  # 用量统计与预算
 from augmented.utils import pretty  # 美化工具
 from augmented.utils.info import DEFAULT_MODEL_NAME, PROJECT_ROOT_DIR  # 默认配置
 
@@ -16,6 +36,84 @@ from augmented.utils.info import DEFAULT_MODEL_NAME, PROJECT_ROOT_DIR  # 默认
 PRETTY_LOGGER = pretty.ALogger("[Agent]")
 
 
+# Agent事件：一轮循环开始
+class CycleStartEvent(BaseModel):
+    """一轮 LLM 调用（及其后的工具调用）开始"""
+    type: Literal["cycle_start"] = "cycle_start"
+    cycle: int  # 循环序号，从0开始
+
+
+# Agent事件：LLM文本增量
+class LLMTextDeltaEvent(BaseModel):
+    """LLM流式输出的一段文本"""
+    type: Literal["llm_text_delta"] = "llm_text_delta"
+    cycle: int  # 所在循环
+    text: str  # 新增的文本
+
+
+# Agent事件：LLM完整响应
+class LLMResponseEvent(BaseModel):
+    """一轮LLM调用结束后的完整响应"""
+    type: Literal["llm_response"] = "llm_response"
+    cycle: int  # 所在循环
+    content: str = ""  # 文本内容
+    tool_calls: list[ToolCall] = []  # 请求的工具调用
+
+
+# Agent事件：工具调用开始
+class ToolCallStartedEvent(BaseModel):
+    """某个工具调用开始执行"""
+    type: Literal["tool_call_started"] = "tool_call_started"
+    cycle: int  # 所在循环
+    tool_call_id: str  # 工具调用ID
+    name: str  # 工具名称
+    arguments: str  # 参数（JSON字符串）
+
+    @classmethod
+    def of(cls, cycle: int, tool_call: ToolCall) -> Self:
+        """由工具调用构造事件"""
+        return cls(
+            cycle=cycle,
+            tool_call_id=tool_call.id,
+            name=tool_call.function.name,
+            arguments=tool_call.function.arguments,
+        )
+
+
+# Agent事件：工具调用结束
+class ToolCallFinishedEvent(BaseModel):
+    """某个工具调用执行结束"""
+    type: Literal["tool_call_finished"] = "tool_call_finished"
+    cycle: int  # 所在循环
+    tool_call_id: str  # 工具调用ID
+    name: str  # 工具名称
+    duration_s: float  # 执行耗时（秒）
+    output: str = ""  # 写入消息历史的工具输出（被取消时为空）
+    error: str = ""  # 出错时的错误信息
+
+
+# Agent事件：最终回答
+class FinalAnswerEvent(BaseModel):
+    """调用结束，给出最终回答"""
+    type: Literal["final_answer"] = "final_answer"
+    content: str  # 最终回答
+    cycles: int  # 总循环数
+    duration_s: float  # 总耗时（秒）
+    usage: UsageStats = UsageStats()  # 本次调用的累计用量
+    stop_reason: str = "completed"  # 结束原因：completed 或 budget_exceeded:<预算项>
+
+
+# 所有Agent事件
+AgentEvent = (
+    CycleStartEvent
+    | LLMTextDeltaEvent
+    | LLMResponseEvent
+    | ToolCallStartedEvent
+    | ToolCallFinishedEvent
+    | FinalAnswerEvent
+)
+
+
 # Agent类，负责协调LLM和MCP工具的执行
 @dataclass
 class Agent:
@@ -26,100 +124,421 @@ class Agent:
     llm: AsyncChatOpenAI | None = None  # 语言模型实例，初始为None
     system_prompt: str = ""  # 系统提示词
     context: str = ""  # 上下文信息
+    history: HistoryManager | None = None  # 历史管理器，按token预算裁剪发送给LLM的消息
+    tool_selector: ToolSelector | None = None  # 工具选择器，每次只发送最相关的工具
+    pricing: TokenPricing | None = None  # token单价，设置后统计费用
+    budget: UsageBudget | None = None  # 单次invoke的用量预算
+
+    max_concurrent_tools: int = 8  # 同时执行的工具调用上限（整个Agent）
+    max_concurrent_per_client: int = 4  # 每个MCP客户端同时执行的工具调用上限
+    tool_timeout_s: float | None = 60.0  # 单个工具调用的超时时间（不含排队），None不限制
+    startup_timeout_s: float | None = 60.0  # 每个MCP服务器的启动超时时间，None不限制
+    allow_partial_startup: bool = False  # 是否容忍部分MCP服务器启动失败（失败的服务器被移除）
+    # 工具输出压缩器，None时写入完整的CallToolResult JSON
+    tool_output: ToolOutputCompactor | None = field(
+        default_factory=lambda: ToolOutputCompactor(artifact_dir=DEFAULT_ARTIFACT_DIR)
+    )
+
+    # 多会话共享的工具调用调度器，设置后替代下面的信号量，在会话之间公平分配并发名额
+    scheduler: FairToolScheduler | None = None
+    session_id: str = ""  # 所属会话（由AgentHost分配），用于公平调度
+
+    registry: ToolRegistry = field(default_factory=ToolRegistry, init=False)  # 工具注册表（分支共享）
+
+    _owns_clients: bool = field(default=True, init=False, repr=False)  # 是否负责关闭MCP客户端
+    _registry_version: int = field(default=0, init=False, repr=False)  # LLM工具列表对应的注册表版本
+    _tool_semaphore: asyncio.Semaphore = field(init=False, repr=False)  # Agent级并发限制
+    _client_semaphores: dict[int, asyncio.Semaphore] = field(
+        default_factory=dict, init=False, repr=False
+    )  # id(MCP客户端) -> 该客户端的并发限制
+
+    def __post_init__(self) -> None:
+        """创建并发限制（分支Agent与原Agent共享）"""
+        self._tool_semaphore = asyncio.Semaphore(self.max_concurrent_tools)
 
     # 初始化Agent，设置LLM和工具
     async def init(self) -> None:
         """初始化Agent，设置语言模型和可用工具"""
         PRETTY_LOGGER.title("INIT LLM&TOOLS")  # 记录初始化开始
-        tools = []  # 初始化工具列表
-        
-        # 遍历所有MCP客户端并初始化
-        for mcp_client in self.mcp_clients:
-            await mcp_client.init()  # 异步初始化MCP客户端
-            tools.extend(mcp_client.get_tools())  # 获取客户端提供的工具并添加到列表
+        await self._start_clients()  # 并发启动所有MCP客户端
+
+        # 构建工具注册表（处理同名工具、预编译参数校验）
+        self.registry.build(self.mcp_clients)
+        self._registry_version = self.registry.version
         
         # 创建异步聊天LLM实例，配置模型、工具、系统提示和上下文
         self.llm = AsyncChatOpenAI(
             self.model,  # 模型名称
-            tools=tools,  # 可用工具列表
+            tools=self.registry.tools,  # 可用工具列表
             system_prompt=self.system_prompt,  # 系统提示词
             context=self.context,  # 上下文信息
+            history=self.history,  # 历史管理器
+            tool_selector=self.tool_selector,  # 工具选择器
+            pricing=self.pricing,  # token单价
         )
 
+    # 刷新工具列表
+    async def refresh_tools(self, force: bool = False) -> bool:
+        """刷新通知过工具列表变化的MCP客户端（force时刷新全部），有变化时更新LLM的工具
+
+        返回工具列表是否变化；LLM的工具定义缓存随之失效并在下次请求时重新生成。
+        """
+        if self.llm is None:
+            raise ValueError("llm not call .init()")
+        changed = False
+        for mcp_client in self.mcp_clients:
+            if force or mcp_client.tools_stale:
+                changed |= await mcp_client.refresh_tools()
+        if changed:
+            self.registry.build(self.mcp_clients)
+        # 注册表可能已被共享它的其他分支重建
+        if self._registry_version != self.registry.version:
+            self._registry_version = self.registry.version
+            self.llm.tools = self.registry.tools
+            changed = True
+        return changed
+
+    # 从当前对话分叉出一个新的Agent
+    def fork(self, context: str = "") -> Self:
+        """返回共享MCP客户端、工具和LLM传输层，但对话状态独立的Agent分支
+
+        多个分支可以并发invoke；分支不负责关闭MCP客户端，cleanup只需在原Agent上调用。
+        context为分支自己的上下文信息（见AsyncChatOpenAI.fork）。
+        """
+        if self.llm is None:
+            raise ValueError("llm not call .init()")
+        branch = copy.copy(self)
+        branch.mcp_clients = list(self.mcp_clients)
+        branch.llm = self.llm.fork(context)
+        branch._owns_clients = False
+        return branch
+
     # 清理Agent资源，关闭MCP客户端连接
     async def cleanup(self) -> None:
         """清理Agent资源，关闭所有MCP客户端连接"""
         PRETTY_LOGGER.title("CLEANUP LLM&TOOLS")  # 记录清理开始
+        if not self._owns_clients:
+            return  # 分支共享原Agent的客户端，由原Agent负责关闭
 
-        # 循环处理所有MCP客户端，确保正确清理
-        while self.mcp_clients:
-            # NOTE: 需要先处理其他依赖于mcp_client的资源, 不然会有一堆错误, 如
-            # RuntimeError: Attempted to exit cancel scope in a different task than it was entered in
-            # RuntimeError: Attempted to exit a cancel scope that isn't the current tasks's current cancel scope an error occurred during closing of asynchronous generator <async_generator object stdio_client at 0x76c3e08ee0c0>
-            mcp_client = self.mcp_clients.pop()  # 从列表中移除并获取最后一个客户端
-            await mcp_client.cleanup()  # 异步清理MCP客户端资源
+        # 并发关闭所有MCP客户端
+        # NOTE: stdio_client的cancel scope必须在进入它的任务中退出，否则会有一堆错误, 如
+        # RuntimeError: Attempted to exit cancel scope in a different task than it was entered in
+        # MCPClient在各自的持有任务中进入和退出上下文，因此这里可以并发关闭
+        mcp_clients, self.mcp_clients = self.mcp_clients, []
+        await asyncio.gather(*(mcp_client.cleanup() for mcp_client in mcp_clients))
+
+    # 并发启动所有MCP客户端
+    async def _start_clients(self) -> None:
+        """并发启动，每个服务器有独立的启动超时
+
+        有服务器启动失败时：allow_partial_startup为True则移除失败的服务器继续运行
+        （全部失败仍然报错），否则关闭已启动的服务器并抛出RuntimeError。
+        """
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(mcp_client.init(), self.startup_timeout_s)
+                for mcp_client in self.mcp_clients
+            ),
+            return_exceptions=True,
+        )
+        failed = [
+            (mcp_client, result)
+            for mcp_client, result in zip(self.mcp_clients, results)
+            if isinstance(result, BaseException)
+        ]
+        rprint(
+            f"Started {len(self.mcp_clients) - len(failed)}/{len(self.mcp_clients)} "
+            f"MCP servers in {time.perf_counter() - started:.2f}s"
+        )
+        if not failed:
+            return
+        for mcp_client, error in failed:
+            reason = "timed out" if isinstance(error, TimeoutError) else f"{error!s}"
+            rprint(f"[red]MCP server {mcp_client.name} failed to start: {reason}[/red]")
+        self.mcp_clients = [c for c in self.mcp_clients if all(c is not f for f, _ in failed)]
+        if self.allow_partial_startup and self.mcp_clients:
+            return
+        await self.cleanup()
+        names = ", ".join(mcp_client.name for mcp_client, _ in failed)
+        raise RuntimeError(f"MCP servers failed to start: {names}") from failed[0][1]
 
     # 公开的调用方法，转发到内部实现
     async def invoke(self, prompt: str) -> str | None:
         """公开调用方法，处理用户输入并返回响应"""
+        result = await self._invoke(prompt)
+        return result.content if result else None
+
+    # 调用并返回最终回答及其用量
+    async def invoke_with_usage(self, prompt: str) -> FinalAnswerEvent | None:
+        """与invoke相同，但返回包含回答、累计用量和结束原因的最终回答事件"""
         return await self._invoke(prompt)
 
-    # 核心调用逻辑：处理用户输入，执行工具调用循环
-    async def _invoke(self, prompt: str) -> str | None:
-        """核心调用逻辑：处理用户输入，执行工具调用循环"""
+    # 核心调用逻辑：消费事件流，在控制台展示进度并返回最终回答
+    async def _invoke(self, prompt: str) -> FinalAnswerEvent | None:
+        """核心调用逻辑：处理用户输入，执行工具调用循环
+
+        循环标题、工具参数和结果、LLM输出都在这里根据事件打印；invoke_stream不打印这些内容，
+        AgentHost等库调用方不会在标准输出中看到工具的参数和结果。
+        """
+        answer: FinalAnswerEvent | None = None
+        printed_llm_output = False  # 标记是否已经打印了输出
+        async with aclosing(self.invoke_stream(prompt)) as events:
+            async for event in events:
+                match event:
+                    case CycleStartEvent(cycle=cycle):
+                        PRETTY_LOGGER.title(f"INVOKE CYCLE {cycle}")  # 记录当前循环次数
+                    case ToolCallStartedEvent():
+                        if printed_llm_output:
+                            print()
+                            printed_llm_output = False
+                        PRETTY_LOGGER.title(f"TOOL USE `{event.name}`")
+                        rprint("with args:", event.arguments)
+                    case ToolCallFinishedEvent():
+                        rprint("call result:", event.output)
+                    case LLMTextDeltaEvent(text=text):
+                        # 实时显示LLM输出
+                        print(text, end="")
+                        printed_llm_output = True
+                    case LLMResponseEvent():
+                        if printed_llm_output:
+                            print()
+                            printed_llm_output = False
+                        rprint(event)  # 打印LLM响应
+                    case FinalAnswerEvent():
+                        answer = event
+        return answer
+
+    # 流式调用：以结构化事件的形式产出调用过程
+    async def invoke_stream(self, prompt: str) -> AsyncIterator[AgentEvent]:
+        """处理用户输入并逐个产出事件：循环开始、LLM文本增量、LLM响应、
+        工具调用开始/结束（含耗时）以及最终回答
+
+        工具调用在LLM流式输出期间参数一完整就开始执行，结束事件在工具完成时立即产出；
+        工具结果仍按原始顺序写入消息历史。
+        设置了预算时，超出预算会干净地结束循环：未完成的工具被取消并写入占位结果，
+        最终回答事件带有累计用量和结束原因。
+        """
         if self.llm is None:
             raise ValueError("llm not call .init()")  # 检查LLM是否已初始化
-        
-        # 发送初始消息给LLM
-        chat_resp = await self.llm.chat(prompt)
-        i = 0  # 循环计数器
-        
-        # 工具调用循环：处理LLM可能返回的工具调用请求
-        while True:
-            PRETTY_LOGGER.title(f"INVOKE CYCLE {i}")  # 记录当前循环次数
-            i += 1
-            # 处理工具调用
-            rprint(chat_resp)  # 打印LLM响应
-            
-            # 检查是否有工具调用请求
-            if chat_resp.tool_calls:
-                # 遍历所有工具调用请求
-                for tool_call in chat_resp.tool_calls:
-                    target_mcp_client: MCPClient | None = None
-                    
-                    # 查找对应的MCP客户端来处理这个工具调用
-                    for mcp_client in self.mcp_clients:
-                        if tool_call.function.name in [
-                            t.name for t in mcp_client.get_tools()
-                        ]:
-                            target_mcp_client = mcp_client
+
+        started = time.perf_counter()
+        usage = UsageStats()  # 本次调用的累计用量
+        tool_tasks: dict[str, asyncio.Task[str]] = {}  # 工具调用ID -> 提前执行的任务
+        pending: list[tuple[ToolCall, asyncio.Task[str]]] = []  # 本轮按顺序等待的工具
+        finished: asyncio.Queue[ToolCallFinishedEvent] = asyncio.Queue()  # 已完成的工具事件
+        prompt_for_cycle = prompt  # 只有第一轮带用户输入
+        cycle = 0  # 循环计数器
+
+        def final(content: str, stop_reason: str = "completed") -> FinalAnswerEvent:
+            return FinalAnswerEvent(
+                content=content,
+                cycles=cycle + 1,
+                duration_s=time.perf_counter() - started,
+                usage=usage,
+                stop_reason=stop_reason,
+            )
+
+        try:
+            # 工具调用循环：处理LLM可能返回的工具调用请求
+            while True:
+                yield CycleStartEvent(cycle=cycle)
+                await self.refresh_tools()  # 服务端工具列表变化时更新工具定义
+                chat_resp = ChatOpenAIChatResponse()
+                partial = ""  # 本轮已输出的文本
+                exceeded = ""  # 超出的预算项
+                async with aclosing(self.llm.chat_stream(prompt_for_cycle)) as stream:
+                    while True:
+                        try:
+                            chat_event = await self._next_chat_event(stream, started)
+                        except StopAsyncIteration:
                             break
-                    
-                    # 如果找到对应的客户端，执行工具调用
-                    if target_mcp_client:
-                        PRETTY_LOGGER.title(f"TOOL USE `{tool_call.function.name}`")
-                        rprint("with args:", tool_call.function.arguments)
-                        
-                        # 调用工具并获取结果
-                        mcp_result = await target_mcp_client.call_tool(
-                            tool_call.function.name,
-                            json.loads(tool_call.function.arguments),  # 解析JSON参数
-                        )
-                        rprint("call result:", mcp_result)
-                        
-                        # 将工具调用结果添加到LLM上下文中
-                        self.llm.append_tool_result(
-                            tool_call.id, mcp_result.model_dump_json()
-                        )
-                    else:
-                        # 工具未找到，返回错误信息
-                        self.llm.append_tool_result(tool_call.id, "tool not found")
-                
-                # 继续对话，让LLM处理工具调用结果
-                chat_resp = await self.llm.chat()
-            else:
+                        except TimeoutError:
+                            exceeded = "duration"  # 流停滞期间墙钟时间超出预算
+                            break
+                        match chat_event:
+                            case TextDeltaEvent(text=text):
+                                partial += text
+                                yield LLMTextDeltaEvent(cycle=cycle, text=text)
+                            case ToolCallReadyEvent(tool_call=tool_call):
+                                # 参数完整的工具调用立即开始执行
+                                if tool_call.id and tool_call.id not in tool_tasks:
+                                    tool_tasks[tool_call.id] = self._start_tool(
+                                        cycle, tool_call, finished
+                                    )
+                                    yield ToolCallStartedEvent.of(cycle, tool_call)
+                            case ResponseDoneEvent(response=response):
+                                chat_resp = response
+                        # 及时转发已完成的工具事件
+                        while not finished.empty():
+                            yield finished.get_nowait()
+                        # 墙钟时间超出预算时关闭流，不完整的响应不会写入消息历史
+                        if exceeded := self._budget_exceeded(usage, started):
+                            break
+                prompt_for_cycle = ""
+                if exceeded and chat_resp.usage is None:
+                    yield final(partial, f"budget_exceeded:{exceeded}")
+                    return
+                if chat_resp.usage is not None:
+                    usage.add(chat_resp.usage)
+                yield LLMResponseEvent(
+                    cycle=cycle,
+                    content=chat_resp.content,
+                    tool_calls=chat_resp.tool_calls,
+                )
+
                 # 没有工具调用，返回最终响应内容
-                return chat_resp.content
+                if not chat_resp.tool_calls:
+                    yield final(chat_resp.content)
+                    return
+
+                # 没有ID、未被提前执行的工具调用在此补充执行
+                pending.clear()
+                for tool_call in chat_resp.tool_calls:
+                    task = tool_tasks.pop(tool_call.id, None)
+                    if task is None:
+                        task = self._start_tool(cycle, tool_call, finished)
+                        yield ToolCallStartedEvent.of(cycle, tool_call)
+                    pending.append((tool_call, task))
+
+                # 工具完成时立即产出结束事件（任务结束前一定已放入结束事件）
+                while not (exceeded := self._budget_exceeded(usage, started)):
+                    while not finished.empty():
+                        yield finished.get_nowait()
+                    if all(task.done() for _, task in pending):
+                        break
+                    remaining = self.budget and self.budget.remaining_s(
+                        time.perf_counter() - started
+                    )
+                    try:
+                        yield await asyncio.wait_for(finished.get(), remaining)
+                    except TimeoutError:
+                        continue  # 下一次检查会发现超出预算
+
+                # 按原始顺序收集工具结果，保证消息历史有效
+                for tool_call, task in pending:
+                    # 将工具调用结果添加到LLM上下文中
+                    self.llm.append_tool_result(
+                        tool_call.id,
+                        task.result()
+                        if task.done() and not task.cancelled()
+                        else f"tool call cancelled: budget exceeded ({exceeded})",
+                    )
+                if exceeded:
+                    yield final(chat_resp.content, f"budget_exceeded:{exceeded}")
+                    return
+                cycle += 1
+        finally:
+            # 出错或调用方提前退出时取消仍在执行的工具
+            for task in [*tool_tasks.values(), *(task for _, task in pending)]:
+                task.cancel()
+
+    # 读取下一个流式事件
+    async def _next_chat_event(
+        self, stream: AsyncIterator[ChatStreamEvent], started: float
+    ) -> ChatStreamEvent:
+        """设置了墙钟时间预算时最多等待剩余时间（超时抛出TimeoutError），流停滞也不会超出预算"""
+        remaining = self.budget and self.budget.remaining_s(time.perf_counter() - started)
+        if remaining is None:
+            return await anext(stream)
+        return await asyncio.wait_for(anext(stream), remaining)
+
+    # 判断是否超出预算
+    def _budget_exceeded(self, usage: UsageStats, started: float) -> str:
+        """返回超出的预算项名称，未设置预算或未超出时返回空字符串"""
+        if self.budget is None:
+            return ""
+        return self.budget.exceeded(usage, time.perf_counter() - started)
+
+    # 启动一个工具调用任务
+    def _start_tool(
+        self,
+        cycle: int,
+        tool_call: ToolCall,
+        finished: asyncio.Queue["ToolCallFinishedEvent"],
+    ) -> asyncio.Task[str]:
+        """在后台执行工具调用，完成后（无论成功失败）向finished队列放入结束事件
+
+        任务只会返回工具输出（出错时为错误信息），不会抛出异常（被取消除外）。
+        """
+
+        async def run() -> str:
+            started = time.perf_counter()
+            output = error = ""
+            try:
+                output = await self._call_tool(tool_call)
+            except TimeoutError:
+                # 超时和出错都作为工具输出返回给LLM，不中断整个调用循环，
+                # 保证每个工具调用都有对应的结果，消息历史始终有效
+                error = f"timed out after {self.tool_timeout_s}s"
+                output = f"Error: tool `{tool_call.function.name}` {error}"
+            except Exception as e:
+                error = f"{e!s}"
+                output = f"Error: tool `{tool_call.function.name}` failed: {error}"
+            finally:
+                finished.put_nowait(
+                    ToolCallFinishedEvent(
+                        cycle=cycle,
+                        tool_call_id=tool_call.id,
+                        name=tool_call.function.name,
+                        duration_s=time.perf_counter() - started,
+                        output=output,
+                        error=error,
+                    )
+                )
+            return output
+
+        return asyncio.create_task(run())
+
+    # 执行单个工具调用
+    async def _call_tool(self, tool_call: ToolCall) -> str:
+        """查找并调用工具，返回写入消息历史的工具输出（经过tool_output压缩）
+
+        参数不是合法JSON或不符合工具的inputSchema时直接返回错误信息，不发往服务器。
+        """
+        # 查找对应的MCP客户端来处理这个工具调用
+        route = self.registry.resolve(tool_call.function.name)
+
+        # 工具未找到，返回错误信息
+        if route is None:
+            return "tool not found"
+
+        # 解析并校验参数
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+        except json.JSONDecodeError as e:
+            return f"Error: arguments of `{route.name}` are not valid JSON: {e!s}"
+        if errors := self.registry.validate(route, arguments):
+            return f"Error: invalid arguments for `{route.name}`: " + "; ".join(errors)
+
+        # 在并发限制内调用工具并获取结果（超时只计算实际执行时间，不含排队）
+        async with self._tool_slot(route.client):
+            mcp_result = await asyncio.wait_for(
+                route.client.call_tool(route.tool_name, arguments),
+                self.tool_timeout_s,
+            )
+        if self.tool_output is None:
+            return mcp_result.model_dump_json()
+        return await self.tool_output.compact(route.name, mcp_result)
+
+    # 获取工具调用的并发名额
+    @contextlib.asynccontextmanager
+    async def _tool_slot(self, mcp_client: MCPClient) -> AsyncIterator[None]:
+        """同时受Agent级和客户端级并发上限约束（分支Agent共享同一组限制）
+
+        设置了scheduler时改由它在会话之间公平分配名额。
+        """
+        if self.scheduler is not None:
+            async with self.scheduler.slot(self.session_id, mcp_client):
+                yield
+            return
+        client_semaphore = self._client_semaphores.get(id(mcp_client))
+        if client_semaphore is None:
+            client_semaphore = asyncio.Semaphore(self.max_concurrent_per_client)
+            self._client_semaphores[id(mcp_client)] = client_semaphore
+        # 先占客户端名额再占全局名额，等待繁忙服务器的调用不会占着全局名额
+        async with client_semaphore, self._tool_semaphore:
+            yield
 
 
 # Agent使用示例：演示如何配置和使用Agent进行网页爬取和内容保存
@@ -0,0 +1,168 @@
+"""
+Agent宿主模块：常驻进程中用一组预热的MCP会话服务多个并发的对话会话
+
+- MCP服务器只在start时启动一次，所有会话共享这些连接，之后的请求不再承担启动开销
+- 每个会话是模板Agent的一个分支（Agent.fork），拥有独立的消息历史和用量统计
+- 同一会话的invoke串行执行（保证消息历史有效），不同会话之间并发执行
+- 工具调用由FairToolScheduler在会话之间轮流分配并发名额
+- 会话数有上限，超出时或空闲超时后淘汰最久未使用的空闲会话
+"""
+
+import asyncio
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass, field
+import time
+from typing import AsyncIterator, Self
+import uuid
+
+from rich import print as rprint
+
+from augmented.agent import Agent, AgentEvent, FinalAnswerEvent
+from augmented.tool_scheduler import FairToolScheduler
+
+
+# 一个对话会话
+@dataclass
+class _Session:
+    agent: Agent  # 会话自己的Agent分支
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)  # 保证同一会话的invoke串行
+    last_used: float = field(default_factory=time.monotonic)  # 最近一次使用的时间
+
+
+# Agent宿主
+@dataclass
+class AgentHost:
+    """共享预热的MCP会话，为多个并发会话提供invoke"""
+
+    agent: Agent  # 模板Agent（未初始化），提供MCP客户端、模型和各项配置
+    max_sessions: int = 256  # 同时保留的会话上限
+    idle_timeout_s: float | None = 1800.0  # 会话空闲多久后被淘汰，None不淘汰
+
+    scheduler: FairToolScheduler = field(init=False, repr=False)  # 所有会话共享的工具调度器
+    _sessions: OrderedDict[str, _Session] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )  # 会话ID -> 会话，按最近使用排序
+    _started: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.scheduler = FairToolScheduler(
+            max_concurrent=self.agent.max_concurrent_tools,
+            max_concurrent_per_client=self.agent.max_concurrent_per_client,
+        )
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+    # 当前的会话ID
+    @property
+    def sessions(self) -> list[str]:
+        return list(self._sessions)
+
+    # 启动
+    async def start(self) -> None:
+        """启动所有MCP服务器并初始化模板Agent（只需调用一次）"""
+        if self._started:
+            return
+        self.agent.scheduler = self.scheduler
+        await self.agent.init()
+        self._started = True
+
+    # 停止
+    async def stop(self) -> None:
+        """丢弃所有会话并关闭MCP服务器"""
+        self._sessions.clear()
+        if self._started:
+            self._started = False
+            await self.agent.cleanup()
+
+    # 打开会话
+    def open_session(self, session_id: str | None = None, context: str = "") -> str:
+        """创建会话并返回其ID；context为该会话自己的上下文信息（如检索结果）
+
+        会话ID已存在时抛出ValueError；会话数已满且没有可淘汰的空闲会话时抛出RuntimeError。
+        """
+        if not self._started:
+            raise RuntimeError("AgentHost not started, call .start() first")
+        session_id = session_id or uuid.uuid4().hex
+        if session_id in self._sessions:
+            raise ValueError(f"session {session_id} already exists")
+        self._evict(reserve=1)
+        agent = self.agent.fork(context)
+        agent.session_id = session_id
+        self._sessions[session_id] = _Session(agent)
+        return session_id
+
+    # 关闭会话
+    def close_session(self, session_id: str) -> bool:
+        """丢弃会话的对话状态，会话不存在时返回False
+
+        正在执行的invoke不受影响，执行完后该会话不再可用。
+        """
+        return self._sessions.pop(session_id, None) is not None
+
+    # 调用
+    async def invoke(self, session_id: str, prompt: str) -> str | None:
+        """在会话中调用Agent，返回最终回答"""
+        result = await self.invoke_with_usage(session_id, prompt)
+        return result.content if result else None
+
+    # 调用并返回最终回答及其用量
+    async def invoke_with_usage(
+        self, session_id: str, prompt: str
+    ) -> FinalAnswerEvent | None:
+        """与invoke相同，但返回包含回答、累计用量和结束原因的最终回答事件
+
+        只消费事件流，不向标准输出打印LLM输出（需要实时输出时使用invoke_stream）。
+        """
+        answer: FinalAnswerEvent | None = None
+        async with aclosing(self.invoke_stream(session_id, prompt)) as events:
+            async for event in events:
+                if isinstance(event, FinalAnswerEvent):
+                    answer = event
+        return answer
+
+    # 流式调用
+    async def invoke_stream(
+        self, session_id: str, prompt: str
+    ) -> AsyncIterator[AgentEvent]:
+        """在会话中流式调用Agent（见Agent.invoke_stream），同一会话的调用排队执行"""
+        session = self._session(session_id)
+        async with session.lock:
+            try:
+                async with aclosing(session.agent.invoke_stream(prompt)) as events:
+                    async for event in events:
+                        yield event
+            finally:
+                session.last_used = time.monotonic()
+
+    # 查找会话
+    def _session(self, session_id: str) -> _Session:
+        """返回会话并标记为最近使用，不存在时抛出KeyError"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"unknown session {session_id}")
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.monotonic()
+        return session
+
+    # 淘汰会话
+    def _evict(self, reserve: int = 0) -> None:
+        """淘汰空闲超时的会话，并为新会话腾出reserve个位置（只淘汰没有在执行的会话）"""
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            busy = session.lock.locked()
+            expired = (
+                self.idle_timeout_s is not None
+                and now - session.last_used >= self.idle_timeout_s
+            )
+            over = len(self._sessions) + reserve > self.max_sessions
+            if not busy and (expired or over):
+                del self._sessions[session_id]
+                rprint(f"[yellow]Evicted idle session {session_id}[/yellow]")
+        if len(self._sessions) + reserve > self.max_sessions:
+            raise RuntimeError(f"too many active sessions (max {self.max_sessions})")
@@ -0,0 +1,189 @@
+"""
+对话历史管理模块：按token预算裁剪每次请求发送的消息
+
+- 初始化时的消息（系统提示、上下文）始终保留，最近几轮对话优先保留
+- 先把较早的工具结果压缩为首尾片段，仍超预算时再按整组丢弃最早的消息
+- 最近几轮本身超预算时，作为最后手段同样压缩、丢弃或截短其中较早的部分
+- assistant的tool_calls消息与对应的tool结果消息作为一个整体，永远不会被拆开
+"""
+
+from dataclasses import dataclass, field
+import json
+
+from openai.types.chat import ChatCompletionMessageParam
+from rich import print as rprint
+
+from augmented.chunking import estimate_tokens, head_text, tail_text
+
+# 每条消息在角色、分隔符等上的固定开销（估算值）
+_MESSAGE_OVERHEAD_TOKENS = 4
+# 省略标记本身的token数上限（含换行和数字）
+_ELISION_MARKER_TOKENS = 16
+
+
+# 估算单条消息的token数
+def message_tokens(message: ChatCompletionMessageParam) -> int:
+    """估算一条消息（含工具调用参数）的token数"""
+    tokens = _MESSAGE_OVERHEAD_TOKENS
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += estimate_tokens(content)
+    elif content:
+        tokens += estimate_tokens(json.dumps(content, ensure_ascii=False))
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call["function"]
+        tokens += estimate_tokens(function["name"]) + estimate_tokens(function["arguments"])
+    return tokens
+
+
+# 对话历史管理器
+@dataclass
+class HistoryManager:
+    """把完整的消息历史裁剪到token预算以内，作为每次请求实际发送的消息"""
+
+    max_tokens: int = 16_000  # 发送的消息总token预算
+    keep_recent_turns: int = 2  # 优先完整保留的最近用户轮次数
+    elided_tool_tokens: int = 256  # 较早的工具结果被压缩到的token数（首尾各一半）
+    # 最近一次fit的结果超出预算的token数，0表示未超出
+    overflow_tokens: int = field(default=0, init=False)
+
+    # 裁剪消息
+    def fit(
+        self, messages: list[ChatCompletionMessageParam], pinned: int = 0
+    ) -> list[ChatCompletionMessageParam]:
+        """返回裁剪后的消息列表（不修改原列表）
+
+        依次尝试，直到总token数不超过max_tokens：
+        1. 压缩最近轮次之前的工具结果；2. 从最早的一组开始整体丢弃较早的轮次；
+        3. 压缩最近轮次中的工具结果；4. 丢弃最近轮次中较早的组（最新的user消息和最后一组始终保留）；
+        5. 进一步截短剩余的工具结果。
+        只有固定消息、最新的user消息和最后一组中的非工具消息本身就超预算时，结果才会超出预算，
+        此时overflow_tokens记录超出的token数并打印警告，调用方可以据此处理。
+
+        Args:
+            messages: 完整的消息历史
+            pinned: 开头需要始终保留的消息数（系统提示、上下文等）
+        """
+        self.overflow_tokens = 0
+        head = list(messages[:pinned])
+        groups = _group(messages[pinned:])
+        budget = self.max_tokens - sum(message_tokens(m) for m in head)
+        sizes = [_group_tokens(g) for g in groups]
+        if sum(sizes) <= budget:
+            return list(messages)
+
+        protected = _recent_turns_start(groups, self.keep_recent_turns)
+
+        # 第一步：压缩较早的工具结果
+        self._elide_groups(groups, sizes, range(protected))
+        # 第二步：从最早的一组开始整体丢弃
+        start = 0
+        total = sum(sizes)
+        while total > budget and start < protected:
+            total -= sizes[start]
+            start += 1
+        # 继续丢弃到下一个user消息为止，保证保留的历史从完整的轮次开始
+        while 0 < start < protected and groups[start][0].get("role") != "user":
+            total -= sizes[start]
+            start += 1
+        # 第三步：最近的轮次本身就超预算时，压缩其中的工具结果
+        if total > budget:
+            self._elide_groups(groups, sizes, range(start, len(groups)))
+            total = sum(sizes[start:])
+        # 第四步：仍超预算时从前往后丢弃最近轮次中的组，
+        # 保留最新的user消息（当前的问题）和最后一组
+        latest_user = _recent_turns_start(groups, 1)
+        kept = list(range(start, len(groups)))
+        for i in range(start, len(groups) - 1):
+            if total <= budget:
+                break
+            if i == latest_user and groups[i][0].get("role") == "user":
+                continue
+            kept.remove(i)
+            total -= sizes[i]
+        # 第五步：按需截短剩余的工具结果（从最早的开始）
+        for i in kept:
+            if total <= budget:
+                break
+            for j, message in enumerate(groups[i]):
+                excess = total - budget
+                if excess <= 0:
+                    break
+                content = message.get("content")
+                if message.get("role") != "tool" or not isinstance(content, str):
+                    continue
+                limit = max(0, estimate_tokens(content) - excess - _ELISION_MARKER_TOKENS)
+                groups[i][j] = _elide(message, limit)
+                total += message_tokens(groups[i][j]) - message_tokens(message)
+
+        if total > budget:
+            self.overflow_tokens = total - budget
+            rprint(
+                f"[yellow]history exceeds the token budget by {self.overflow_tokens} tokens "
+                f"(max_tokens={self.max_tokens})[/yellow]"
+            )
+        return head + [m for i in kept for m in groups[i]]
+
+    # 压缩若干组中的工具结果
+    def _elide_groups(
+        self,
+        groups: list[list[ChatCompletionMessageParam]],
+        sizes: list[int],
+        indices: range,
+    ) -> None:
+        """把indices中带工具调用的组的工具结果压缩到elided_tool_tokens，并更新sizes"""
+        for i in indices:
+            if groups[i][0].get("tool_calls"):
+                groups[i] = [_elide(m, self.elided_tool_tokens) for m in groups[i]]
+                sizes[i] = _group_tokens(groups[i])
+
+
+# 压缩单条工具结果
+def _elide(message: ChatCompletionMessageParam, limit: int) -> ChatCompletionMessageParam:
+    """把超过limit个token的工具结果压缩为首尾片段，中间用省略标记代替"""
+    content = message.get("content")
+    if message.get("role") != "tool" or not isinstance(content, str):
+        return message
+    tokens = estimate_tokens(content)
+    if tokens <= limit:
+        return message
+    half = limit // 2
+    elided = (
+        f"{head_text(content, half)}\n"
+        f"...[{tokens - 2 * half} tokens elided from earlier tool result]...\n"
+        f"{tail_text(content, half)}"
+    )
+    return {**message, "content": elided}
+
+
+# 一组消息的token数
+def _group_tokens(group: list[ChatCompletionMessageParam]) -> int:
+    return sum(message_tokens(m) for m in group)
+
+
+# 把消息分组为不可拆分的单元
+def _group(
+    messages: list[ChatCompletionMessageParam],
+) -> list[list[ChatCompletionMessageParam]]:
+    """带tool_calls的assistant消息与其后的tool消息组成一组，其余消息各自一组"""
+    groups: list[list[ChatCompletionMessageParam]] = []
+    for message in messages:
+        if message.get("role") == "tool" and groups and groups[-1][0].get("tool_calls"):
+            groups[-1].append(message)
+        else:
+            groups.append([message])
+    return groups
+
+
+# 找到最近若干个用户轮次的起始组
+def _recent_turns_start(
+    groups: list[list[ChatCompletionMessageParam]], turns: int
+) -> int:
+    """返回倒数第turns个user消息所在组的下标；user消息不足时返回0"""
+    seen = 0
+    for i in range(len(groups) - 1, -1, -1):
+        if groups[i][0].get("role") == "user":
+            seen += 1
+            if seen >= turns:
+                return i
+    return 0
@@ -1,5 +1,10 @@
 import asyncio
+from contextlib import aclosing
+import copy
+import json
 import os
+import time
+from typing import AsyncIterator, Callable, Literal, Self
 # from mcp import Tool
 import mcp
 from openai import NOT_GIVEN, AsyncOpenAI
@@ -9,12 +14,21 @@ from openai.types.chat import (
     ChatCompletionMessageParam,
     ChatCompletionToolParam,
 )
+from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
 # from openai.types import FunctionDefinition
 from openai.types.shared_params.function_definition import FunctionDefinition
 import dotenv
 from pydantic import BaseModel
 from rich import print as rprint
 
+from augmented.chat_history import HistoryManager, message_tokens
+from augmented.circuit_breaker import CircuitBreaker, shared_breaker
+from augmented.chunking import estimate_tokens
+from augmented.llm_router import EndpointRouter
+from augmented.response_cache import ResponseCache
+from augmented.retry import RetryPolicy
+from augmented.tool_selector import ToolSelector
+from augmented.usage import PROCESS_USAGE, TokenPricing, UsageStats
 from augmented.utils import pretty
 from augmented.utils.info import DEFAULT_MODEL_NAME
 
@@ -44,6 +58,135 @@ class ChatOpenAIChatResponse(BaseModel):
     """表示OpenAI聊天API的响应结果"""
     content: str = ""  # AI生成的文本内容
     tool_calls: list[ToolCall] = []  # 需要调用的工具列表
+    usage: UsageStats | None = None  # 本次调用的用量（命中响应缓存时为None）
+
+
+# 流式聊天事件：文本增量
+class TextDeltaEvent(BaseModel):
+    """模型输出的一段文本"""
+    type: Literal["text_delta"] = "text_delta"
+    text: str  # 新增的文本
+
+
+# 流式聊天事件：工具调用增量
+class ToolCallDeltaEvent(BaseModel):
+    """工具调用的一个流式片段"""
+    type: Literal["tool_call_delta"] = "tool_call_delta"
+    index: int  # 工具调用的序号
+    id: str = ""  # 工具调用ID片段
+    name: str = ""  # 函数名称片段
+    arguments: str = ""  # 函数参数片段
+
+
+# 流式聊天事件：某个工具调用已完整
+class ToolCallReadyEvent(BaseModel):
+    """工具调用的参数已完整，可以提前执行"""
+    type: Literal["tool_call_ready"] = "tool_call_ready"
+    tool_call: ToolCall  # 完整的工具调用
+
+
+# 流式聊天事件：结束原因
+class FinishEvent(BaseModel):
+    """模型给出的结束原因，如 stop / tool_calls / length"""
+    type: Literal["finish"] = "finish"
+    finish_reason: str  # 结束原因
+
+
+# 流式聊天事件：token用量
+class UsageEvent(BaseModel):
+    """本次请求的token用量（服务端支持 include_usage 时才会出现）"""
+    type: Literal["usage"] = "usage"
+    prompt_tokens: int = 0  # 提示词token数
+    completion_tokens: int = 0  # 生成token数
+    total_tokens: int = 0  # 总token数
+
+
+# 流式聊天事件：响应完成
+class ResponseDoneEvent(BaseModel):
+    """流正常结束，包含汇总后的完整响应（此时已写入消息历史）"""
+    type: Literal["response_done"] = "response_done"
+    response: ChatOpenAIChatResponse  # 完整响应
+
+
+# 所有流式聊天事件
+ChatStreamEvent = (
+    TextDeltaEvent
+    | ToolCallDeltaEvent
+    | ToolCallReadyEvent
+    | FinishEvent
+    | UsageEvent
+    | ResponseDoneEvent
+)
+
+
+# 增量工具调用组装器，在流式响应过程中尽早识别出已完整的工具调用
+class ToolCallAssembler:
+    """拼接流式返回的工具调用片段，并在某个调用的参数完整时立即交出
+
+    判断完整的依据：出现了更大index的调用（前面的调用不会再有片段），
+    或者参数已经是一个可以完整解析的JSON对象。
+    """
+
+    def __init__(self) -> None:
+        self.tool_calls: list[ToolCall] = []  # 按index排列的工具调用
+        self._ready: set[int] = set()  # 已经交出的调用index
+
+    # 喂入一个流式片段
+    def feed(self, deltas: list[ChoiceDeltaToolCall]) -> list[ToolCall]:
+        """合并一批工具调用片段，返回因此变为完整的工具调用"""
+        for tool_call in deltas:
+            # 确保工具调用列表足够长
+            while len(self.tool_calls) <= tool_call.index:
+                self.tool_calls.append(ToolCall())
+
+            this_tool_call = self.tool_calls[tool_call.index]  # 获取列表中的对象引用
+
+            # 处理工具调用ID
+            if tool_call.id:
+                this_tool_call.id += tool_call.id or ""
+
+            # 处理函数信息
+            if tool_call.function:
+                # 处理函数名称
+                if tool_call.function.name:
+                    this_tool_call.function.name += tool_call.function.name or ""
+                # 处理函数参数
+                if tool_call.function.arguments:
+                    this_tool_call.function.arguments += tool_call.function.arguments or ""
+
+        ready = []
+        last = len(self.tool_calls) - 1
+        for index, tool_call in enumerate(self.tool_calls):
+            if index in self._ready:
+                continue
+            # 后面已有新的调用，或参数JSON已完整
+            if index < last or self._is_complete(tool_call):
+                self._ready.add(index)
+                ready.append(tool_call)
+        return ready
+
+    # 流结束
+    def finish(self) -> list[ToolCall]:
+        """流结束时交出所有尚未交出的工具调用"""
+        ready = [
+            tool_call
+            for index, tool_call in enumerate(self.tool_calls)
+            if index not in self._ready
+        ]
+        self._ready.update(range(len(self.tool_calls)))
+        return ready
+
+    # 判断单个调用是否完整
+    @staticmethod
+    def _is_complete(tool_call: ToolCall) -> bool:
+        """ID、名称齐全，且参数是可以完整解析的JSON对象"""
+        arguments = tool_call.function.arguments.strip()
+        if not (tool_call.id and tool_call.function.name and arguments.endswith("}")):
+            return False
+        try:
+            return isinstance(json.loads(arguments), dict)
+        except json.JSONDecodeError:
+            return False
 
 
 # 异步OpenAI聊天客户端类，用于与OpenAI API进行交互
@@ -57,8 +200,21 @@ class AsyncChatOpenAI:
 
     system_prompt: str = ""  # 系统提示词
     context: str = ""  # 上下文信息
+    stream_usage: bool = True  # 是否请求在流的末尾返回token用量
+    history: HistoryManager | None = None  # 历史管理器，设置后按token预算裁剪发送的消息
+    tool_selector: ToolSelector | None = None  # 工具选择器，设置后每次只发送最相关的工具
+    response_cache: ResponseCache | None = None  # 响应缓存，设置后相同/相似的请求复用已有响应
+    router: EndpointRouter | None = None  # 多端点路由器，设置后请求在多个端点之间路由和对冲
+    pricing: TokenPricing | None = None  # token单价，设置后统计费用
+    usage: UsageStats = field(default_factory=UsageStats)  # 本客户端所有调用的累计用量
+    retry_policy: RetryPolicy | None = field(default_factory=RetryPolicy)  # 重试策略，None时不重试
+    # 熔断器，默认使用按API基础URL共享的熔断器；设置了路由器时由各端点自己的熔断器负责
+    breaker: CircuitBreaker | None = None
 
     llm: AsyncOpenAI = field(init=False)  # OpenAI客户端实例
+    _tools_cache: tuple[list[mcp.Tool], list[ChatCompletionToolParam]] = field(
+        default=([], []), init=False, repr=False
+    )  # (生成定义时的工具列表, 对应的工具定义)
 
     # 延迟初始化：初始化后处理，设置OpenAI客户端并添加系统提示和上下文
     def __post_init__(self) -> None:
@@ -67,32 +223,99 @@ class AsyncChatOpenAI:
         self.llm = AsyncOpenAI(
             api_key=os.environ.get("OPENAI_API_KEY"),  # 从环境变量获取API密钥
             base_url=os.environ.get("OPENAI_BASE_URL"),  # 从环境变量获取API基础URL
+            max_retries=0 if self.retry_policy else 2,  # 由retry_policy统一重试，避免重试次数相乘
         )
+        if self.breaker is None:
+            self.breaker = shared_breaker(str(self.llm.base_url))
         # 如果有系统提示，插入到消息列表开头
         if self.system_prompt:
             self.messages.insert(0, {"role": "system", "content": self.system_prompt})
         # 如果有上下文信息，添加到消息列表
         if self.context:
             self.messages.append({"role": "user", "content": self.context})
+        # 初始化时已有的消息（系统提示、上下文）在裁剪历史时始终保留
+        self._pinned_messages = len(self.messages)
+
+    # 从当前对话分叉出一个新的对话
+    def fork(self, context: str = "") -> Self:
+        """返回从当前位置继续的独立对话分支
+
+        分支复用同一个OpenAI客户端（连接池）、工具列表及其定义缓存、历史管理器、
+        响应缓存和路由器；消息列表只复制引用，消息本身在各分支之间共享（消息写入后不会被修改），
+        之后各分支追加的消息互不可见。用量从零开始单独统计。
+        给出context时作为分支自己的上下文消息追加；对话尚未开始时它与初始消息一样始终保留。
+        """
+        branch = copy.copy(self)
+        branch.messages = list(self.messages)
+        branch.usage = UsageStats()
+        if context:
+            branch.messages.append({"role": "user", "content": context})
+            if len(self.messages) == self._pinned_messages:
+                branch._pinned_messages += 1
+        return branch
 
     # 主要的聊天方法，处理用户提示并返回响应
     async def chat(
-        self, prompt: str = "", print_llm_output: bool = True
+        self,
+        prompt: str = "",
+        print_llm_output: bool = False,
+        on_tool_call: Callable[[ToolCall], None] | None = None,
+        use_cache: bool = True,
     ) -> ChatOpenAIChatResponse:
-        """主聊天方法，处理用户输入并返回AI响应"""
+        """主聊天方法，处理用户输入并返回AI响应
+
+        默认不向标准输出写入任何内容；print_llm_output为True时实时打印生成的文本（适用于命令行示例）。
+        需要逐token处理输出的调用方应使用chat_stream。
+        on_tool_call会在流式响应过程中、每个工具调用的参数一完整就被调用，
+        调用方可以据此提前执行工具，而不必等待整个响应结束。
+        use_cache为False时本次调用绕过响应缓存（既不读取也不写入）。
+        """
         try:
             # 调用内部聊天实现
-            return await self._chat(prompt, print_llm_output)
+            return await self._chat(prompt, print_llm_output, on_tool_call, use_cache)
         except Exception as e:
             # 打印错误信息并重新抛出异常
             rprint(f"Error during chat: {e!s}")
             raise
 
-    # 内部聊天实现，处理与OpenAI API的实际交互
+    # 内部聊天实现，消费流式事件并汇总为完整响应
     async def _chat(
-        self, prompt: str = "", print_llm_output: bool = True
+        self,
+        prompt: str = "",
+        print_llm_output: bool = False,
+        on_tool_call: Callable[[ToolCall], None] | None = None,
+        use_cache: bool = True,
     ) -> ChatOpenAIChatResponse:
-        """内部聊天实现，处理流式响应和工具调用"""
+        """内部聊天实现，按需打印文本并转发完整的工具调用"""
+        response = ChatOpenAIChatResponse()
+        printed_llm_output = False  # 标记是否已经打印了输出
+        async with aclosing(self.chat_stream(prompt, use_cache)) as events:
+            async for event in events:
+                match event:
+                    case TextDeltaEvent(text=text) if print_llm_output:
+                        # 实时显示内容
+                        print(text, end="")
+                        printed_llm_output = True
+                    case ToolCallReadyEvent(tool_call=tool_call) if on_tool_call:
+                        on_tool_call(tool_call)
+                    case ResponseDoneEvent():
+                        response = event.response
+        # 如果打印了输出，添加换行符
+        if printed_llm_output:
+            print()
+        return response
+
+    # 流式聊天方法，逐个产出类型化的事件
+    async def chat_stream(
+        self, prompt: str = "", use_cache: bool = True
+    ) -> AsyncIterator[ChatStreamEvent]:
+        """流式聊天：产出文本增量、工具调用增量、结束原因、用量和最终响应
+
+        只有在调用方取下一个事件时才会继续读取上游（天然背压）；
+        调用方取消或关闭生成器（推荐配合 contextlib.aclosing 使用）时上游流会被关闭，
+        不完整的响应不会写入消息历史。
+        设置了响应缓存时，命中的响应以同样的事件序列回放（没有增量和用量事件）。
+        """
         # 记录聊天开始
         PRETTY_LOGGER.title("CHAT")
         
@@ -100,68 +323,232 @@ class AsyncChatOpenAI:
         if prompt:
             self.messages.append({"role": "user", "content": prompt})
 
+        messages = self.request_messages()
+        tools_definition = await self.select_tools_definition(messages)
+
+        cache = self.response_cache if use_cache else None
+        if cache is None:
+            async for event in self._resilient_completion(messages, tools_definition):
+                yield event
+            return
+
+        key, cached = await cache.get(self.model, messages, tools_definition)
+        if cached is not None:
+            PRETTY_LOGGER.title("RESPONSE (CACHED)")
+            async for event in self._replay(cached):
+                yield event
+            return
+
+        # 本调用是该请求的发起者：完整结束（且未因长度截断）的响应写入缓存
+        try:
+            finish_reason = ""
+            async for event in self._resilient_completion(messages, tools_definition):
+                match event:
+                    case FinishEvent():
+                        finish_reason = event.finish_reason
+                    case ResponseDoneEvent() if finish_reason != "length":
+                        cache.put(key, event.response.model_copy(deep=True))
+                yield event
+        finally:
+            cache.release(key)
+
+    # 带重试和熔断的流式请求
+    async def _resilient_completion(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        tools_definition: list[ChatCompletionToolParam],
+    ) -> AsyncIterator[ChatStreamEvent]:
+        """对可重试的错误做带抖动的指数退避重试
+
+        只有在还没有向调用方产出任何事件时才重试（已输出的部分不能撤回），
+        失败的尝试不会写入消息历史，因此部分输出不会被重复追加；
+        熔断器打开时立即抛出CircuitOpenError，不再等待超时。
+        """
+        breaker = self.breaker if self.router is None else None
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.check()
+            emitted = False
+            try:
+                async for event in self._stream_completion(messages, tools_definition):
+                    emitted = True
+                    yield event
+            except Exception as err:
+                retryable = self.retry_policy is not None and self.retry_policy.is_retryable(err)
+                if breaker is not None and retryable:
+                    breaker.record_failure()  # 只有后端故障计入熔断，请求本身的错误不计
+                elif breaker is not None:
+                    breaker.release()
+                attempt += 1
+                if emitted or not retryable or attempt >= self.retry_policy.max_attempts:
+                    raise
+                delay = self.retry_policy.delay(attempt - 1, err)
+                if delay is None:
+                    raise
+                rprint(f"[yellow]LLM request failed ({err!s}), retry {attempt} in {delay:.2f}s[/yellow]")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # 调用方关闭生成器或被取消：既不算成功也不算失败
+                if breaker is not None:
+                    breaker.release()
+                raise
+            if breaker is not None:
+                breaker.record_success()
+            return
+
+    # 发起一次流式请求
+    async def _stream_completion(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        tools_definition: list[ChatCompletionToolParam],
+    ) -> AsyncIterator[ChatStreamEvent]:
+        """发送请求并把上游的流式块转换为事件，流正常结束后写入消息历史"""
         content = ""  # 存储AI生成的文本内容
-        tool_calls: list[ToolCall] = []  # 存储工具调用信息
-        printed_llm_output = False  # 标记是否已经打印了输出
+        assembler = ToolCallAssembler()  # 组装工具调用信息
+        reported: UsageEvent | None = None  # 服务端返回的用量
+        started = time.perf_counter()  # 请求开始时间
+        first_token_at: float | None = None  # 首token到达时间
         
         # 获取工具定义，如果没有工具则使用NOT_GIVEN
-        param_tools = self.get_tools_definition() or NOT_GIVEN
+        param_tools = tools_definition or NOT_GIVEN
         
-        # 创建流式聊天完成请求
-        async with await self.llm.chat.completions.create(
+        # 创建流式聊天完成请求（设置了路由器时由路由器选择端点）
+        create = self.llm.chat.completions.create if self.router is None else self.router.stream
+        async with await create(
             model=self.model,  # 指定模型
-            messages=self.messages,  # 消息历史
+            messages=messages,  # 消息历史（按预算裁剪）
             tools=param_tools,  # 可用工具
             stream=True,  # 启用流式响应
+            # 在最后一个块中返回token用量
+            stream_options={"include_usage": True} if self.stream_usage else NOT_GIVEN,
         ) as stream:
             # 记录响应开始
             PRETTY_LOGGER.title("RESPONSE")
             
             # 处理流式响应块
             async for chunk in stream:
-                delta = chunk.choices[0].delta
+                # 用量块没有choices
+                if chunk.usage:
+                    reported = UsageEvent(
+                        prompt_tokens=chunk.usage.prompt_tokens,
+                        completion_tokens=chunk.usage.completion_tokens,
+                        total_tokens=chunk.usage.total_tokens,
+                    )
+                    yield reported
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                delta = choice.delta
+                if first_token_at is None and (delta.content or delta.tool_calls):
+                    first_token_at = time.perf_counter()
                 
                 # 处理文本内容
                 if delta.content:
-                    content += delta.content or ""
-                    # 如果需要打印输出，实时显示内容
-                    if print_llm_output:
-                        print(delta.content, end="")
-                        printed_llm_output = True
+                    content += delta.content
+                    yield TextDeltaEvent(text=delta.content)
                 
-                # 处理工具调用
+                # 处理工具调用，参数完整的调用立即交给调用方
                 if delta.tool_calls:
                     for tool_call in delta.tool_calls:
-                        # 确保工具调用列表足够长
-                        if len(tool_calls) <= tool_call.index:
-                            tool_calls.append(ToolCall())
-                        
-                        this_tool_call = tool_calls[tool_call.index] # 获取列表中的对象引用
-                        
-                        # 处理工具调用ID
-                        if tool_call.id:
-                            # 修改 this_tool_call 会直接影响列表中的对象
-                            # tool_calls[tool_call.index].id 也会被同步修改
-                            this_tool_call.id += tool_call.id or ""
-                        
-                        # 处理函数信息
-                        if tool_call.function:
-                            # 处理函数名称
-                            if tool_call.function.name:
-                                this_tool_call.function.name += tool_call.function.name or ""
-                            # 处理函数参数
-                            if tool_call.function.arguments:
-                                this_tool_call.function.arguments += tool_call.function.arguments or ""
-        
-        # 如果打印了输出，添加换行符
-        if printed_llm_output:
-            print()
+                        function = tool_call.function
+                        yield ToolCallDeltaEvent(
+                            index=tool_call.index,
+                            id=tool_call.id or "",
+                            name=(function and function.name) or "",
+                            arguments=(function and function.arguments) or "",
+                        )
+                    for ready in assembler.feed(delta.tool_calls):
+                        yield ToolCallReadyEvent(tool_call=ready)
+
+                if choice.finish_reason:
+                    yield FinishEvent(finish_reason=choice.finish_reason)
+
+        # 流结束时交出剩余的工具调用
+        for ready in assembler.finish():
+            yield ToolCallReadyEvent(tool_call=ready)
+        response = ChatOpenAIChatResponse(
+            content=content,
+            tool_calls=assembler.tool_calls,
+        )
+        response.usage = self._call_usage(
+            messages, tools_definition, response, reported, started, first_token_at
+        )
+        self.usage.add(response.usage)
+        PROCESS_USAGE.add(response.usage)
         
         # 将AI响应添加到消息历史中
+        self._append_response(response)
+        
+        # 产出完整的聊天响应对象
+        yield ResponseDoneEvent(response=response)
+
+    # 回放缓存的响应
+    async def _replay(
+        self, cached: ChatOpenAIChatResponse
+    ) -> AsyncIterator[ChatStreamEvent]:
+        """以与流式请求相同的事件顺序产出缓存的响应，并写入消息历史"""
+        response = cached.model_copy(deep=True)  # 调用方可能修改响应，不共享缓存中的对象
+        response.usage = None  # 命中缓存没有产生新的用量
+        if response.content:
+            yield TextDeltaEvent(text=response.content)
+        for tool_call in response.tool_calls:
+            yield ToolCallReadyEvent(tool_call=tool_call)
+        yield FinishEvent(finish_reason="tool_calls" if response.tool_calls else "stop")
+        self._append_response(response)
+        yield ResponseDoneEvent(response=response)
+
+    # 汇总单次调用的用量
+    def _call_usage(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        tools_definition: list[ChatCompletionToolParam],
+        response: ChatOpenAIChatResponse,
+        reported: UsageEvent | None,
+        started: float,
+        first_token_at: float | None,
+    ) -> UsageStats:
+        """优先使用服务端返回的用量，没有时按请求和响应的文本估算"""
+        finished = time.perf_counter()
+        if reported is not None:
+            prompt_tokens = reported.prompt_tokens
+            completion_tokens = reported.completion_tokens
+        else:
+            prompt_tokens = sum(message_tokens(m) for m in messages) + estimate_tokens(
+                json.dumps(tools_definition, ensure_ascii=False)
+            )
+            completion_tokens = message_tokens(
+                {
+                    "role": "assistant",
+                    "content": response.content,
+                    "tool_calls": [
+                        {"function": tc.function.model_dump()} for tc in response.tool_calls
+                    ],
+                }
+            )
+        first_token_at = first_token_at or finished
+        return UsageStats(
+            calls=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            cost_usd=(
+                self.pricing.cost(prompt_tokens, completion_tokens) if self.pricing else 0.0
+            ),
+            duration_s=finished - started,
+            ttft_s=first_token_at - started,
+            generation_s=finished - first_token_at,
+            estimated=reported is None,
+        )
+
+    # 将AI响应添加到消息历史中
+    def _append_response(self, response: ChatOpenAIChatResponse) -> None:
+        """把完整响应作为assistant消息写入消息历史"""
         self.messages.append(
             {
                 "role": "assistant",
-                "content": content,
+                "content": response.content,
                 "tool_calls": [
                     {
                         "type": "function",
@@ -171,37 +558,53 @@ class AsyncChatOpenAI:
                             "arguments": tc.function.arguments,
                         },
                     }
-                    for tc in tool_calls
+                    for tc in response.tool_calls
                 ],
             }
         )
-        
-        # 返回聊天响应对象
-        return ChatOpenAIChatResponse(
-            content=content,
-            tool_calls=tool_calls,
-        )
+
+    # 获取本次请求实际发送的消息
+    def request_messages(self) -> list[ChatCompletionMessageParam]:
+        """返回本次请求要发送的消息；设置了历史管理器时按token预算裁剪，完整历史保持不变"""
+        if self.history is None:
+            return self.messages
+        return self.history.fit(self.messages, self._pinned_messages)
 
     # 获取工具定义，将MCP工具转换为OpenAI API所需的格式
     def get_tools_definition(self) -> list[ChatCompletionToolParam]:
-        """将MCP工具转换为OpenAI API兼容的工具定义格式"""
-        # if self.tools is None:
-        #     # return NOT_GIVEN
-        #     return []
+        """将MCP工具转换为OpenAI API兼容的工具定义格式
 
-        # else:
-        return [
+        结果会被缓存，只有工具列表被替换（如服务端工具列表变化后刷新）时才重新生成。
+        """
+        cached_tools, definitions = self._tools_cache
+        if len(cached_tools) == len(self.tools) and all(
+            a is b for a, b in zip(cached_tools, self.tools)
+        ):
+            return definitions
+        definitions = [
             ChatCompletionToolParam(
                 type="function",  # 工具类型为函数
                 function=FunctionDefinition(
                     name=t.name,  # 工具名称
-                    # description=t.description ,  # 工具描述，处理None值
                     description=t.description or "",  # 工具描述，处理None值
                     parameters=t.inputSchema,  # 工具输入参数模式
                 ),
             )
             for t in self.tools  # 遍历所有可用工具
         ]
+        self._tools_cache = (list(self.tools), definitions)
+        return definitions
+
+    # 获取本次请求实际发送的工具定义
+    async def select_tools_definition(
+        self, messages: list[ChatCompletionMessageParam]
+    ) -> list[ChatCompletionToolParam]:
+        """返回本次请求要发送的工具定义；设置了工具选择器时只包含与对话最相关的工具"""
+        definitions = self.get_tools_definition()
+        if self.tool_selector is None:
+            return definitions
+        selected = {id(t) for t in await self.tool_selector.select(self.tools, messages)}
+        return [d for t, d in zip(self.tools, definitions) if id(t) in selected]
 
     # 添加工具执行结果到消息历史中
     def append_tool_result(self, tool_call_id: str, tool_output: str) -> None:
@@ -223,7 +626,7 @@ async def example() -> None:
         model=DEFAULT_MODEL_NAME,  # 使用默认模型
     )
     # 发送聊天请求
-    chat_resp = await llm.chat(prompt="Hello")
+    chat_resp = await llm.chat(prompt="Hello", print_llm_output=True)
     # 打印响应结果
     rprint(chat_resp)
 
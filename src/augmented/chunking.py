@@ -0,0 +1,258 @@
+"""
+文档分块模块：以流式方式读取文件并切分为带重叠的、按token估算大小的文本块
+
+- 逐行（超长行分段）读取文件，不会一次性把整个文件或整行加载到内存
+- 遵循markdown结构：标题开启新的块，段落（空行分隔）是最小切分单位
+- 超长段落按句子/单词再切分，保证每个块都不超过token上限
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+import re
+from typing import Iterable, Iterator
+
+# 估算token数量的正则：CJK字符按单字计，英文按单词计，标点按单个符号计
+_CJK_RANGES = "぀-ヿ㐀-鿿가-힯"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK_RANGES}]|[^\W{_CJK_RANGES}]+|[^\w\s]")
+# markdown标题行（# ~ ######）
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s")
+# 超长段落的切分点：句末标点之后或空白处（捕获分隔符，切分后原样拼回）
+_SPLIT_PATTERN = re.compile(r"((?<=[。！？.!?；;])\s*|\s+)")
+
+# 单个段落在没有空行的情况下最多累积的字符数，防止异常文件撑爆内存
+MAX_BLOCK_CHARS = 16_384
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数量（不依赖具体模型的分词器）"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def tokenize(text: str) -> list[str]:
+    """按与estimate_tokens相同的规则切分出小写token（用于词法检索）"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def head_text(text: str, max_tokens: int) -> str:
+    """截取文本开头不超过max_tokens个token的部分"""
+    if max_tokens <= 0:
+        return ""
+    for i, m in enumerate(_TOKEN_PATTERN.finditer(text)):
+        if i == max_tokens:
+            return text[: m.start()]
+    return text
+
+
+def tail_text(text: str, max_tokens: int) -> str:
+    """截取文本末尾不超过max_tokens个token的部分"""
+    if max_tokens <= 0:
+        return ""
+    starts = [m.start() for m in _TOKEN_PATTERN.finditer(text)]
+    if len(starts) <= max_tokens:
+        return text
+    return text[starts[-max_tokens] :]
+
+
+def iter_file_blocks(path: Path, encoding: str = "utf-8") -> Iterator[str]:
+    """逐行读取文件，按markdown标题和空行产出段落块
+
+    每次最多读取MAX_BLOCK_CHARS个字符，没有换行的超长行也不会被整体读入内存。
+    """
+    lines: list[str] = []  # 当前段落的行
+    size = 0  # 当前段落的字符数
+    at_line_start = True  # 本次读到的内容是否从行首开始（超长行会被分多次读取）
+    with path.open(encoding=encoding) as f:
+        while line := f.readline(MAX_BLOCK_CHARS):
+            starts_line, at_line_start = at_line_start, line.endswith("\n")
+            # 标题行之前结束当前段落，标题本身单独作为一个块
+            if starts_line and _HEADING_PATTERN.match(line):
+                if lines:
+                    yield "".join(lines).strip()
+                    lines, size = [], 0
+                yield line.strip()
+                continue
+            # 空行表示段落结束
+            if starts_line and not line.strip():
+                if lines:
+                    yield "".join(lines).strip()
+                    lines, size = [], 0
+                continue
+            lines.append(line)
+            size += len(line)
+            # 段落过长时强制切断，保证内存占用有上限
+            if size >= MAX_BLOCK_CHARS:
+                yield "".join(lines).strip()
+                lines, size = [], 0
+    if lines:
+        yield "".join(lines).strip()
+
+
+# 文本块，包含块内容、来源文件和块在文件中的序号
+@dataclass
+class TextChunk:
+    """切分后的单个文本块"""
+
+    text: str  # 块的文本内容
+    source: str = ""  # 来源（通常是文件路径）
+    index: int = 0  # 块在来源中的序号
+
+
+# markdown分块器，按token上限聚合段落，并在相邻块之间保留重叠
+@dataclass
+class MarkdownChunker:
+    """按token上限把段落块聚合成带重叠的文本块"""
+
+    max_tokens: int = 512  # 每个块的token上限
+    overlap_tokens: int = 64  # 相邻块之间重叠的token数
+
+    def __post_init__(self) -> None:
+        """校验参数"""
+        if self.max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if not 0 <= self.overlap_tokens < self.max_tokens:
+            raise ValueError("overlap_tokens must be in [0, max_tokens)")
+
+    # 对单个文件进行流式分块
+    def chunk_file(self, path: Path, encoding: str = "utf-8") -> Iterator[TextChunk]:
+        """流式读取文件并产出文本块"""
+        return self.chunk_blocks(iter_file_blocks(path, encoding), source=str(path))
+
+    # 对段落块序列进行分块
+    def chunk_blocks(self, blocks: Iterable[str], source: str = "") -> Iterator[TextChunk]:
+        """把段落块聚合成不超过max_tokens的文本块"""
+        builder = self.builder(source)
+        for block in blocks:
+            yield from builder.feed(block)
+        yield from builder.finish()
+
+    # 创建增量分块构建器
+    def builder(self, source: str = "") -> "ChunkBuilder":
+        """返回一个可以逐块喂入段落的分块构建器（适用于异步流水线）"""
+        return ChunkBuilder(self, source)
+
+    # 保留当前块末尾不超过overlap_tokens的段落，作为下一块的开头
+    def _keep_overlap(self, current: deque[tuple[str, int]], current_tokens: int) -> int:
+        """从头部弹出段落，直到剩余部分不超过overlap_tokens"""
+        last_piece = current[-1][0]
+        while current and current_tokens > self.overlap_tokens:
+            _, tokens = current.popleft()
+            current_tokens -= tokens
+        # 最后一个段落本身就超过重叠上限时，截取它的末尾作为重叠
+        if not current and self.overlap_tokens:
+            tail = tail_text(last_piece, self.overlap_tokens)
+            current_tokens = estimate_tokens(tail)
+            current.append((tail, current_tokens))
+        return current_tokens
+
+    # 把超过max_tokens的单个段落切成多个片段
+    def _split_oversized(self, block: str) -> Iterator[str]:
+        """按句子/空白切分超长段落，每个片段加上重叠部分后不超过max_tokens"""
+        if estimate_tokens(block) <= self.max_tokens:
+            yield block
+            return
+        limit = self.max_tokens - self.overlap_tokens  # 为重叠部分预留空间
+        parts: list[str] = []
+        tokens = 0
+        for unit in _split_units(block):
+            unit_tokens = estimate_tokens(unit)
+            # 单个单元本身就超限（如无空白的长串），按token硬切
+            if unit_tokens > limit:
+                if parts:
+                    yield "".join(parts).strip()
+                    parts, tokens = [], 0
+                starts = [m.start() for m in _TOKEN_PATTERN.finditer(unit)]
+                for start in range(0, len(starts), limit):
+                    end = starts[start + limit] if start + limit < len(starts) else None
+                    yield unit[starts[start] : end].strip()
+                continue
+            if tokens + unit_tokens > limit:
+                yield "".join(parts).strip()
+                parts, tokens = [], 0
+            parts.append(unit)
+            tokens += unit_tokens
+        if parts:
+            yield "".join(parts).strip()
+
+
+# 把段落切分为句子/单词单元
+def _split_units(block: str) -> Iterator[str]:
+    """按句末标点和空白切分，分隔符留在前一个单元的末尾，拼接所有单元即得到原文"""
+    pieces = _SPLIT_PATTERN.split(block)
+    for i in range(0, len(pieces), 2):
+        unit = pieces[i] + (pieces[i + 1] if i + 1 < len(pieces) else "")
+        if unit:
+            yield unit
+
+
+# 增量分块构建器，保存单个来源的分块状态
+@dataclass
+class ChunkBuilder:
+    """逐个接收段落块，凑满一个文本块就立即产出"""
+
+    chunker: MarkdownChunker  # 分块参数
+    source: str = ""  # 来源
+
+    def __post_init__(self) -> None:
+        self._current: deque[tuple[str, int]] = deque()  # 当前块中的(段落, token数)
+        self._current_tokens = 0
+        self._has_new = False  # 当前块是否包含重叠部分之外的新内容
+        self._index = 0
+
+    # 喂入一个段落块
+    def feed(self, block: str) -> list[TextChunk]:
+        """喂入一个段落块，返回因此而完成的文本块"""
+        if not block:
+            return []
+        chunker = self.chunker
+        done: list[TextChunk] = []
+        is_heading = bool(_HEADING_PATTERN.match(block))
+        for piece in chunker._split_oversized(block):
+            piece_tokens = estimate_tokens(piece)
+            # 遇到标题或放不下时先输出当前块；标题不跨块重叠
+            if self._current and (
+                is_heading or self._current_tokens + piece_tokens > chunker.max_tokens
+            ):
+                if self._has_new:
+                    done.append(self._emit())
+                if is_heading:
+                    self._current.clear()
+                    self._current_tokens = 0
+                else:
+                    self._current_tokens = chunker._keep_overlap(
+                        self._current, self._current_tokens
+                    )
+                # 重叠部分加上新段落仍超限时，丢弃重叠
+                if self._current_tokens + piece_tokens > chunker.max_tokens:
+                    self._current.clear()
+                    self._current_tokens = 0
+                self._has_new = False
+            self._current.append((piece, piece_tokens))
+            self._current_tokens += piece_tokens
+            self._has_new = True
+        return done
+
+    # 结束输入
+    def finish(self) -> list[TextChunk]:
+        """输入结束，返回剩余的最后一个文本块（如果有）"""
+        if self._current and self._has_new:
+            self._has_new = False
+            return [self._emit()]
+        return []
+
+    def _emit(self) -> TextChunk:
+        chunk = TextChunk(
+            "\n\n".join(p for p, _ in self._current), self.source, self._index
+        )
+        self._index += 1
+        return chunk
+
+
+# 对多个文件依次进行流式分块
+def iter_path_chunks(
+    paths: Iterable[Path], chunker: MarkdownChunker | None = None
+) -> Iterator[TextChunk]:
+    """依次流式读取多个文件并产出文本块"""
+    chunker = chunker or MarkdownChunker()
+    for path in paths:
+        yield from chunker.chunk_file(path)
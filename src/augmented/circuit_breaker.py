@@ -0,0 +1,106 @@
+"""
+熔断器模块：后端持续失败时让调用方快速失败，而不是继续堆积超时
+
+- closed：正常放行，连续失败达到阈值后打开
+- open：直接拒绝，reset_timeout_s后进入half_open
+- half_open：只放行一个探测请求，成功则关闭，失败则重新打开
+"""
+
+from dataclasses import dataclass, field
+import time
+from typing import Literal
+
+
+# 熔断器打开时抛出的异常
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+    def __init__(self, name: str, retry_after_s: float) -> None:
+        super().__init__(f"circuit {name!r} is open, retry after {retry_after_s:.1f}s")
+        self.name = name  # 熔断器名称
+        self.retry_after_s = retry_after_s  # 距离允许探测还需等待的秒数
+
+
+# 熔断器
+@dataclass
+class CircuitBreaker:
+    """按连续失败次数打开、按冷却时间半开探测的熔断器（可在多个调用方之间共享）"""
+
+    name: str = "default"  # 名称，用于日志和异常信息
+    failure_threshold: int = 5  # 连续失败多少次后打开
+    reset_timeout_s: float = 30.0  # 打开后多久允许一次探测
+
+    state: Literal["closed", "open", "half_open"] = field(default="closed", init=False)
+    _failures: int = field(default=0, init=False, repr=False)  # 连续失败次数
+    _opened_at: float = field(default=0.0, init=False, repr=False)  # 打开的时间
+    _probing: bool = field(default=False, init=False, repr=False)  # 是否有探测请求在途
+
+    # 距离允许探测还需等待的秒数
+    @property
+    def retry_after_s(self) -> float:
+        """打开状态下剩余的冷却时间，其他状态为0"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout_s - time.monotonic())
+
+    # 是否可能放行（不改变状态）
+    @property
+    def available(self) -> bool:
+        """关闭状态、冷却已结束的打开状态、或没有探测在途的半开状态"""
+        if self.state == "open":
+            return self.retry_after_s == 0
+        return not (self.state == "half_open" and self._probing)
+
+    # 是否放行一个请求
+    def allow(self) -> bool:
+        """判断是否放行；放行half_open状态的探测请求后，在其结果记录前不再放行"""
+        if self.state == "open":
+            if self.retry_after_s > 0:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    # 检查是否放行，不放行时抛出异常
+    def check(self) -> None:
+        """不放行时抛出CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after_s)
+
+    # 记录成功
+    def record_success(self) -> None:
+        """请求成功：关闭熔断器并清零失败计数"""
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+
+    # 记录失败
+    def record_failure(self) -> None:
+        """请求失败：探测失败或连续失败达到阈值时打开熔断器"""
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+    # 放弃探测
+    def release(self) -> None:
+        """放行的请求被取消（既不算成功也不算失败）时调用，允许下一个探测请求"""
+        self._probing = False
+
+
+# 进程内按名称共享的熔断器
+_SHARED_BREAKERS: dict[str, CircuitBreaker] = {}
+
+
+# 获取共享熔断器
+def shared_breaker(name: str) -> CircuitBreaker:
+    """返回名称对应的进程内共享熔断器（不存在时创建），访问同一后端的调用方共用一个"""
+    breaker = _SHARED_BREAKERS.get(name)
+    if breaker is None:
+        breaker = _SHARED_BREAKERS[name] = CircuitBreaker(name=name)
+    return breaker
@@ -0,0 +1,109 @@
+"""
+嵌入微批处理模块：把并发的单条文本嵌入请求合并为一次数组请求
+
+收集max_wait_ms毫秒内或max_batch_size条以内的请求，一次性发送，
+每个调用方的future用它自己对应的向量完成，延迟代价最多为max_wait_ms。
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from augmented.vector_store import Embedding
+
+
+# 微批处理统计信息
+@dataclass
+class MicroBatchStats:
+    """微批处理的统计计数器"""
+
+    requests: int = 0  # 提交的单条请求数
+    batches: int = 0  # 实际发送的批次数
+
+    # 平均每批包含的请求数
+    @property
+    def avg_batch_size(self) -> float:
+        """平均批大小，越大说明合并效果越好"""
+        return self.requests / self.batches if self.batches else 0.0
+
+
+# 嵌入微批处理器
+@dataclass
+class EmbeddingMicroBatcher:
+    """收集并发的单条嵌入请求，按时间窗口或数量上限合并发送"""
+
+    embed_batch: Callable[[list[str]], Awaitable[np.ndarray | None]]  # 批量嵌入函数
+    max_wait_ms: float = 5.0  # 第一条请求到达后最多等待的毫秒数
+    max_batch_size: int = 32  # 每批最多包含的请求数
+    stats: MicroBatchStats = field(default_factory=MicroBatchStats)  # 统计信息
+
+    _pending: list[tuple[str, asyncio.Future[Embedding | None]]] = field(
+        default_factory=list, init=False, repr=False
+    )  # 等待发送的(文本, future)
+    _timer: asyncio.TimerHandle | None = field(default=None, init=False, repr=False)  # 窗口定时器
+    _tasks: set[asyncio.Task[None]] = field(
+        default_factory=set, init=False, repr=False
+    )  # 正在发送的批次任务（保持引用，防止被回收）
+
+    # 提交单条文本
+    async def submit(self, text: str) -> Embedding | None:
+        """提交一条文本，等待所在批次完成后返回它的向量"""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Embedding | None] = loop.create_future()
+        self._pending.append((text, future))
+        self.stats.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()  # 数量达到上限，立即发送
+        elif self._timer is None:
+            # 窗口中的第一条请求，启动定时器
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    # 发送当前窗口中的所有请求
+    def _flush(self) -> None:
+        """取出等待中的请求，作为一个批次发送"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.stats.batches += 1
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # 执行一个批次并分发结果
+    async def _run(
+        self, batch: list[tuple[str, asyncio.Future[Embedding | None]]]
+    ) -> None:
+        """发送批量请求，把结果按顺序分发给各个调用方
+
+        无论批次成功、失败还是被取消，每个调用方的future都会被完成，不会一直等待。
+        """
+        error: BaseException | None = None
+        try:
+            embeddings = await self.embed_batch([text for text, _ in batch])
+            if embeddings is not None and len(embeddings) != len(batch):
+                raise ValueError(
+                    f"embedding provider returned {len(embeddings)} vectors "
+                    f"for {len(batch)} texts"
+                )
+            for i, (_, future) in enumerate(batch):
+                if future.done():
+                    continue  # 调用方已取消
+                # 批量请求失败时，每个调用方都得到None，与单条请求的行为一致
+                future.set_result(embeddings[i] if embeddings is not None else None)
+        except Exception as err:
+            error = err
+        finally:
+            for _, future in batch:
+                if future.done():
+                    continue
+                if error is None:
+                    future.cancel()  # 批次任务本身被取消
+                else:
+                    future.set_exception(error)
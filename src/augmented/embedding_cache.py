@@ -0,0 +1,95 @@
+"""
+查询嵌入缓存模块：有界LRU缓存 + 在途请求合并（single-flight）
+
+- 重复的查询直接命中LRU，不再发起HTTP请求
+- 并发的相同查询共享同一个在途请求，只调用一次嵌入API
+- 统计计数器记录命中、合并和实际API调用次数
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from augmented.vector_store import Embedding
+
+
+# 缓存统计信息
+@dataclass
+class EmbeddingCacheStats:
+    """查询嵌入缓存的统计计数器"""
+
+    hits: int = 0  # LRU命中次数
+    coalesced: int = 0  # 合并到在途请求的次数
+    misses: int = 0  # 实际发起API调用的次数
+
+    # 节省的API调用次数
+    @property
+    def saved_calls(self) -> int:
+        """命中和合并都节省了一次API调用"""
+        return self.hits + self.coalesced
+
+
+# 查询嵌入缓存类
+@dataclass
+class QueryEmbeddingCache:
+    """有界LRU查询嵌入缓存，并发的相同查询只发起一次请求"""
+
+    max_size: int = 1024  # 缓存的最大条目数
+    stats: EmbeddingCacheStats = field(default_factory=EmbeddingCacheStats)  # 统计信息
+
+    _entries: OrderedDict[str, Embedding] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )  # 已缓存的嵌入，按最近使用排序
+    _inflight: dict[str, asyncio.Task[Embedding | None]] = field(
+        default_factory=dict, init=False, repr=False
+    )  # 在途请求
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # 读取缓存，未命中时计算并写入
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Embedding | None]]
+    ) -> Embedding | None:
+        """返回key对应的嵌入；缓存未命中时调用compute，并发的相同key共享一次调用"""
+        embedding = self._entries.get(key)
+        if embedding is not None:
+            self._entries.move_to_end(key)  # 标记为最近使用
+            self.stats.hits += 1
+            return embedding
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        # shield：某个调用方被取消时不影响其他等待同一请求的调用方
+        return await asyncio.shield(task)
+
+    # 在途请求完成后的回调
+    def _on_done(self, key: str, task: asyncio.Task[Embedding | None]) -> None:
+        """移除在途记录，成功的结果写入LRU"""
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        embedding = task.result()
+        if embedding is None:
+            return  # 失败的结果不缓存
+        self.put(key, embedding)
+
+    # 写入缓存
+    def put(self, key: str, embedding: Embedding) -> None:
+        """写入一条嵌入，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    # 清空缓存
+    def clear(self) -> None:
+        """清空已缓存的嵌入（不影响在途请求和统计信息）"""
+        self._entries.clear()
@@ -0,0 +1,191 @@
+"""
+嵌入提供者模块：定义嵌入提供者接口及其实现
+
+- OpenAIEmbeddingProvider: 调用OpenAI兼容的HTTP嵌入接口
+- LocalHashingEmbeddingProvider: 本地CPU实现（特征哈希 + 可选IDF + 随机投影），无需网络
+"""
+
+import asyncio
+import base64
+from dataclasses import dataclass, field
+import math
+import os
+import re
+from typing import Iterable, Literal, Protocol, Self
+import zlib
+
+import httpx
+import numpy as np
+
+
+# 嵌入提供者接口
+class EmbeddingProvider(Protocol):
+    """嵌入提供者接口：把一批文本转换为 (len(texts), dim) 的float32矩阵，
+    行顺序与输入一致，失败时返回None"""
+
+    async def embed(self, texts: list[str]) -> np.ndarray | None: ...
+
+
+# OpenAI兼容的HTTP嵌入提供者
+@dataclass
+class OpenAIEmbeddingProvider:
+    """调用OpenAI兼容的 /embeddings 接口生成向量"""
+
+    model: str  # 嵌入模型名称
+    # 嵌入API的基础URL，默认优先使用EMBEDDING_BASE_URL，其次使用OPENAI_BASE_URL
+    base_url: str | None = None
+    # API密钥，默认优先使用EMBEDDING_KEY，其次使用OPENAI_API_KEY
+    api_key: str | None = None
+    # 响应编码格式：base64直接解码为float32缓冲区，避免解析上千个十进制浮点数
+    encoding_format: Literal["base64", "float"] = "base64"
+
+    def __post_init__(self) -> None:
+        """从环境变量补全未指定的连接参数"""
+        self.base_url = (
+            self.base_url
+            or os.environ.get("EMBEDDING_BASE_URL")
+            or os.environ.get("OPENAI_BASE_URL")
+        )
+        self.api_key = (
+            self.api_key
+            or os.environ.get("EMBEDDING_KEY")
+            or os.environ.get("OPENAI_API_KEY")
+        )
+
+    async def embed(self, texts: list[str]) -> np.ndarray | None:
+        """调用嵌入API将一批文本转换为向量表示"""
+        url = f"{self.base_url}/embeddings"  # 构建完整的API端点URL
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",  # 认证头
+            "Content-Type": "application/json",  # 内容类型头
+        }
+        data = {
+            "model": self.model,  # 指定嵌入模型
+            "input": texts,  # 输入文本列表
+            "encoding_format": self.encoding_format,  # 响应中向量的编码格式
+        }
+        # 使用异步HTTP客户端发送请求
+        async with httpx.AsyncClient() as client:
+            try:
+                # 发送POST请求到嵌入API
+                response = await client.post(url, headers=headers, json=data)
+                response.raise_for_status()  # 检查HTTP状态码，出错时抛出异常
+                resp_data = response.json()  # 解析JSON响应
+                # 按index排序后提取嵌入向量，保证与输入顺序一致
+                items = sorted(resp_data["data"], key=lambda d: d.get("index", 0))
+                return decode_embeddings([d["embedding"] for d in items])
+            except httpx.HTTPStatusError as http_err:
+                # 处理HTTP状态错误
+                print(f"HTTP error occurred: {http_err}")
+            except Exception as err:
+                # 处理其他异常
+                print(f"An error occurred: {err}")
+        return None
+
+
+# 解码嵌入API返回的向量
+def decode_embeddings(raw: list[str] | list[list[float]]) -> np.ndarray:
+    """把响应中的向量解码为 (n, dim) 的float32矩阵
+
+    base64格式（小端float32）拼接后一次性frombuffer，不经过Python浮点数列表；
+    服务端忽略encoding_format仍返回浮点数列表时，按普通数组转换。
+    """
+    if raw and isinstance(raw[0], str):
+        buffer = b"".join(base64.b64decode(item) for item in raw)
+        return np.frombuffer(buffer, dtype="<f4").reshape(len(raw), -1)
+    return np.asarray(raw, dtype=np.float32)
+
+
+# 本地分词：英文按单词（小写），CJK按单字
+_WORD_PATTERN = re.compile(r"[぀-ヿ㐀-鿿가-힯]|[^\W぀-ヿ㐀-鿿가-힯]+")
+
+
+# 本地哈希嵌入提供者
+@dataclass
+class LocalHashingEmbeddingProvider:
+    """本地CPU嵌入：特征哈希得到稀疏词频向量，经固定随机投影降维并归一化
+
+    特征包括单词（CJK单字）和相邻词对；哈希使用crc32，跨进程结果稳定，
+    因此离线构建的索引可以在任意进程中直接查询。调用fit()后会按IDF加权。
+    """
+
+    dim: int = 384  # 输出向量维度
+    n_features: int = 1 << 14  # 哈希特征空间大小
+    seed: int = 0  # 随机投影矩阵的种子
+
+    _projection: np.ndarray = field(init=False, repr=False)  # (n_features, dim) 投影矩阵
+    _idf: np.ndarray | None = field(default=None, init=False, repr=False)  # IDF权重
+
+    def __post_init__(self) -> None:
+        """生成固定的随机投影矩阵（高斯分布，按维度缩放）"""
+        rng = np.random.default_rng(self.seed)
+        self._projection = rng.standard_normal(
+            (self.n_features, self.dim), dtype=np.float32
+        ) / np.float32(math.sqrt(self.dim))
+
+    # 提取文本的哈希特征
+    def _features(self, text: str) -> list[int]:
+        """返回文本中所有单词和相邻词对的特征编号（带符号位：负数表示-1权重）"""
+        words = _WORD_PATTERN.findall(text.lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        features = []
+        for gram in grams:
+            h = zlib.crc32(gram.encode())
+            index = h % self.n_features
+            # 用哈希的最高位决定符号，减小哈希冲突带来的偏差
+            features.append(index if h & 0x80000000 else ~index)
+        return features
+
+    # 把单条文本转换为稀疏词频行
+    def _term_row(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """返回 (特征编号, 带符号次线性词频)，只包含非零项，编号升序且不重复"""
+        features = np.asarray(self._features(text), dtype=np.int64)
+        if features.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        signs = np.where(features >= 0, 1.0, -1.0)
+        indices, inverse = np.unique(
+            np.where(features >= 0, features, ~features), return_inverse=True
+        )
+        counts = np.bincount(inverse, weights=signs)
+        nonzero = counts != 0  # 正负号抵消的特征视为未出现
+        indices, counts = indices[nonzero], counts[nonzero]
+        # 次线性词频：sign(tf) * (1 + log|tf|)
+        values = np.sign(counts) * (1 + np.log(np.abs(counts)))
+        return indices, values.astype(np.float32)
+
+    # 用语料拟合IDF权重
+    def fit(self, documents: Iterable[str]) -> Self:
+        """根据语料计算各哈希特征的IDF权重；拟合前后生成的向量不可混用
+
+        逐条文档累加文档频率，内存占用只有一个长度为n_features的计数数组。
+        """
+        df = np.zeros(self.n_features, dtype=np.int64)
+        n_documents = 0
+        for document in documents:
+            indices, _ = self._term_row(document)
+            df[indices] += 1  # 编号不重复，可以直接累加
+            n_documents += 1
+        self._idf = np.log((1 + n_documents) / (1 + df)).astype(np.float32) + 1
+        return self
+
+    # 同步计算嵌入
+    def embed_sync(self, texts: list[str]) -> np.ndarray:
+        """返回 (len(texts), dim) 的L2归一化嵌入矩阵
+
+        每条文本只取出投影矩阵中它出现过的行相乘，不生成 (len(texts), n_features) 的稠密矩阵。
+        """
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, values = self._term_row(text)
+            if indices.size == 0:
+                continue  # 空文本保持零向量
+            if self._idf is not None:
+                values = values * self._idf[indices]
+            embeddings[row] = values @ self._projection[indices]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+    async def embed(self, texts: list[str]) -> np.ndarray | None:
+        """本地计算嵌入（在线程池中执行，不阻塞事件循环），不发起任何网络请求"""
+        return await asyncio.to_thread(self.embed_sync, texts)
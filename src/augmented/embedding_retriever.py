@@ -1,10 +1,45 @@
+import asyncio
 from dataclasses import dataclass, field
-import os
+import itertools
+from pathlib import Path
+import time
+from typing import Iterable
 
-import httpx
+import numpy as np
 from rich import print as rprint
 
-from augmented.vector_store import VectorStore, VectorStoreItem
+from augmented.chunking import MarkdownChunker, TextChunk, iter_path_chunks
+from augmented.embedding_batcher import EmbeddingMicroBatcher
+from augmented.embedding_cache import QueryEmbeddingCache
+from augmented.embedding_provider import EmbeddingProvider, OpenAIEmbeddingProvider
+from augmented.vector_store import Embedding, VectorStore, VectorStoreItem
+
+
+# 带SLO的检索结果
+@dataclass
+class RetrievalResult:
+    """检索结果；degraded为True表示查询嵌入超时或失败，结果来自词法检索兜底"""
+
+    items: list[VectorStoreItem]  # 检索到的文档
+    degraded: bool = False  # 是否走了降级路径
+    reason: str = ""  # 降级原因："timeout" 或 "embedding_failed"
+    elapsed_s: float = 0.0  # 检索耗时（秒）
+
+
+# 检索SLO统计信息
+@dataclass
+class RetrievalSloStats:
+    """带截止时间检索的计数器，可用于对降级事件告警"""
+
+    total: int = 0  # 带截止时间的检索总数
+    timeouts: int = 0  # 查询嵌入超时而降级的次数
+    embedding_failures: int = 0  # 查询嵌入失败而降级的次数
+
+    # 降级总次数
+    @property
+    def degraded(self) -> int:
+        """走降级路径的总次数"""
+        return self.timeouts + self.embedding_failures
 
 
 # 嵌入检索器类，负责处理文本嵌入和向量检索
@@ -13,62 +48,197 @@ class EembeddingRetriever:
     """嵌入检索器，处理文本嵌入生成和向量相似性检索"""
     
     embedding_model: str  # 使用的嵌入模型名称
+    # 嵌入提供者，默认使用OpenAI兼容的HTTP接口；可替换为本地实现以实现零网络检索
+    provider: EmbeddingProvider | None = None
     vector_store: VectorStore = field(default_factory=VectorStore)  # 向量存储实例
+    query_cache: QueryEmbeddingCache = field(
+        default_factory=QueryEmbeddingCache
+    )  # 查询嵌入缓存
+    # 查询微批处理（可选）：设置后，并发的embed_query会在该毫秒窗口内合并为一次数组请求
+    micro_batch_wait_ms: float | None = None
+    micro_batch_size: int = 32  # 每个微批最多包含的查询数
+    retrieval_timeout_s: float = 1.0  # retrieve_with_deadline的默认截止时间（秒）
+    slo_stats: RetrievalSloStats = field(default_factory=RetrievalSloStats)  # 检索SLO统计
+
+    _batcher: EmbeddingMicroBatcher | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """创建默认的嵌入提供者，并按配置创建查询微批处理器"""
+        if self.provider is None:
+            self.provider = OpenAIEmbeddingProvider(self.embedding_model)
+        if self.micro_batch_wait_ms is not None:
+            self._batcher = EmbeddingMicroBatcher(
+                self.embed_batch,
+                max_wait_ms=self.micro_batch_wait_ms,
+                max_batch_size=self.micro_batch_size,
+            )
 
     # 内部嵌入方法，调用嵌入API生成文本向量
-    async def _embed(self, text: str) -> list[float] | None:
-        """内部方法：调用嵌入API将文本转换为向量表示"""
-        # 获取嵌入API的基础URL，优先使用EMBEDDING_BASE_URL，其次使用OPENAI_BASE_URL
-        base_url = os.environ.get("EMBEDDING_BASE_URL") or os.environ.get(
-            "OPENAI_BASE_URL"
-        )
-        # 获取API密钥，优先使用EMBEDDING_KEY，其次使用OPENAI_API_KEY
-        api_key = os.environ.get("EMBEDDING_KEY") or os.environ.get("OPENAI_API_KEY")
-        url = f"{base_url}/embeddings"  # 构建完整的API端点URL
-        headers = {
-            "Authorization": f"Bearer {api_key}",  # 认证头
-            "Content-Type": "application/json",  # 内容类型头
-        }
-        data = {
-            "model": self.embedding_model,  # 指定嵌入模型
-            "input": text,  # 输入文本
-            "encoding_format": "float",  # 编码格式为浮点数
-        }
-        # 使用异步HTTP客户端发送请求
-        async with httpx.AsyncClient() as client:
-            try:
-                # 发送POST请求到嵌入API
-                response = await client.post(url, headers=headers, json=data)
-                response.raise_for_status()  # 检查HTTP状态码，出错时抛出异常
-                rprint(response)  # 打印响应信息（用于调试）
-                resp_data = response.json()  # 解析JSON响应
-                result: list[float] = resp_data["data"][0]["embedding"]  # 提取嵌入向量
-                rprint(result)  # 打印嵌入向量（用于调试）
-                return result  # 返回嵌入向量
-            except httpx.HTTPStatusError as http_err:
-                # 处理HTTP状态错误
-                print(f"HTTP error occurred: {http_err}")
-            except Exception as err:
-                # 处理其他异常
-                print(f"An error occurred: {err}")
+    async def _embed(self, text: str) -> Embedding | None:
+        """内部方法：调用嵌入提供者将文本转换为向量表示"""
+        result = await self.embed_batch([text])  # 单条文本作为长度为1的批次
+        return result[0] if result is not None else None  # 返回嵌入向量
+
+    # 批量嵌入方法，一次调用为多条文本生成向量
+    async def embed_batch(self, texts: list[str]) -> np.ndarray | None:
+        """调用嵌入提供者将一批文本转换为 (len(texts), dim) 的向量矩阵，顺序与输入一致，失败时返回None
+
+        只计算向量，不写入向量存储（供摄取流水线等自行决定如何存储）。
+        """
+        return await self.provider.embed(texts)
 
     # 查询嵌入方法，将查询文本转换为向量
-    async def embed_query(self, query: str) -> list[float] | None:
-        """将查询文本转换为嵌入向量"""
-        result = await self._embed(query)  # 调用内部嵌入方法
+    async def embed_query(self, query: str) -> Embedding | None:
+        """将查询文本转换为嵌入向量，重复和并发的相同查询复用缓存"""
+        # 优先读取缓存，未命中时交给微批处理器或直接调用内部嵌入方法
+        batcher = self._batcher
+        result = await self.query_cache.get_or_compute(
+            query,
+            (lambda: batcher.submit(query)) if batcher else (lambda: self._embed(query)),
+        )
         return result  # 返回嵌入向量
 
     # 文档嵌入方法，将文档文本转换为向量并存储
-    async def embed_documents(self, document: str) -> list[float] | None:
+    async def embed_documents(self, document: str) -> Embedding | None:
         """将文档文本转换为嵌入向量并添加到向量存储"""
         result = await self._embed(document)  # 调用内部嵌入方法生成向量
         # 将文档和对应的嵌入向量添加到向量存储
         self.vector_store.add(VectorStoreItem(embedding=result, document=document))
         return result  # 返回嵌入向量
 
+    # 流式文档嵌入方法，分批嵌入文本块并存储，带背压控制
+    async def embed_chunks(
+        self,
+        chunks: Iterable[TextChunk],
+        batch_size: int = 16,
+        max_inflight: int = 2,
+    ) -> int:
+        """分批嵌入文本块并添加到向量存储，返回成功存储的块数量
+
+        最多同时有max_inflight个批次在请求中，达到上限时暂停从chunks中拉取，
+        因此无论输入多大，内存中最多只有 batch_size * (max_inflight + 1) 个块。
+        """
+        pending: set[asyncio.Task[int]] = set()  # 正在请求中的批次
+        stored = 0  # 成功存储的块数量
+
+        async def embed_and_store(batch: list[TextChunk]) -> int:
+            embeddings = await self.embed_batch([c.text for c in batch])
+            if embeddings is None:
+                return 0  # 该批次失败，错误已在embed_batch中打印
+            for chunk, embedding in zip(batch, embeddings):
+                self.vector_store.add(
+                    VectorStoreItem(
+                        embedding=embedding, document=chunk.text, source=chunk.source
+                    )
+                )
+            return len(batch)
+
+        try:
+            for batch in itertools.batched(chunks, batch_size):
+                # 背压：在途批次达到上限时，等待至少一个完成再继续读取
+                while len(pending) >= max_inflight:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    stored += sum(t.result() for t in done)
+                pending.add(asyncio.create_task(embed_and_store(list(batch))))
+            if pending:
+                done, _ = await asyncio.wait(pending)
+                stored += sum(t.result() for t in done)
+        finally:
+            # 异常或取消时不留下悬挂的请求
+            for task in pending:
+                task.cancel()
+        return stored
+
+    # 文件嵌入方法，流式读取并分块嵌入多个文件
+    async def embed_files(
+        self,
+        paths: Iterable[Path],
+        chunker: MarkdownChunker | None = None,
+        batch_size: int = 16,
+        max_inflight: int = 2,
+    ) -> int:
+        """流式读取文件、切分为文本块后分批嵌入，返回成功存储的块数量"""
+        return await self.embed_chunks(
+            iter_path_chunks(paths, chunker), batch_size, max_inflight
+        )
+
     # 检索方法，根据查询文本查找最相关的文档
-    async def retrieve(self, query: str, top_k: int = 5) -> list[VectorStoreItem]:
-        """根据查询文本检索最相关的文档"""
+    async def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        mmr_lambda: float | None = None,
+        fetch_k: int | None = None,
+    ) -> list[VectorStoreItem]:
+        """根据查询文本检索最相关的文档
+
+        设置mmr_lambda时，从fetch_k（默认4*top_k）个候选中用MMR选出多样化的top_k个，
+        避免结果被几乎相同的文本块占满。
+        """
         query_embedding = await self.embed_query(query)  # 将查询文本转换为向量
+        return self._search(query_embedding, top_k, mmr_lambda, fetch_k)
+
+    # 带截止时间的检索方法
+    async def retrieve_with_deadline(
+        self,
+        query: str,
+        top_k: int = 5,
+        timeout_s: float | None = None,
+        mmr_lambda: float | None = None,
+        fetch_k: int | None = None,
+    ) -> RetrievalResult:
+        """在截止时间内检索；查询嵌入超时或失败时退回本地词法检索并标记为降级
+
+        超时的嵌入请求不会被取消，它完成后仍会写入查询缓存，供后续相同查询使用。
+        """
+        timeout_s = self.retrieval_timeout_s if timeout_s is None else timeout_s
+        started = time.perf_counter()
+        self.slo_stats.total += 1
+        reason = ""
+        try:
+            query_embedding = await asyncio.wait_for(self.embed_query(query), timeout_s)
+        except TimeoutError:
+            query_embedding = None
+            reason = "timeout"
+            self.slo_stats.timeouts += 1
+        except Exception as err:
+            # 提供者不可用（连接错误、5xx、熔断等）时同样降级，而不是让检索失败
+            rprint(f"[yellow]query embedding failed: {err!s}[/yellow]")
+            query_embedding = None
+            reason = "embedding_failed"
+            self.slo_stats.embedding_failures += 1
+        else:
+            if query_embedding is None:
+                reason = "embedding_failed"
+                self.slo_stats.embedding_failures += 1
+
+        if query_embedding is None:
+            rprint(f"[yellow]retrieval degraded ({reason}), using lexical search[/yellow]")
+            items = self.vector_store.search_lexical(query, top_k)
+        else:
+            items = self._search(query_embedding, top_k, mmr_lambda, fetch_k)
+        return RetrievalResult(
+            items=items,
+            degraded=bool(reason),
+            reason=reason,
+            elapsed_s=time.perf_counter() - started,
+        )
+
+    # 在向量存储中搜索
+    def _search(
+        self,
+        query_embedding: Embedding,
+        top_k: int,
+        mmr_lambda: float | None,
+        fetch_k: int | None,
+    ) -> list[VectorStoreItem]:
+        """按是否启用MMR选择搜索方式"""
+        if mmr_lambda is not None:
+            # 用MMR在候选集中兼顾相关性和多样性
+            return self.vector_store.search_mmr(
+                query_embedding, top_k, fetch_k or 4 * top_k, mmr_lambda
+            )
         # 在向量存储中搜索最相似的文档
         return self.vector_store.search(query_embedding, top_k)
@@ -0,0 +1,243 @@
+"""
+异步摄取服务：基于asyncio队列的生产者/消费者流水线
+
+读取解析 -> 分块 -> 批量嵌入 -> 批量写入向量存储，
+每个阶段有独立的并发度，阶段之间是有界队列，下游变慢时上游自动暂停（背压），
+整体速度由最慢的阶段决定，而不是所有步骤串行执行。
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+import itertools
+from pathlib import Path
+import time
+from typing import Callable, Iterable, Iterator
+
+from augmented.chunking import MarkdownChunker, TextChunk, iter_file_blocks
+from augmented.embedding_retriever import EembeddingRetriever
+from augmented.utils import pretty
+from augmented.vector_store import VectorStoreItem
+
+# 日志记录器
+PRETTY_LOGGER = pretty.ALogger("[Ingestion]")
+
+# 队列结束标记
+_DONE = object()
+
+
+# 摄取统计信息
+@dataclass
+class IngestionStats:
+    """摄取流水线的进度和吞吐量统计"""
+
+    files_read: int = 0  # 已读取完成的文件数
+    blocks_read: int = 0  # 已读取的段落块数
+    chunks: int = 0  # 已切分出的文本块数
+    batches_embedded: int = 0  # 成功嵌入的批次数
+    batches_failed: int = 0  # 嵌入失败的批次数
+    chunks_stored: int = 0  # 已写入向量存储的文本块数
+    queue_depths: dict[str, int] = field(default_factory=dict)  # 各阶段输入队列的当前长度
+    started_at: float = field(default_factory=time.perf_counter)  # 开始时间
+    finished_at: float | None = None  # 结束时间
+
+    # 已耗时（秒）
+    @property
+    def elapsed(self) -> float:
+        """从开始到结束（或当前）经过的秒数"""
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    # 写入吞吐量
+    @property
+    def chunks_per_second(self) -> float:
+        """每秒写入向量存储的文本块数"""
+        elapsed = self.elapsed
+        return self.chunks_stored / elapsed if elapsed > 0 else 0.0
+
+
+# 摄取服务
+@dataclass
+class IngestionService:
+    """把文件流式摄取到检索器的向量存储中"""
+
+    retriever: EembeddingRetriever  # 负责嵌入和存储的检索器
+    chunker: MarkdownChunker = field(default_factory=MarkdownChunker)  # 分块器
+    read_concurrency: int = 4  # 同时读取的文件数
+    chunk_concurrency: int = 4  # 同时分块的文件数
+    embed_concurrency: int = 2  # 同时在途的嵌入请求数
+    batch_size: int = 16  # 每个嵌入请求包含的文本块数
+    read_batch_blocks: int = 64  # 每次从文件读取的段落块数（一次线程切换）
+    queue_size: int = 8  # 各阶段之间队列的容量
+    on_progress: Callable[[IngestionStats], None] | None = None  # 每写入一批后回调
+
+    # 摄取一组文件
+    async def ingest(self, paths: Iterable[Path]) -> IngestionStats:
+        """运行完整流水线，返回统计信息；任一阶段出错时取消整个流水线"""
+        PRETTY_LOGGER.title("INGEST")
+        stats = IngestionStats()
+        path_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        file_queue: asyncio.Queue = asyncio.Queue(self.queue_size)  # 每个文件的段落块通道
+        chunk_queue: asyncio.Queue = asyncio.Queue(self.queue_size * self.batch_size)
+        batch_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        store_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        queues = {
+            "read": path_queue,
+            "chunk": file_queue,
+            "batch": chunk_queue,
+            "embed": batch_queue,
+            "store": store_queue,
+        }
+
+        def report() -> None:
+            stats.queue_depths = {name: q.qsize() for name, q in queues.items()}
+            if self.on_progress:
+                self.on_progress(stats)
+
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self._feed_paths(paths, path_queue, self.read_concurrency))
+            tg.create_task(
+                self._run_stage(
+                    self.read_concurrency,
+                    lambda: self._read_worker(path_queue, file_queue, stats),
+                    file_queue,
+                    self.chunk_concurrency,
+                )
+            )
+            tg.create_task(
+                self._run_stage(
+                    self.chunk_concurrency,
+                    lambda: self._chunk_worker(file_queue, chunk_queue, stats),
+                    chunk_queue,
+                    1,
+                )
+            )
+            tg.create_task(
+                self._run_stage(
+                    1,
+                    lambda: self._batch_worker(chunk_queue, batch_queue),
+                    batch_queue,
+                    self.embed_concurrency,
+                )
+            )
+            tg.create_task(
+                self._run_stage(
+                    self.embed_concurrency,
+                    lambda: self._embed_worker(batch_queue, store_queue, stats),
+                    store_queue,
+                    1,
+                )
+            )
+            tg.create_task(self._store_worker(store_queue, stats, report))
+
+        stats.finished_at = time.perf_counter()
+        report()
+        return stats
+
+    # 把路径放入读取队列
+    async def _feed_paths(
+        self, paths: Iterable[Path], path_queue: asyncio.Queue, consumers: int
+    ) -> None:
+        """把所有路径放入读取队列，最后为每个读取协程放一个结束标记"""
+        for path in paths:
+            await path_queue.put(path)
+        for _ in range(consumers):
+            await path_queue.put(_DONE)
+
+    # 运行一个阶段的所有协程
+    async def _run_stage(
+        self,
+        concurrency: int,
+        worker: Callable,
+        output: asyncio.Queue,
+        consumers: int,
+    ) -> None:
+        """并发运行concurrency个协程，全部结束后为下游每个消费者放一个结束标记"""
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        for _ in range(consumers):
+            await output.put(_DONE)
+
+    # 读取阶段
+    async def _read_worker(
+        self, path_queue: asyncio.Queue, file_queue: asyncio.Queue, stats: IngestionStats
+    ) -> None:
+        """在线程中流式读取文件，把段落块写入该文件专属的有界通道"""
+        while (path := await path_queue.get()) is not _DONE:
+            channel: asyncio.Queue = asyncio.Queue(self.queue_size)
+            await file_queue.put((str(path), channel))
+            blocks = iter_file_blocks(path)
+            try:
+                while batch := await asyncio.to_thread(
+                    _take, blocks, self.read_batch_blocks
+                ):
+                    stats.blocks_read += len(batch)
+                    await channel.put(batch)
+            finally:
+                await channel.put(_DONE)
+            stats.files_read += 1
+
+    # 分块阶段
+    async def _chunk_worker(
+        self, file_queue: asyncio.Queue, chunk_queue: asyncio.Queue, stats: IngestionStats
+    ) -> None:
+        """从文件通道中逐批取出段落块，增量切分后写入文本块队列"""
+        while (item := await file_queue.get()) is not _DONE:
+            source, channel = item
+            builder = self.chunker.builder(source)
+            while (blocks := await channel.get()) is not _DONE:
+                for block in blocks:
+                    for chunk in builder.feed(block):
+                        stats.chunks += 1
+                        await chunk_queue.put(chunk)
+            for chunk in builder.finish():
+                stats.chunks += 1
+                await chunk_queue.put(chunk)
+
+    # 组批阶段
+    async def _batch_worker(
+        self, chunk_queue: asyncio.Queue, batch_queue: asyncio.Queue
+    ) -> None:
+        """把文本块按batch_size组成批次"""
+        batch: list[TextChunk] = []
+        while (chunk := await chunk_queue.get()) is not _DONE:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                await batch_queue.put(batch)
+                batch = []
+        if batch:
+            await batch_queue.put(batch)
+
+    # 嵌入阶段
+    async def _embed_worker(
+        self, batch_queue: asyncio.Queue, store_queue: asyncio.Queue, stats: IngestionStats
+    ) -> None:
+        """为每个批次调用一次批量嵌入"""
+        while (batch := await batch_queue.get()) is not _DONE:
+            embeddings = await self.retriever.embed_batch([c.text for c in batch])
+            if embeddings is None:
+                stats.batches_failed += 1  # 错误已由嵌入提供者打印
+                continue
+            stats.batches_embedded += 1
+            await store_queue.put(
+                [
+                    VectorStoreItem(embedding=e, document=c.text, source=c.source)
+                    for c, e in zip(batch, embeddings)
+                ]
+            )
+
+    # 写入阶段
+    async def _store_worker(
+        self,
+        store_queue: asyncio.Queue,
+        stats: IngestionStats,
+        report: Callable[[], None],
+    ) -> None:
+        """把嵌入好的批次批量写入向量存储"""
+        while (items := await store_queue.get()) is not _DONE:
+            self.retriever.vector_store.add_many(items)
+            stats.chunks_stored += len(items)
+            report()
+
+
+# 从迭代器中最多取n个元素
+def _take(iterator: Iterator[str], n: int) -> list[str]:
+    """从迭代器中取出最多n个元素（在线程中执行文件读取）"""
+    return list(itertools.islice(iterator, n))
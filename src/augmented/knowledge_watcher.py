@@ -0,0 +1,302 @@
+"""
+知识库目录监听模块：文件变化时增量更新向量存储
+
+- Linux上使用inotify（通过ctypes调用libc，无额外依赖），其他平台或失败时退回轮询；
+  监听的目录被删除或移走时（inotify监听随之失效）同样改为轮询，目录恢复后继续索引
+- 对短时间内的连续变化做防抖，只重新嵌入受影响且内容确实变化的文件
+- 通过VectorStore的写时复制接口执行upsert/删除，不打断正在进行的搜索
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+from dataclasses import dataclass, field
+import hashlib
+import itertools
+import os
+from pathlib import Path
+import struct
+import sys
+
+from rich import print as rprint
+
+from augmented.chunking import MarkdownChunker
+from augmented.embedding_retriever import EembeddingRetriever
+from augmented.utils import pretty
+from augmented.utils.pretty import RICH_CONSOLE
+from augmented.vector_store import VectorStoreItem
+
+# 日志记录器
+PRETTY_LOGGER = pretty.ALogger("[Watcher]")
+
+# inotify事件掩码（见 <sys/inotify.h>）
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+# 监听统计信息
+@dataclass
+class WatcherStats:
+    """目录监听的统计计数器"""
+
+    events: int = 0  # 收到的文件变化事件数
+    rescans: int = 0  # 全量扫描次数
+    files_indexed: int = 0  # 重新嵌入的文件数
+    files_unchanged: int = 0  # 事件触发但内容未变化而跳过的文件数
+    files_removed: int = 0  # 从向量存储中删除的文件数
+    errors: int = 0  # 处理失败的文件数
+
+
+# 知识库目录监听器
+@dataclass
+class KnowledgeBaseWatcher:
+    """监听目录下匹配pattern的文件，增量维护检索器的向量存储"""
+
+    directory: Path  # 监听的目录（不递归）
+    retriever: EembeddingRetriever  # 负责嵌入和存储的检索器
+    pattern: str = "*.md"  # 需要索引的文件名模式
+    chunker: MarkdownChunker = field(default_factory=MarkdownChunker)  # 分块器
+    batch_size: int = 16  # 每个嵌入请求包含的文本块数
+    debounce_s: float = 0.5  # 防抖时间：最后一次变化后静默这么久才处理
+    poll_interval_s: float = 2.0  # 轮询模式下的扫描间隔
+    use_inotify: bool = True  # 是否优先使用inotify
+    stats: WatcherStats = field(default_factory=WatcherStats)  # 统计信息
+
+    _digests: dict[str, str] = field(default_factory=dict, init=False, repr=False)  # 已索引文件的内容摘要
+    _pending: set[Path] = field(default_factory=set, init=False, repr=False)  # 等待处理的文件
+    _needs_sync: bool = field(default=False, init=False, repr=False)  # 事件丢失，需要全量同步
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, init=False, repr=False)
+    _inotify: "_Inotify | None" = field(default=None, init=False, repr=False)
+    _tasks: list[asyncio.Task[None]] = field(default_factory=list, init=False, repr=False)
+
+    # 启动监听
+    async def start(self) -> None:
+        """先建立监听再同步一次现有文件（避免遗漏同步期间的变化），然后在后台处理变化"""
+        PRETTY_LOGGER.title(f"WATCH {self.directory!s}")
+        loop = asyncio.get_running_loop()
+        self._inotify = _Inotify.open(self.directory) if self.use_inotify else None
+        if self._inotify is not None:
+            loop.add_reader(self._inotify.fd, self._on_inotify, self._inotify)
+        else:
+            rprint(f"[yellow]inotify unavailable, polling {self.directory!s}[/yellow]")
+            snapshot = _stat_snapshot(self.directory, self.pattern)
+            self._tasks.append(asyncio.create_task(self._poll(snapshot)))
+        await self.sync()
+        self._tasks.append(asyncio.create_task(self._debounce_loop()))
+
+    # 停止监听
+    async def stop(self) -> None:
+        """停止监听并等待后台任务结束"""
+        self._close_inotify()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    # 全量同步
+    async def sync(self) -> None:
+        """扫描目录，索引新增/变化的文件，删除已不存在的文件"""
+        self.stats.rescans += 1
+        present = {p for p in self.directory.glob(self.pattern) if p.is_file()}
+        known = {Path(source) for source in self._digests}
+        await self._apply(present | known)
+
+    # 防抖循环
+    async def _debounce_loop(self) -> None:
+        """等待变化，静默debounce_s后批量处理一轮"""
+        while True:
+            await self._changed.wait()
+            # 持续有新事件时不断推迟处理
+            while True:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.debounce_s)
+                except TimeoutError:
+                    break
+            paths, self._pending = self._pending, set()
+            if self._needs_sync:
+                # 事件队列溢出时无法得知具体文件，做一次全量同步
+                self._needs_sync = False
+                await self.sync()
+            elif paths:
+                await self._apply(paths)
+
+    # inotify可读回调
+    def _on_inotify(self, inotify: "_Inotify") -> None:
+        """读取inotify事件，记录受影响的文件"""
+        for mask, name in inotify.read_events():
+            self.stats.events += 1
+            if mask & _IN_Q_OVERFLOW:
+                self._needs_sync = True
+                self._changed.set()
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                # 目录本身被删除或移走，监听已失效：改为轮询，并同步删除已不存在的文件
+                rprint(
+                    f"[yellow]{self.directory!s} was deleted or moved, "
+                    "falling back to polling[/yellow]"
+                )
+                self._close_inotify()
+                self._tasks.append(asyncio.create_task(self._poll({})))
+                self._needs_sync = True
+                self._changed.set()
+                return
+            if not name:
+                continue
+            path = self.directory / name
+            if path.match(self.pattern):
+                self._pending.add(path)
+                self._changed.set()
+
+    # 关闭inotify
+    def _close_inotify(self) -> None:
+        """移除事件回调并关闭inotify实例（未使用inotify时什么也不做）"""
+        if self._inotify is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+
+    # 轮询
+    async def _poll(self, snapshot: dict[Path, tuple[int, int]]) -> None:
+        """定期比较文件的修改时间和大小，记录变化的文件"""
+        while True:
+            await asyncio.sleep(self.poll_interval_s)
+            current = await asyncio.to_thread(_stat_snapshot, self.directory, self.pattern)
+            changed = {
+                path
+                for path in snapshot.keys() | current.keys()
+                if snapshot.get(path) != current.get(path)
+            }
+            snapshot = current
+            if changed:
+                self.stats.events += len(changed)
+                self._pending |= changed
+                self._changed.set()
+
+    # 处理一批变化的文件
+    async def _apply(self, paths: set[Path]) -> None:
+        """对每个文件执行upsert或删除"""
+        for path in sorted(paths):
+            source = str(path)
+            try:
+                if not path.is_file():
+                    if self._digests.pop(source, None) is not None:
+                        self.retriever.vector_store.remove_source(source)
+                        self.stats.files_removed += 1
+                    continue
+                digest = await asyncio.to_thread(_file_digest, path)
+                if self._digests.get(source) == digest:
+                    self.stats.files_unchanged += 1
+                    continue
+                items = await self._embed_file(path)
+                if items is None:
+                    self.stats.errors += 1
+                    continue
+                # 新的文本块全部嵌入完成后一次性替换旧的
+                self.retriever.vector_store.replace_source(source, items)
+                self._digests[source] = digest
+                self.stats.files_indexed += 1
+            except Exception:
+                rprint(f"Error while indexing {source}, traceback and continue!")
+                RICH_CONSOLE.print_exception()
+                self.stats.errors += 1
+
+    # 嵌入单个文件
+    async def _embed_file(self, path: Path) -> list[VectorStoreItem] | None:
+        """流式分块并分批嵌入单个文件，任一批失败时返回None"""
+        chunks = self.chunker.chunk_file(path)
+        items: list[VectorStoreItem] = []
+        while batch := await asyncio.to_thread(
+            lambda: list(itertools.islice(chunks, self.batch_size))
+        ):
+            embeddings = await self.retriever.embed_batch([c.text for c in batch])
+            if embeddings is None:
+                return None
+            items.extend(
+                VectorStoreItem(embedding=e, document=c.text, source=c.source)
+                for c, e in zip(batch, embeddings)
+            )
+        return items
+
+
+# 计算文件内容摘要
+def _file_digest(path: Path) -> str:
+    """流式计算文件内容的摘要，用于判断内容是否真的变化"""
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+
+# 获取目录中文件的状态快照
+def _stat_snapshot(directory: Path, pattern: str) -> dict[Path, tuple[int, int]]:
+    """返回 {路径: (修改时间ns, 大小)}"""
+    snapshot = {}
+    for path in directory.glob(pattern):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        snapshot[path] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+# inotify的最小封装
+class _Inotify:
+    """通过ctypes调用libc的inotify接口，监听单个目录"""
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+
+    @classmethod
+    def open(cls, directory: Path) -> "_Inotify | None":
+        """创建inotify实例并监听目录；平台不支持或失败时返回None"""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            if libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK) < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        return cls(fd)
+
+    def read_events(self) -> list[tuple[int, str]]:
+        """读取当前所有可用事件，返回 [(mask, 文件名)]"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        """关闭inotify文件描述符"""
+        os.close(self.fd)
@@ -0,0 +1,75 @@
+"""
+词法检索模块：基于BM25的倒排索引
+
+不依赖任何网络服务，在嵌入接口变慢或不可用时作为检索的兜底方案。
+"""
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+import math
+
+import numpy as np
+
+from augmented.chunking import tokenize
+
+
+# BM25倒排索引
+@dataclass
+class BM25Index:
+    """支持增量追加文档的BM25倒排索引，文档用追加顺序的下标标识"""
+
+    k1: float = 1.5  # 词频饱和参数
+    b: float = 0.75  # 文档长度归一化参数
+
+    _postings: defaultdict[str, list[tuple[int, int]]] = field(
+        default_factory=lambda: defaultdict(list), init=False, repr=False
+    )  # 词 -> [(文档下标, 词频)]
+    _lengths: list[int] = field(default_factory=list, init=False, repr=False)  # 每个文档的token数
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    # 追加文档
+    def add(self, document: str) -> None:
+        """追加一个文档，其下标为当前文档数"""
+        doc_id = len(self._lengths)
+        tokens = tokenize(document)
+        self._lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self._postings[term].append((doc_id, tf))
+
+    # 保留部分文档
+    def subset(self, doc_ids: list[int]) -> "BM25Index":
+        """返回只包含doc_ids（升序）中文档的新索引，文档按doc_ids中的顺序重新编号
+
+        直接复用已有的倒排表，不需要重新分词；原索引不变（正在进行的检索不受影响）。
+        """
+        new_ids = [-1] * len(self._lengths)
+        for new_id, doc_id in enumerate(doc_ids):
+            new_ids[doc_id] = new_id
+        index = BM25Index(k1=self.k1, b=self.b)
+        index._lengths = [self._lengths[doc_id] for doc_id in doc_ids]
+        for term, postings in self._postings.items():
+            kept = [(new_ids[doc_id], tf) for doc_id, tf in postings if new_ids[doc_id] >= 0]
+            if kept:
+                index._postings[term] = kept
+        return index
+
+    # 计算查询对所有文档的BM25得分
+    def scores(self, query: str) -> np.ndarray:
+        """返回查询对每个文档的BM25得分，形状为 (len(self),)"""
+        n = len(self._lengths)
+        scores = np.zeros(n, dtype=np.float32)
+        if not n:
+            return scores
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1))
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            doc_ids, tfs = np.asarray(postings, dtype=np.int64).T
+            tfs = tfs.astype(np.float32)
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + length_norm[doc_ids])
+        return scores
@@ -0,0 +1,272 @@
+"""
+多端点LLM路由模块：按观测到的延迟和错误率选择端点，支持对冲请求和故障转移
+
+- 每个端点维护首token延迟（TTFT）的滑动窗口、平滑后的错误率和一个熔断器
+- 主端点的首token迟迟未到（超过其TTFT的指定分位数）时，向次优端点发出对冲请求，
+  先返回首个块的一方胜出，另一方被取消
+- 请求失败时自动转移到下一个可用端点，熔断器打开的端点暂不参与路由；
+  请求本身的错误（400/401/422等不可重试的错误）直接抛出，不计入端点失败，也不转移
+"""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+import os
+import time
+from typing import Any, AsyncIterator, Self
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionChunk
+
+from augmented.circuit_breaker import CircuitBreaker, CircuitOpenError
+from augmented.retry import RetryPolicy
+from augmented.utils import pretty
+
+# 日志记录器
+PRETTY_LOGGER = pretty.ALogger("[Router]")
+
+
+# LLM端点
+@dataclass
+class LLMEndpoint:
+    """一个OpenAI兼容的LLM端点及其运行时观测数据"""
+
+    base_url: str  # API基础URL
+    api_key: str | None = None  # API密钥，默认使用OPENAI_API_KEY
+    name: str = ""  # 名称，默认使用base_url
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)  # 端点的熔断器
+
+    client: AsyncOpenAI = field(init=False, repr=False)  # OpenAI客户端实例
+    ttft_samples: deque[float] = field(
+        default_factory=lambda: deque(maxlen=100), init=False, repr=False
+    )  # 最近的首token延迟（秒）
+    error_rate: float = field(default=0.0, init=False)  # 指数平滑后的错误率
+
+    def __post_init__(self) -> None:
+        self.name = self.name or self.base_url
+        self.breaker.name = self.name
+        self.client = AsyncOpenAI(
+            api_key=self.api_key or os.environ.get("OPENAI_API_KEY"),
+            base_url=self.base_url,
+            max_retries=0,  # 失败时由路由器转移到其他端点
+        )
+
+    # 首token延迟的分位数
+    def ttft_percentile(self, q: float) -> float | None:
+        """返回最近TTFT的q分位数（0~1），没有样本时返回None"""
+        if not self.ttft_samples:
+            return None
+        samples = sorted(self.ttft_samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    # 路由打分，越小越好
+    def score(self) -> float:
+        """TTFT中位数按错误率加权；还没有样本的端点得分为0，优先被探索"""
+        median = self.ttft_percentile(0.5) or 0.0
+        return median * (1 + 4 * self.error_rate)
+
+    # 记录成功
+    def record_success(self, ttft_s: float, alpha: float) -> None:
+        """记录一次成功请求的首token延迟"""
+        self.ttft_samples.append(ttft_s)
+        self.error_rate *= 1 - alpha
+        self.breaker.record_success()
+
+    # 记录失败
+    def record_failure(self, alpha: float) -> None:
+        """记录一次失败请求"""
+        self.error_rate = self.error_rate * (1 - alpha) + alpha
+        self.breaker.record_failure()
+
+
+# 路由统计信息
+@dataclass
+class RouterStats:
+    """多端点路由的统计计数器"""
+
+    requests: int = 0  # 路由的请求数
+    hedges: int = 0  # 发出的对冲请求数
+    hedge_wins: int = 0  # 对冲请求胜出的次数
+    failovers: int = 0  # 故障转移次数
+    failures: int = 0  # 端点请求失败次数
+
+
+# 多端点路由器
+@dataclass
+class EndpointRouter:
+    """在多个LLM端点之间路由流式聊天请求"""
+
+    endpoints: list[LLMEndpoint]  # 候选端点，按偏好排序
+    hedge: bool = True  # 是否启用对冲请求
+    hedge_percentile: float = 0.95  # 主端点TTFT超过该分位数时发出对冲请求
+    hedge_delay_s: float = 2.0  # 样本不足时使用的对冲延迟
+    min_samples: int = 20  # 使用分位数所需的最少样本数
+    error_alpha: float = 0.2  # 错误率的平滑系数
+    stats: RouterStats = field(default_factory=RouterStats)  # 统计信息
+
+    # 从一组URL创建
+    @classmethod
+    def from_base_urls(cls, base_urls: list[str], api_key: str | None = None) -> Self:
+        """为每个URL创建一个端点，共用同一个API密钥"""
+        return cls([LLMEndpoint(base_url=url, api_key=api_key) for url in base_urls])
+
+    # 当前可用的端点排序
+    def ranked(self) -> list[LLMEndpoint]:
+        """熔断器放行的端点，按得分从好到差排序（得分相同时保持配置顺序）"""
+        return sorted(
+            (e for e in self.endpoints if e.breaker.available),
+            key=LLMEndpoint.score,
+        )
+
+    # 对冲延迟
+    def hedge_delay(self, endpoint: LLMEndpoint) -> float:
+        """主端点TTFT的hedge_percentile分位数；样本不足时使用hedge_delay_s"""
+        if len(endpoint.ttft_samples) < self.min_samples:
+            return self.hedge_delay_s
+        return endpoint.ttft_percentile(self.hedge_percentile) or self.hedge_delay_s
+
+    # 发起流式请求
+    async def stream(self, **kwargs: Any) -> "RoutedStream":
+        """路由一个 chat.completions.create(stream=True) 请求，返回已收到首个块的流
+
+        所有可用端点都失败时抛出最后一个错误；没有可用端点时抛出CircuitOpenError；
+        不可重试的错误（请求本身有问题）立即抛出，换端点也不会成功。
+        """
+        self.stats.requests += 1
+        candidates = self.ranked()
+        running: dict[asyncio.Task[RoutedStream], tuple[LLMEndpoint, float]] = {}
+        hedged = False
+        error: BaseException | None = None
+
+        def launch() -> LLMEndpoint | None:
+            """向下一个熔断器放行的候选端点发起请求"""
+            while candidates:
+                endpoint = candidates.pop(0)
+                if endpoint.breaker.allow():
+                    task = asyncio.create_task(self._attempt(endpoint, kwargs))
+                    running[task] = (endpoint, time.perf_counter())
+                    return endpoint
+            return None
+
+        primary = launch()
+        if primary is None:
+            retry_after = min(e.breaker.retry_after_s for e in self.endpoints)
+            raise CircuitOpenError("llm-router", retry_after)
+        try:
+            while running:
+                # 还有备选端点且尚未对冲时，等待到对冲时间点
+                timeout = (
+                    self.hedge_delay(primary)
+                    if self.hedge and not hedged and candidates
+                    else None
+                )
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    if (endpoint := launch()) is not None:
+                        self.stats.hedges += 1
+                        PRETTY_LOGGER.title(f"HEDGE -> {endpoint.name}")
+                    continue
+
+                winner: RoutedStream | None = None
+                fatal: BaseException | None = None  # 不可重试的错误
+                for task in done:
+                    endpoint, _ = running.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        if not RetryPolicy.is_retryable(error):
+                            endpoint.breaker.release()  # 请求本身的错误，不计入端点失败
+                            fatal = error
+                            continue
+                        self.stats.failures += 1
+                        endpoint.record_failure(self.error_alpha)
+                        continue
+                    result = task.result()
+                    endpoint.record_success(result.ttft_s, self.error_alpha)
+                    if winner is None:
+                        winner = result
+                    else:
+                        await result.close()  # 同时到达的多余结果
+                if winner is not None:
+                    if winner.endpoint is not primary and hedged:
+                        self.stats.hedge_wins += 1
+                    return winner
+                if fatal is not None:
+                    raise fatal  # 换端点也不会成功，不再转移
+
+                # 所有在途请求都失败了，转移到下一个端点
+                if not running and (endpoint := launch()) is not None:
+                    self.stats.failovers += 1
+                    PRETTY_LOGGER.title(f"FAILOVER -> {endpoint.name}")
+            raise error or CircuitOpenError("llm-router", 0.0)
+        finally:
+            # 取消落败的请求（_attempt会关闭已建立的流），
+            # 已等待的时长作为其TTFT的下界计入样本，避免慢端点因没有样本而一直排在前面
+            now = time.perf_counter()
+            for task, (endpoint, launched_at) in running.items():
+                task.cancel()
+                endpoint.breaker.release()
+                endpoint.ttft_samples.append(now - launched_at)
+            await asyncio.gather(*running, return_exceptions=True)
+
+    # 向单个端点发起请求并等待首个块
+    async def _attempt(
+        self, endpoint: LLMEndpoint, kwargs: dict[str, Any]
+    ) -> "RoutedStream":
+        """发起请求并读取首个块；被取消或出错时关闭已建立的流"""
+        started = time.perf_counter()
+        stream = await endpoint.client.chat.completions.create(**kwargs)
+        iterator = aiter(stream)
+        try:
+            first = await anext(iterator, None)
+        except BaseException:
+            await stream.close()
+            raise
+        return RoutedStream(
+            endpoint=endpoint,
+            stream=stream,
+            iterator=iterator,
+            first=first,
+            ttft_s=time.perf_counter() - started,
+            error_alpha=self.error_alpha,
+        )
+
+
+# 路由后的流
+@dataclass
+class RoutedStream:
+    """已选定端点并收到首个块的流，接口与 openai.AsyncStream 一致（async with / async for）"""
+
+    endpoint: LLMEndpoint  # 胜出的端点
+    stream: Any  # 上游的 AsyncStream
+    iterator: AsyncIterator[ChatCompletionChunk]  # 上游的迭代器
+    first: ChatCompletionChunk | None  # 已读取的首个块
+    ttft_s: float  # 首个块的延迟（秒）
+    error_alpha: float  # 错误率的平滑系数
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[ChatCompletionChunk]:
+        """先产出首个块，再继续读取上游；流中途的可重试错误计入端点的错误率"""
+        if self.first is not None:
+            yield self.first
+        try:
+            async for chunk in self.iterator:
+                yield chunk
+        except Exception as err:
+            if RetryPolicy.is_retryable(err):
+                self.endpoint.record_failure(self.error_alpha)
+            raise
+
+    async def close(self) -> None:
+        """关闭上游流"""
+        await self.stream.close()
@@ -4,10 +4,12 @@ MCP客户端实现，基于Model Context Protocol官方示例修改
 """
 
 import asyncio
+import hashlib
+import json
 from typing import Any, Optional
 from contextlib import AsyncExitStack
 
-from mcp import ClientSession, StdioServerParameters, Tool
+from mcp import ClientSession, StdioServerParameters, Tool, types
 from mcp.client.stdio import stdio_client
 
 from rich import print as rprint
@@ -16,6 +18,7 @@ from dotenv import load_dotenv
 
 # from utils 
 from augmented.mcp_tools import PresetMcpTools
+from augmented.tool_result_cache import ToolResultCache
 from augmented.utils.info import PROJECT_ROOT_DIR
 from augmented.utils.pretty import RICH_CONSOLE
 
@@ -33,6 +36,7 @@ class MCPClient:
         command: str,
         args: list[str],
         version: str = "0.0.1",
+        result_cache: ToolResultCache | None = None,
     ) -> None:
         """初始化MCP客户端
         
@@ -41,6 +45,7 @@ class MCPClient:
             command: MCP服务器启动命令
             args: 命令参数列表
             version: 客户端版本号
+            result_cache: 工具结果缓存，只缓存其中配置了TTL的幂等工具
         """
         self.session: Optional[ClientSession] = None  # MCP会话对象
         self.exit_stack = AsyncExitStack()  # 异步上下文管理器栈，用于资源清理
@@ -49,26 +54,90 @@ class MCPClient:
         self.command = command  # 服务器启动命令
         self.args = args  # 命令参数列表
         self.tools: list[Tool] = []  # 从服务器获取的工具列表
+        self.result_cache = result_cache  # 工具结果缓存
+        self.tools_stale = False  # 服务器通知工具列表已变化，等待刷新
+        self._owner: asyncio.Task[None] | None = None  # 持有连接的任务
+        self._stop = asyncio.Event()  # 通知持有任务关闭连接
 
     # 初始化客户端连接
     async def init(self) -> None:
-        """初始化客户端，连接到MCP服务器"""
-        await self._connect_to_server()
+        """初始化客户端，连接到MCP服务器
+
+        连接由一个专门的持有任务建立和关闭：stdio_client/ClientSession内部的cancel scope
+        必须在进入它的同一个任务中退出，这样init和cleanup可以在任意任务中调用
+        （包括被asyncio.wait_for超时取消、或与其他客户端并发执行）。
+        """
+        ready: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._stop = asyncio.Event()
+        self._owner = asyncio.create_task(self._hold_connection(ready), name=f"mcp-{self.name}")
+        try:
+            await ready
+        except BaseException:
+            # 连接失败或init被取消（如超时）：让持有任务在它自己的任务中退出上下文
+            self._owner.cancel()
+            await asyncio.gather(self._owner, return_exceptions=True)
+            self._owner = None
+            raise
 
     # 清理客户端资源
     async def cleanup(self) -> None:
         """清理客户端资源，关闭与服务器的连接"""
+        if self._owner is None:
+            return
+        self._stop.set()  # 由持有任务关闭所有异步上下文
         try:
-            await self.exit_stack.aclose()  # 关闭所有异步上下文
+            await self._owner
         except Exception:
             rprint("Error during MCP client cleanup, traceback and continue!")
             RICH_CONSOLE.print_exception()  # 打印异常信息但继续执行
+        finally:
+            self._owner = None
+            self.session = None
+
+    # 持有连接的任务
+    async def _hold_connection(self, ready: asyncio.Future[None]) -> None:
+        """建立连接后等待关闭通知，在同一个任务中进入和退出所有异步上下文"""
+        try:
+            async with self.exit_stack:
+                await self._connect_to_server()
+                ready.set_result(None)
+                await self._stop.wait()
+        except BaseException as e:
+            if ready.done():
+                raise  # 连接建立后的错误由cleanup报告
+            if isinstance(e, asyncio.CancelledError):
+                ready.cancel()
+            else:
+                ready.set_exception(e)
 
     # 获取工具列表
     def get_tools(self) -> list[Tool]:
         """返回从服务器获取的可用工具列表"""
         return self.tools
 
+    # 刷新工具列表
+    async def refresh_tools(self) -> bool:
+        """重新获取服务器的工具列表，返回工具列表是否真的变化
+
+        未变化时保留原有的Tool对象，依赖对象身份的工具定义缓存继续有效。
+        """
+        if self.session is None:
+            raise RuntimeError("MCP会话未初始化，请先调用init()方法")
+        self.tools_stale = False
+        response = await self.session.list_tools()
+        if tools_fingerprint(response.tools) == tools_fingerprint(self.tools):
+            return False
+        self.tools = response.tools
+        rprint(f"\nTools of server {self.name} changed:", [tool.name for tool in self.tools])
+        return True
+
+    # 处理服务器主动发送的消息
+    async def _on_message(self, message: Any) -> None:
+        """收到工具列表变化通知时标记为待刷新（在通知回调中不能发起新的请求）"""
+        notification = getattr(message, "root", message)
+        if isinstance(notification, types.ToolListChangedNotification):
+            self.tools_stale = True
+
     # 连接到MCP服务器
     async def _connect_to_server(
         self,
@@ -88,7 +157,9 @@ class MCPClient:
         
         # 创建客户端会话
         self.session = await self.exit_stack.enter_async_context(
-            ClientSession(self.stdio, self.write)  # 创建会话对象
+            ClientSession(
+                self.stdio, self.write, message_handler=self._on_message
+            )  # 创建会话对象
         )
 
         # 初始化会话
@@ -120,7 +191,26 @@ class MCPClient:
         """
         if self.session is None:
             raise RuntimeError("MCP会话未初始化，请先调用init()方法")
-        return await self.session.call_tool(name, params)  # 调用服务器工具
+        session = self.session
+        if self.result_cache is not None:
+            tool = next((t for t in self.tools if t.name == name), None)
+            ttl_s = self.result_cache.ttl_for(self.name, tool, name)
+            if ttl_s is not None:
+                return await self.result_cache.get_or_call(
+                    self.name, name, params, ttl_s, lambda: session.call_tool(name, params)
+                )
+        return await session.call_tool(name, params)  # 调用服务器工具
+
+
+# 工具列表的指纹
+def tools_fingerprint(tools: list[Tool]) -> str:
+    """根据工具名称、描述和参数schema计算指纹，用于判断工具列表是否变化"""
+    payload = json.dumps(
+        [[t.name, t.description, t.inputSchema] for t in tools],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
 
 
 # 示例函数，演示MCP客户端的使用
@@ -0,0 +1,231 @@
+"""
+聊天响应缓存模块：精确缓存 + 语义缓存 + 在途请求合并（single-flight）
+
+- 精确层：以 (模型, 消息, 工具定义) 的哈希为键，完全相同的请求直接返回缓存的响应
+- 语义层：上下文相同（除最后一条user消息外的消息、模型和工具都相同）时，
+  最后一条user消息的嵌入相似度超过阈值即视为命中；只复用不含工具调用的响应，
+  因为工具调用的参数只对原始提问有效
+- 条目有TTL，超出容量时淘汰最久未使用的条目
+- 并发的相同请求共享同一个在途请求，只调用一次LLM
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import json
+import time
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from openai.types.chat import ChatCompletionMessageParam
+
+from augmented.embedding_provider import EmbeddingProvider, LocalHashingEmbeddingProvider
+
+if TYPE_CHECKING:
+    from augmented.chat_openai import ChatOpenAIChatResponse
+
+
+# 缓存统计信息
+@dataclass
+class ResponseCacheStats:
+    """响应缓存的统计计数器"""
+
+    exact_hits: int = 0  # 精确层命中次数
+    semantic_hits: int = 0  # 语义层命中次数
+    coalesced: int = 0  # 合并到在途请求的次数
+    misses: int = 0  # 实际调用LLM的次数
+    expired: int = 0  # 因过期被丢弃的条目数
+
+    # 节省的LLM调用次数
+    @property
+    def saved_calls(self) -> int:
+        """命中和合并都节省了一次LLM调用"""
+        return self.exact_hits + self.semantic_hits + self.coalesced
+
+
+# 缓存条目
+@dataclass
+class _Entry:
+    response: "ChatOpenAIChatResponse"  # 缓存的响应
+    scope: str | None  # 语义层的上下文键
+    vector: np.ndarray | None  # 最后一条user消息的归一化嵌入
+    expires_at: float  # 过期时间（time.monotonic）
+
+
+# 在途请求
+@dataclass
+class _Inflight:
+    future: "asyncio.Future[ChatOpenAIChatResponse | None]"  # 由发起请求的调用方完成
+    scope: str | None
+    vector: np.ndarray | None
+
+
+# 聊天响应缓存
+@dataclass
+class ResponseCache:
+    """AsyncChatOpenAI的响应缓存；semantic_threshold为None时只启用精确层"""
+
+    max_size: int = 256  # 缓存的最大条目数
+    ttl_s: float = 3600.0  # 条目的存活时间（秒）
+    semantic_threshold: float | None = None  # 语义层的余弦相似度阈值，如0.95
+    provider: EmbeddingProvider | None = None  # 语义层的嵌入提供者，默认使用本地实现
+    stats: ResponseCacheStats = field(default_factory=ResponseCacheStats)  # 统计信息
+
+    _entries: OrderedDict[str, _Entry] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )  # 已缓存的响应，按最近使用排序
+    _inflight: dict[str, _Inflight] = field(
+        default_factory=dict, init=False, repr=False
+    )  # 在途请求
+
+    def __post_init__(self) -> None:
+        if self.semantic_threshold is not None and self.provider is None:
+            self.provider = LocalHashingEmbeddingProvider()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # 查找缓存
+    async def get(
+        self,
+        model: str,
+        messages: list[ChatCompletionMessageParam],
+        tools: Any,
+    ) -> tuple[str, "ChatOpenAIChatResponse | None"]:
+        """返回 (请求键, 缓存的响应)
+
+        未命中时调用方成为该请求的发起者，必须在请求结束后调用 put 或 release。
+        """
+        key = _digest(model, messages, tools)
+        while True:
+            entry = self._fresh(key)
+            if entry is not None:
+                self.stats.exact_hits += 1
+                return key, entry.response
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.stats.coalesced += 1
+            # shield：某个等待者被取消时不影响发起者和其他等待者
+            response = await asyncio.shield(inflight.future)
+            if response is not None:
+                return key, response
+            self.stats.coalesced -= 1  # 发起者失败，重新查找（可能成为新的发起者）
+
+        scope, query = _semantic_scope(model, messages, tools)
+        vector = None
+        if self.semantic_threshold is not None and query:
+            vector = await self._embed(query)
+            response = self._semantic_lookup(scope, vector)
+            if response is not None:
+                self.stats.semantic_hits += 1
+                return key, response
+
+        # 嵌入期间可能已有相同请求开始，再检查一次
+        if key in self._inflight or self._fresh(key) is not None:
+            return await self.get(model, messages, tools)
+        self.stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = _Inflight(future=future, scope=scope, vector=vector)
+        return key, None
+
+    # 写入缓存
+    def put(self, key: str, response: "ChatOpenAIChatResponse") -> None:
+        """保存发起者得到的完整响应，并唤醒等待同一请求的调用方"""
+        inflight = self._inflight.pop(key, None)
+        scope = inflight.scope if inflight else None
+        vector = inflight.vector if inflight else None
+        if response.tool_calls:
+            vector = None  # 含工具调用的响应不参与语义匹配
+        self._entries[key] = _Entry(
+            response=response,
+            scope=scope,
+            vector=vector,
+            expires_at=time.monotonic() + self.ttl_s,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        if inflight is not None and not inflight.future.done():
+            inflight.future.set_result(response)
+
+    # 放弃在途请求
+    def release(self, key: str) -> None:
+        """发起者失败或被取消时调用，等待者会重新查找；已经put过时什么也不做"""
+        inflight = self._inflight.pop(key, None)
+        if inflight is not None and not inflight.future.done():
+            inflight.future.set_result(None)
+
+    # 清空缓存
+    def clear(self) -> None:
+        """清空已缓存的响应（不影响在途请求和统计信息）"""
+        self._entries.clear()
+
+    # 读取未过期的条目
+    def _fresh(self, key: str) -> _Entry | None:
+        """返回未过期的条目并标记为最近使用，过期的条目直接删除"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    # 语义层查找
+    def _semantic_lookup(
+        self, scope: str | None, vector: np.ndarray | None
+    ) -> "ChatOpenAIChatResponse | None":
+        """在上下文相同的条目中查找相似度最高且超过阈值的响应"""
+        if scope is None or vector is None:
+            return None
+        candidates = [
+            (key, entry)
+            for key, entry in self._entries.items()
+            if entry.scope == scope and entry.vector is not None
+        ]
+        if not candidates:
+            return None
+        scores = np.stack([entry.vector for _, entry in candidates]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+        key, _ = candidates[best]
+        entry = self._fresh(key)
+        return entry.response if entry is not None else None
+
+    # 嵌入单条文本
+    async def _embed(self, text: str) -> np.ndarray | None:
+        """返回归一化的嵌入，失败时返回None（退化为只用精确层）"""
+        embeddings = await self.provider.embed([text])
+        if embeddings is None:
+            return None
+        vector = np.asarray(embeddings[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1)
+
+
+# 计算请求的哈希
+def _digest(model: str, messages: list[ChatCompletionMessageParam], tools: Any) -> str:
+    """对模型、消息和工具定义做稳定的JSON序列化后取哈希"""
+    payload = json.dumps(
+        [model, messages, tools], sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+# 计算语义层的上下文键
+def _semantic_scope(
+    model: str, messages: list[ChatCompletionMessageParam], tools: Any
+) -> tuple[str | None, str]:
+    """最后一条消息是文本user消息时返回 (除它以外的上下文哈希, 它的内容)"""
+    if not messages:
+        return None, ""
+    last = messages[-1]
+    content = last.get("content")
+    if last.get("role") != "user" or not isinstance(content, str):
+        return None, ""
+    return _digest(model, messages[:-1], tools), content
@@ -0,0 +1,69 @@
+"""
+重试策略模块：判断哪些错误可以重试，并计算带抖动的指数退避时间
+
+- 可重试：连接错误/超时、429、408/409、5xx，以及流式响应在首个token之前中断
+- 退避时间使用“完全抖动”（0 ~ base * 2^attempt 之间均匀分布），避免大量调用方同时重试
+- 服务端返回 Retry-After（或 retry-after-ms）时以它为准，超过上限则放弃重试
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+
+import httpx
+import openai
+
+# 可重试的HTTP状态码
+_RETRYABLE_STATUS = frozenset({408, 409, 429})
+
+
+# 重试策略
+@dataclass
+class RetryPolicy:
+    """LLM请求的重试策略"""
+
+    max_attempts: int = 4  # 最多尝试次数（含第一次）
+    base_delay_s: float = 0.5  # 退避基数（秒）
+    max_delay_s: float = 30.0  # 单次等待的上限（秒），Retry-After超过它时放弃重试
+
+    # 判断错误是否可以重试
+    @staticmethod
+    def is_retryable(err: BaseException) -> bool:
+        """连接类错误、限流和服务端错误可以重试；请求本身有问题（4xx）不重试"""
+        if isinstance(err, openai.APIStatusError):
+            return err.status_code in _RETRYABLE_STATUS or err.status_code >= 500
+        if isinstance(err, (openai.APIConnectionError, httpx.TransportError)):
+            return True
+        # 流式响应中途收到的错误事件（没有状态码）
+        return type(err) is openai.APIError
+
+    # 计算第attempt次失败后的等待时间
+    def delay(self, attempt: int, err: BaseException) -> float | None:
+        """返回等待秒数；服务端要求的等待时间超过上限时返回None（不再重试）"""
+        retry_after = retry_after_s(err)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay_s else None
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2**attempt))
+
+
+# 解析服务端要求的等待时间
+def retry_after_s(err: BaseException) -> float | None:
+    """从错误响应的 retry-after-ms / Retry-After 头中解析等待秒数，没有时返回None"""
+    response = getattr(err, "response", None)
+    if not isinstance(response, httpx.Response):
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))  # 秒数
+        except ValueError:
+            when = parsedate_to_datetime(value)  # HTTP日期
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,243 @@
+"""
+JSON Schema校验模块：把工具的inputSchema预编译为校验函数
+
+只实现工具参数中常用的子集（type、enum、const、required、properties、
+additionalProperties、items、长度/数值/数量范围、pattern、anyOf/oneOf/allOf），
+不认识的关键字（如$ref、format）一律放行，宁可漏报也不误拒合法调用。
+编译结果是嵌套闭包，校验时不再解析schema。
+"""
+
+import re
+from typing import Any, Callable
+
+# 校验函数：接收值和JSON路径，返回错误信息列表（为空表示通过）
+Validator = Callable[[Any, str], list[str]]
+
+# JSON Schema类型与Python类型的对应关系
+_TYPE_CHECKS: dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool))
+    or (isinstance(v, float) and v.is_integer()),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+# 编译schema
+def compile_schema(schema: Any) -> Validator:
+    """把JSON Schema编译为校验函数"""
+    if not isinstance(schema, dict) or not schema:
+        return _accept  # 空schema或布尔schema true：接受任何值
+    checks: list[Validator] = []
+
+    types = schema.get("type")
+    if isinstance(types, str):
+        types = [types]
+    if types:
+        type_checks = [_TYPE_CHECKS[t] for t in types if t in _TYPE_CHECKS]
+        if type_checks:
+            expected = " or ".join(types)
+            checks.append(
+                lambda v, path: []
+                if any(check(v) for check in type_checks)
+                else [f"{path}: expected {expected}, got {_type_name(v)}"]
+            )
+
+    if "enum" in schema:
+        options = schema["enum"]
+        checks.append(
+            lambda v, path: []
+            if any(_json_equal(v, option) for option in options)
+            else [f"{path}: must be one of {options!r}"]
+        )
+    if "const" in schema:
+        const = schema["const"]
+        checks.append(
+            lambda v, path: [] if _json_equal(v, const) else [f"{path}: must be {const!r}"]
+        )
+
+    checks.extend(_compile_object(schema))
+    checks.extend(_compile_array(schema))
+    checks.extend(_compile_string(schema))
+    checks.extend(_compile_number(schema))
+    checks.extend(_compile_combinators(schema))
+
+    if not checks:
+        return _accept
+    if len(checks) == 1:
+        return checks[0]
+    return lambda v, path: [error for check in checks for error in check(v, path)]
+
+
+# 编译对象相关的关键字
+def _compile_object(schema: dict[str, Any]) -> list[Validator]:
+    """required、properties、additionalProperties"""
+    checks: list[Validator] = []
+    required = schema.get("required") or []
+    properties = {
+        name: compile_schema(sub)
+        for name, sub in (schema.get("properties") or {}).items()
+    }
+    additional = schema.get("additionalProperties", True)
+    additional_check = compile_schema(additional) if isinstance(additional, dict) else None
+
+    if required:
+        checks.append(
+            lambda v, path: [
+                f"{path}: missing required property {name!r}"
+                for name in required
+                if name not in v
+            ]
+            if isinstance(v, dict)
+            else []
+        )
+    if properties or additional is False or additional_check is not None:
+
+        def check_properties(v: Any, path: str) -> list[str]:
+            if not isinstance(v, dict):
+                return []
+            errors = []
+            for name, value in v.items():
+                check = properties.get(name)
+                if check is not None:
+                    errors.extend(check(value, f"{path}.{name}"))
+                elif additional is False:
+                    errors.append(f"{path}: unexpected property {name!r}")
+                elif additional_check is not None:
+                    errors.extend(additional_check(value, f"{path}.{name}"))
+            return errors
+
+        checks.append(check_properties)
+    return checks
+
+
+# 编译数组相关的关键字
+def _compile_array(schema: dict[str, Any]) -> list[Validator]:
+    """items、minItems、maxItems"""
+    checks: list[Validator] = []
+    if isinstance(schema.get("items"), dict):
+        item_check = compile_schema(schema["items"])
+        checks.append(
+            lambda v, path: [
+                error
+                for i, item in enumerate(v)
+                for error in item_check(item, f"{path}[{i}]")
+            ]
+            if isinstance(v, list)
+            else []
+        )
+    checks.extend(_bound(schema, "minItems", "maxItems", list, len, "items"))
+    return checks
+
+
+# 编译字符串相关的关键字
+def _compile_string(schema: dict[str, Any]) -> list[Validator]:
+    """minLength、maxLength、pattern"""
+    checks = _bound(schema, "minLength", "maxLength", str, len, "characters")
+    if isinstance(schema.get("pattern"), str):
+        try:
+            pattern = re.compile(schema["pattern"])
+        except re.error:
+            return checks  # 无法编译的正则（如ECMA特有语法）直接放行
+        checks.append(
+            lambda v, path: [f"{path}: does not match {pattern.pattern!r}"]
+            if isinstance(v, str) and not pattern.search(v)
+            else []
+        )
+    return checks
+
+
+# 编译数值相关的关键字
+def _compile_number(schema: dict[str, Any]) -> list[Validator]:
+    """minimum、maximum、exclusiveMinimum、exclusiveMaximum"""
+    checks: list[Validator] = []
+    is_number = _TYPE_CHECKS["number"]
+    for keyword, fails, relation in (
+        ("minimum", lambda v, b: v < b, ">="),
+        ("maximum", lambda v, b: v > b, "<="),
+        ("exclusiveMinimum", lambda v, b: v <= b, ">"),
+        ("exclusiveMaximum", lambda v, b: v >= b, "<"),
+    ):
+        bound = schema.get(keyword)
+        if isinstance(bound, (int, float)) and not isinstance(bound, bool):
+            checks.append(
+                lambda v, path, bound=bound, fails=fails, relation=relation: [
+                    f"{path}: must be {relation} {bound}"
+                ]
+                if is_number(v) and fails(v, bound)
+                else []
+            )
+    return checks
+
+
+# 编译组合关键字
+def _compile_combinators(schema: dict[str, Any]) -> list[Validator]:
+    """allOf（全部满足）、anyOf/oneOf（至少满足一个，oneOf不检查唯一性）"""
+    checks: list[Validator] = []
+    for sub in schema.get("allOf") or []:
+        checks.append(compile_schema(sub))
+    for keyword in ("anyOf", "oneOf"):
+        options = [compile_schema(sub) for sub in schema.get(keyword) or []]
+        if options:
+            checks.append(
+                lambda v, path, options=options, keyword=keyword: []
+                if any(not option(v, path) for option in options)
+                else [f"{path}: does not match any schema in {keyword}"]
+            )
+    return checks
+
+
+# 长度/数量范围
+def _bound(
+    schema: dict[str, Any],
+    min_key: str,
+    max_key: str,
+    kind: type,
+    measure: Callable[[Any], int],
+    unit: str,
+) -> list[Validator]:
+    """生成 min_key/max_key 的范围校验"""
+    checks: list[Validator] = []
+    low, high = schema.get(min_key), schema.get(max_key)
+    if isinstance(low, int):
+        checks.append(
+            lambda v, path: [f"{path}: must have at least {low} {unit}"]
+            if isinstance(v, kind) and measure(v) < low
+            else []
+        )
+    if isinstance(high, int):
+        checks.append(
+            lambda v, path: [f"{path}: must have at most {high} {unit}"]
+            if isinstance(v, kind) and measure(v) > high
+            else []
+        )
+    return checks
+
+
+# 按JSON语义比较两个值
+def _json_equal(a: Any, b: Any) -> bool:
+    """与==相同，但布尔值只等于布尔值（Python中True == 1），容器逐元素比较"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k]) for k in a)
+    return a == b
+
+
+# 接受任何值
+def _accept(value: Any, path: str) -> list[str]:
+    return []
+
+
+# JSON类型名称
+def _type_name(value: Any) -> str:
+    """返回值对应的JSON类型名称，用于错误信息"""
+    for name in ("null", "boolean", "integer", "number", "string", "array", "object"):
+        if _TYPE_CHECKS[name](value):
+            return name
+    return type(value).__name__
@@ -0,0 +1,198 @@
+"""
+工具输出压缩模块：MCP工具结果写入对话历史前的后处理
+
+- 只取结果中的文本部分，不再把整个CallToolResult的JSON（含转义和包装字段）写入历史
+- HTML文本转换为纯文本（去掉脚本、样式和标签）
+- 超过token上限的文本保留首尾片段，中间省略
+- 被截断的完整文本和二进制内容（图片、音频、blob资源）保存到本地产物目录
+  （默认在系统临时目录下，不写入项目目录），模型只看到文件路径引用
+"""
+
+import asyncio
+import base64
+import binascii
+from dataclasses import dataclass
+import hashlib
+from html.parser import HTMLParser
+import json
+import mimetypes
+from pathlib import Path
+import re
+import tempfile
+from typing import Any
+import uuid
+
+from mcp import types
+
+from augmented.chunking import estimate_tokens, head_text, tail_text
+
+# 默认的产物目录：系统临时目录下，避免产物混入项目的受版本控制目录
+DEFAULT_ARTIFACT_DIR = Path(tempfile.gettempdir()) / "augmented-tool-artifacts"
+# 看起来是HTML文档的文本
+_HTML_HINT = re.compile(
+    r"^\s*(<\?xml[^>]*>\s*)?<(!doctype\s+html|html|head|body)\b", re.IGNORECASE
+)
+# HTML中内容不可读的元素
+_SKIPPED_TAGS = frozenset({"script", "style", "noscript", "svg", "template", "iframe"})
+# HTML中会换行的元素
+_BLOCK_TAGS = frozenset(
+    {
+        "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+        "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+        "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+        "td", "th", "title", "tr", "ul",
+    }
+)
+# 连续的空白和空行
+_INLINE_SPACES = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+# 工具输出压缩器
+@dataclass
+class ToolOutputCompactor:
+    """把MCP工具结果压缩为写入对话历史的文本"""
+
+    max_tokens: int = 4_000  # 写入历史的工具输出token上限
+    head_ratio: float = 0.7  # 截断时开头部分所占的比例，其余留给结尾
+    html_to_text: bool = True  # 是否把HTML转换为纯文本
+    artifact_dir: Path | None = None  # 产物目录，None时截断/二进制内容只保留说明，不落盘
+
+    # 压缩工具结果
+    async def compact(self, tool_name: str, result: types.CallToolResult) -> str:
+        """提取文本、转换HTML、截断超长文本并保存二进制内容，返回写入历史的文本"""
+        parts: list[str] = []
+        for item in result.content:
+            parts.append(await self._content_text(tool_name, item))
+        structured = getattr(result, "structuredContent", None)  # 新版MCP的结构化输出
+        if not any(parts) and structured is not None:
+            parts.append(json.dumps(structured, ensure_ascii=False))
+        text = "\n\n".join(part for part in parts if part)
+        if getattr(result, "isError", False):
+            text = f"Error: {text or f'tool `{tool_name}` failed'}"
+        return await self._truncate(tool_name, text)
+
+    # 单个内容块转换为文本
+    async def _content_text(self, tool_name: str, item: Any) -> str:
+        """文本直接返回（HTML转纯文本），二进制内容保存为产物并返回引用"""
+        kind = getattr(item, "type", None)
+        if kind == "text":
+            return self._plain(item.text)
+        if kind in ("image", "audio"):
+            return await self._binary(tool_name, kind, item.data, item.mimeType)
+        if kind == "resource":
+            resource = item.resource
+            if isinstance(resource, types.TextResourceContents):
+                if (resource.mimeType or "").startswith("text/html"):
+                    text = self._html(resource.text)
+                else:
+                    text = self._plain(resource.text)
+                return f"[resource {resource.uri}]\n{text}"
+            reference = await self._binary(
+                tool_name, "resource", resource.blob, resource.mimeType
+            )
+            return f"[resource {resource.uri}] {reference}"
+        # 其他类型（如新版MCP的资源链接）保留其精简的JSON
+        dump = getattr(item, "model_dump_json", None)
+        return dump(exclude_none=True) if dump else str(item)
+
+    # 普通文本
+    def _plain(self, text: str) -> str:
+        """看起来是HTML文档时转换为纯文本，否则原样返回"""
+        if self.html_to_text and _HTML_HINT.match(text):
+            return self._html(text)
+        return text
+
+    # HTML转纯文本
+    def _html(self, text: str) -> str:
+        """提取HTML中的可见文本"""
+        if not self.html_to_text:
+            return text
+        parser = _TextExtractor()
+        parser.feed(text)
+        parser.close()
+        return parser.text()
+
+    # 保存二进制内容
+    async def _binary(
+        self, tool_name: str, kind: str, data: str, mime: str | None
+    ) -> str:
+        """解码base64内容并保存为产物，返回给模型的引用说明"""
+        mime = mime or "application/octet-stream"
+        try:
+            payload = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            payload = data.encode()
+        description = f"{kind} {mime}, {len(payload)} bytes"
+        if self.artifact_dir is None:
+            return f"[{description} omitted]"
+        suffix = mimetypes.guess_extension(mime.split(";")[0].strip()) or ".bin"
+        path = await asyncio.to_thread(self._store, tool_name, payload, suffix)
+        return f"[{description} saved to {path}]"
+
+    # 截断超长文本
+    async def _truncate(self, tool_name: str, text: str) -> str:
+        """超过token上限时保留首尾片段，完整文本保存为产物"""
+        if len(text) <= self.max_tokens:
+            return text  # 每个token至少一个字符，不必估算
+        tokens = estimate_tokens(text)
+        if tokens <= self.max_tokens:
+            return text
+        head_tokens = int(self.max_tokens * self.head_ratio)
+        head = head_text(text, head_tokens)
+        tail = tail_text(text, self.max_tokens - head_tokens)
+        note = f"{tokens - self.max_tokens} of {tokens} tokens elided"
+        if self.artifact_dir is not None:
+            path = await asyncio.to_thread(self._store, tool_name, text.encode(), ".txt")
+            note += f"; full output saved to {path}"
+        return f"{head.rstrip()}\n\n[... {note} ...]\n\n{tail.lstrip()}"
+
+    # 写入产物目录
+    def _store(self, tool_name: str, payload: bytes, suffix: str) -> Path:
+        """按内容哈希命名，相同内容只保存一次；先写临时文件再原子替换"""
+        digest = hashlib.blake2b(payload, digest_size=12).hexdigest()
+        prefix = re.sub(r"[^\w-]", "_", tool_name)[:40] or "tool"
+        path = self.artifact_dir / f"{prefix}-{digest}{suffix}"
+        if path.exists():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp.write_bytes(payload)
+            tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return path
+
+
+# HTML文本提取器
+class _TextExtractor(HTMLParser):
+    """收集HTML中的可见文本，块级元素换行"""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self._parts: list[str] = []
+        self._skipping = 0  # 所在的不可读元素层数
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in _SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _SKIPPED_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in _BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            self._parts.append(data)
+
+    # 整理后的文本
+    def text(self) -> str:
+        """合并行内空白，连续空行压缩为一个"""
+        text = _INLINE_SPACES.sub(" ", "".join(self._parts))
+        text = "\n".join(line.strip() for line in text.split("\n"))
+        return _BLANK_LINES.sub("\n\n", text).strip()
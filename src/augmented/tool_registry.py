@@ -0,0 +1,120 @@
+"""
+工具注册表模块：工具名称到MCP客户端的O(1)路由，以及调用前的参数校验
+
+- 在Agent初始化时（以及服务端工具列表变化时）构建一次，调用工具时只做字典查找
+- 不同服务器提供同名工具时，冲突的工具都加上服务器名前缀（如 fs__read_file），
+  调用时再映射回原始名称
+- 每个工具的inputSchema预编译为校验函数，并按schema内容缓存，刷新时未变化的schema不重新编译
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+import json
+import re
+from typing import Any
+
+from mcp import Tool
+
+from augmented.mcp_client import MCPClient
+from augmented.schema_validator import Validator, compile_schema
+
+# OpenAI函数名称允许的字符和最大长度
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_-]")
+_MAX_NAME_LENGTH = 64
+
+
+# 工具路由
+@dataclass
+class ToolRoute:
+    """对LLM暴露的一个工具及其所在的MCP客户端"""
+
+    name: str  # 对LLM暴露的名称（冲突时带服务器前缀）
+    tool_name: str  # 服务器上的原始名称
+    client: MCPClient  # 提供该工具的MCP客户端
+    tool: Tool  # 对LLM暴露的工具定义
+    validator: Validator  # 预编译的参数校验函数
+
+
+# 工具注册表
+@dataclass
+class ToolRegistry:
+    """把工具名称映射到MCP客户端，并在调用前校验参数"""
+
+    separator: str = "__"  # 服务器前缀与工具名称之间的分隔符
+    version: int = field(default=0, init=False)  # 每次重建加1，供使用者判断工具列表是否需要更新
+
+    _routes: dict[str, ToolRoute] = field(default_factory=dict, init=False, repr=False)
+    _validators: dict[str, Validator] = field(
+        default_factory=dict, init=False, repr=False
+    )  # schema指纹 -> 预编译的校验函数
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    # 构建注册表
+    def build(self, clients: list[MCPClient]) -> None:
+        """根据各客户端当前的工具列表重建路由表"""
+        owners: dict[str, int] = {}
+        for client in clients:
+            for tool in client.get_tools():
+                owners[tool.name] = owners.get(tool.name, 0) + 1
+
+        routes: dict[str, ToolRoute] = {}
+        used_validators: dict[str, Validator] = {}
+        for client in clients:
+            for tool in client.get_tools():
+                name = tool.name
+                if owners[name] > 1:
+                    name = self._namespaced(
+                        client.name, tool.name, routes.keys() | owners.keys()
+                    )
+                fingerprint = _schema_fingerprint(tool.inputSchema)
+                validator = self._validators.get(fingerprint) or compile_schema(
+                    tool.inputSchema
+                )
+                used_validators[fingerprint] = validator
+                routes[name] = ToolRoute(
+                    name=name,
+                    tool_name=tool.name,
+                    client=client,
+                    tool=tool if name == tool.name else tool.model_copy(update={"name": name}),
+                    validator=validator,
+                )
+        self._routes = routes
+        self._validators = used_validators  # 只保留仍在使用的校验函数
+        self.version += 1
+
+    # 对LLM暴露的工具列表
+    @property
+    def tools(self) -> list[Tool]:
+        """所有工具的定义（冲突的工具已改为带前缀的名称）"""
+        return [route.tool for route in self._routes.values()]
+
+    # 查找工具
+    def resolve(self, name: str) -> ToolRoute | None:
+        """按对LLM暴露的名称查找工具路由，不存在时返回None"""
+        return self._routes.get(name)
+
+    # 校验参数
+    def validate(self, route: ToolRoute, arguments: Any) -> list[str]:
+        """按工具的inputSchema校验参数，返回错误信息列表（为空表示通过）"""
+        return route.validator(arguments, "$")
+
+    # 生成带服务器前缀的名称
+    def _namespaced(self, server: str, tool: str, taken: set[str]) -> str:
+        """生成符合OpenAI函数名规则且不重复的名称"""
+        prefix = _INVALID_NAME_CHARS.sub("_", server) or "server"
+        base = f"{prefix}{self.separator}{tool}"[:_MAX_NAME_LENGTH]
+        name, n = base, 2
+        while name in taken:
+            suffix = f"_{n}"
+            name = base[: _MAX_NAME_LENGTH - len(suffix)] + suffix
+            n += 1
+        return name
+
+
+# 计算schema的指纹
+def _schema_fingerprint(schema: Any) -> str:
+    """对schema做稳定的JSON序列化后取哈希"""
+    payload = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
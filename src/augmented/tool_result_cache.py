@@ -0,0 +1,219 @@
+"""
+工具结果缓存模块：缓存幂等MCP工具的调用结果
+
+- 按 (服务器, 工具, 规范化后的参数) 缓存，只缓存显式配置了TTL的工具
+- 有副作用的工具（名称像写入/删除/执行，或服务器标注为非只读/破坏性）即使配置了也不缓存
+- 有界LRU + TTL，并发的相同调用只发往服务器一次；出错的结果不缓存
+- 可选的磁盘持久化：每个结果一个JSON文件，进程重启后仍可命中
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import json
+from pathlib import Path
+import re
+import time
+from typing import Any, Awaitable, Callable
+import uuid
+
+from mcp import Tool, types
+from rich import print as rprint
+
+# 名称表明有副作用的工具，永远不缓存
+_SIDE_EFFECT_NAME = re.compile(
+    r"(^|[_\-.])(write|create|edit|move|rename|delete|remove|update|set|insert|put|post|"
+    r"send|execute|exec|run|install|upload|commit|push|kill|start|stop)([_\-.]|$)",
+    re.IGNORECASE,
+)
+
+
+# 缓存统计信息
+@dataclass
+class ToolCacheStats:
+    """工具结果缓存的统计计数器"""
+
+    hits: int = 0  # 内存命中次数
+    disk_hits: int = 0  # 磁盘命中次数
+    coalesced: int = 0  # 合并到在途调用的次数
+    misses: int = 0  # 实际调用服务器的次数
+    uncacheable: int = 0  # 出错而未缓存的结果数
+
+
+# 缓存条目
+@dataclass
+class _Entry:
+    result: types.CallToolResult  # 工具调用结果
+    expires_at: float  # 过期时间（time.time，便于持久化）
+
+
+# 工具结果缓存
+@dataclass
+class ToolResultCache:
+    """MCP工具调用结果的缓存（按工具启用）"""
+
+    # 启用缓存的工具及其TTL（秒），键为工具名称或 "服务器名/工具名"
+    ttl_s: dict[str, float] = field(default_factory=dict)
+    max_size: int = 512  # 内存中最多缓存的结果数
+    directory: Path | None = None  # 磁盘持久化目录，None时只缓存在内存中
+    stats: ToolCacheStats = field(default_factory=ToolCacheStats)  # 统计信息
+
+    _entries: OrderedDict[str, _Entry] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )  # 已缓存的结果，按最近使用排序
+    _inflight: dict[str, asyncio.Task[types.CallToolResult]] = field(
+        default_factory=dict, init=False, repr=False
+    )  # 在途调用
+
+    def __post_init__(self) -> None:
+        for name in self.ttl_s:
+            if _SIDE_EFFECT_NAME.search(name.rsplit("/", 1)[-1]):
+                rprint(f"[yellow]Tool {name} looks side-effecting, it will not be cached[/yellow]")
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    # 工具的TTL
+    def ttl_for(self, server: str, tool: Tool | None, name: str) -> float | None:
+        """返回工具的TTL；未启用缓存或工具有副作用时返回None"""
+        ttl = self.ttl_s.get(f"{server}/{name}", self.ttl_s.get(name))
+        if ttl is None or ttl <= 0 or _SIDE_EFFECT_NAME.search(name):
+            return None
+        annotations = getattr(tool, "annotations", None)
+        if annotations is not None and (
+            getattr(annotations, "readOnlyHint", None) is False
+            or getattr(annotations, "destructiveHint", None) is True
+        ):
+            return None
+        return ttl
+
+    # 读取缓存，未命中时调用工具
+    async def get_or_call(
+        self,
+        server: str,
+        name: str,
+        arguments: dict[str, Any],
+        ttl_s: float,
+        call: Callable[[], Awaitable[types.CallToolResult]],
+    ) -> types.CallToolResult:
+        """返回缓存的结果；未命中时调用call，并发的相同调用共享一次请求"""
+        key = _cache_key(server, name, arguments)
+        entry = self._fresh(key)
+        if entry is not None:
+            self.stats.hits += 1
+            return entry.result
+        if self.directory is not None:
+            entry = await asyncio.to_thread(self._load, key)
+            if entry is not None:
+                self.stats.disk_hits += 1
+                self._remember(key, entry)
+                return entry.result
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, ttl_s, t))
+        # shield：某个调用方被取消时不影响其他等待同一调用的调用方
+        return await asyncio.shield(task)
+
+    # 清空缓存
+    def clear(self) -> None:
+        """清空内存和磁盘中的缓存（不影响在途调用和统计信息）"""
+        self._entries.clear()
+        if self.directory is not None:
+            for path in self.directory.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    # 在途调用完成后的回调
+    def _on_done(
+        self, key: str, ttl_s: float, task: asyncio.Task[types.CallToolResult]
+    ) -> None:
+        """移除在途记录，成功的结果写入缓存"""
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if getattr(result, "isError", False):
+            self.stats.uncacheable += 1  # 出错的结果不缓存
+            return
+        entry = _Entry(result=result, expires_at=time.time() + ttl_s)
+        self._remember(key, entry)
+        if self.directory is not None:
+            # 写盘在后台线程中进行，失败只影响持久化
+            asyncio.get_running_loop().run_in_executor(None, self._save, key, entry)
+
+    # 读取未过期的内存条目
+    def _fresh(self, key: str) -> _Entry | None:
+        """返回未过期的条目并标记为最近使用，过期的条目直接删除"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    # 写入内存
+    def _remember(self, key: str, entry: _Entry) -> None:
+        """写入一条结果，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    # 从磁盘读取
+    def _load(self, key: str) -> _Entry | None:
+        """读取磁盘上未过期的结果，损坏或过期的文件被删除"""
+        path = self.directory / f"{key}.json"
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data["expires_at"] > time.time():
+                return _Entry(
+                    result=types.CallToolResult.model_validate(data["result"]),
+                    expires_at=data["expires_at"],
+                )
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            pass
+        path.unlink(missing_ok=True)
+        return None
+
+    # 写入磁盘
+    def _save(self, key: str, entry: _Entry) -> None:
+        """先写临时文件再原子替换，避免并发读到不完整的文件；写盘失败只打印提示"""
+        path = self.directory / f"{key}.json"
+        tmp = path.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp.write_text(
+                json.dumps(
+                    {
+                        "expires_at": entry.expires_at,
+                        "result": entry.result.model_dump(mode="json", by_alias=True),
+                    },
+                    ensure_ascii=False,
+                ),
+                encoding="utf-8",
+            )
+            tmp.replace(path)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            rprint(f"[yellow]Failed to persist tool result {key}: {e!s}[/yellow]")
+
+
+# 计算缓存键
+def _cache_key(server: str, name: str, arguments: dict[str, Any]) -> str:
+    """对 (服务器, 工具, 参数) 做规范化的JSON序列化（键排序、无多余空白）后取哈希"""
+    payload = json.dumps(
+        [server, name, arguments],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
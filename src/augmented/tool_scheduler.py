@@ -0,0 +1,121 @@
+"""
+工具调用调度模块：多个会话共享MCP服务器时公平地分配并发名额
+
+- 与asyncio.Semaphore一样限制并发数，但排队时不按到达顺序，而是在有等待者的会话之间轮转，
+  一个会话一次发起大量工具调用时不会让其他会话一直排队
+- 同时受全局上限和每个MCP客户端的上限约束；先占客户端名额再占全局名额，
+  等待繁忙服务器的调用不会占着全局名额
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+import contextlib
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from augmented.mcp_client import MCPClient
+
+
+# 按会话轮转分配的并发名额
+@dataclass
+class FairSlots:
+    """容量有限的并发名额，多个会话排队时按会话轮流分配"""
+
+    capacity: int  # 同时持有名额的上限
+
+    _in_use: int = field(default=0, init=False)  # 已分配的名额数
+    _waiters: OrderedDict[str, deque[asyncio.Future[None]]] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )  # 会话 -> 该会话排队中的等待者，按轮转顺序排列
+
+    # 已分配的名额数
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    # 排队中的等待者数
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiters.values())
+
+    # 获取名额
+    async def acquire(self, session: str) -> None:
+        """获取一个名额，没有空闲名额时排队等待"""
+        if self._in_use < self.capacity and not self._waiters:
+            self._in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(session, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # 名额已分配但调用方被取消，转交给下一个等待者
+            else:
+                self._discard(session, future)
+            raise
+
+    # 释放名额
+    def release(self) -> None:
+        """释放一个名额并唤醒下一个会话的等待者"""
+        self._in_use -= 1
+        self._wake()
+
+    # 唤醒等待者
+    def _wake(self) -> None:
+        """把空闲名额依次分给排在最前面的会话，被服务的会话移到队尾"""
+        while self._in_use < self.capacity and self._waiters:
+            session, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(session)
+            else:
+                del self._waiters[session]
+            if not future.done():
+                self._in_use += 1
+                future.set_result(None)
+
+    # 移除被取消的等待者
+    def _discard(self, session: str, future: asyncio.Future[None]) -> None:
+        queue = self._waiters.get(session)
+        if queue is None:
+            return
+        with contextlib.suppress(ValueError):
+            queue.remove(future)
+        if not queue:
+            del self._waiters[session]
+
+
+# 公平的工具调用调度器
+@dataclass
+class FairToolScheduler:
+    """多个会话共享的工具调用并发限制（全局 + 每个MCP客户端）"""
+
+    max_concurrent: int = 8  # 所有会话同时执行的工具调用上限
+    max_concurrent_per_client: int = 4  # 每个MCP客户端同时执行的工具调用上限
+
+    _global: FairSlots = field(init=False, repr=False)
+    _clients: dict[int, FairSlots] = field(
+        default_factory=dict, init=False, repr=False
+    )  # id(MCP客户端) -> 该客户端的名额
+
+    def __post_init__(self) -> None:
+        self._global = FairSlots(self.max_concurrent)
+
+    # 获取一次工具调用的名额
+    @contextlib.asynccontextmanager
+    async def slot(self, session: str, mcp_client: MCPClient) -> AsyncIterator[None]:
+        """在会话之间公平排队，同时持有客户端名额和全局名额"""
+        client_slots = self._clients.get(id(mcp_client))
+        if client_slots is None:
+            client_slots = FairSlots(self.max_concurrent_per_client)
+            self._clients[id(mcp_client)] = client_slots
+        await client_slots.acquire(session)
+        try:
+            await self._global.acquire(session)
+            try:
+                yield
+            finally:
+                self._global.release()
+        finally:
+            client_slots.release()
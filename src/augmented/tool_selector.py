@@ -0,0 +1,113 @@
+"""
+工具选择模块：按与当前对话的相关性挑选每次请求发送的工具
+
+工具描述只在首次出现或内容变化时嵌入一次；每次请求只嵌入一段简短的对话摘要，
+然后发送最相关的top_n个工具，以减少工具JSON schema占用的提示词token。
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+
+import mcp
+import numpy as np
+from openai.types.chat import ChatCompletionMessageParam
+
+from augmented.chunking import tail_text
+from augmented.embedding_provider import EmbeddingProvider, LocalHashingEmbeddingProvider
+
+
+# 工具选择器
+@dataclass
+class ToolSelector:
+    """用嵌入相似度为当前对话挑选最相关的工具"""
+
+    # 嵌入提供者，默认使用本地实现，不给每次请求增加网络延迟
+    provider: EmbeddingProvider = field(default_factory=LocalHashingEmbeddingProvider)
+    top_n: int = 8  # 每次请求最多发送的工具数（不含必须包含的工具）
+    always_include: set[str] = field(default_factory=set)  # 总是发送的工具名称
+    query_tokens: int = 256  # 用于检索的对话摘要的token上限
+
+    _embeddings: dict[str, tuple[str, np.ndarray]] = field(
+        default_factory=dict, init=False, repr=False
+    )  # 工具名称 -> (描述指纹, 归一化向量)
+
+    # 挑选工具
+    async def select(
+        self, tools: list[mcp.Tool], messages: list[ChatCompletionMessageParam]
+    ) -> list[mcp.Tool]:
+        """返回与对话最相关的工具（保持原有顺序），对话中已经用过的工具总会被包含"""
+        if len(tools) <= self.top_n:
+            return tools
+        query = _conversation_query(messages, self.query_tokens)
+        if not query:
+            return tools
+        vectors = await self._tool_vectors(tools)
+        query_vector = await self.provider.embed([query])
+        if vectors is None or query_vector is None:
+            return tools  # 嵌入失败时退回发送全部工具
+
+        query_vector = np.asarray(query_vector[0], dtype=np.float32)
+        scores = vectors @ (query_vector / (np.linalg.norm(query_vector) or 1))
+        chosen = set(np.argsort(-scores, kind="stable")[: self.top_n].tolist())
+        required = self.always_include | _used_tool_names(messages)
+        return [
+            tool for i, tool in enumerate(tools) if i in chosen or tool.name in required
+        ]
+
+    # 获取所有工具的描述向量
+    async def _tool_vectors(self, tools: list[mcp.Tool]) -> np.ndarray | None:
+        """返回 (len(tools), dim) 的归一化向量矩阵，只嵌入新增或描述变化的工具"""
+        texts = {tool.name: _tool_text(tool) for tool in tools}
+        fingerprints = {
+            name: hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+            for name, text in texts.items()
+        }
+        stale = [
+            name
+            for name, fp in fingerprints.items()
+            if self._embeddings.get(name, ("",))[0] != fp
+        ]
+        if stale:
+            embeddings = await self.provider.embed([texts[name] for name in stale])
+            if embeddings is None:
+                return None
+            for name, embedding in zip(stale, embeddings):
+                vector = np.asarray(embedding, dtype=np.float32)
+                self._embeddings[name] = (
+                    fingerprints[name],
+                    vector / (np.linalg.norm(vector) or 1),
+                )
+        return np.stack([self._embeddings[tool.name][1] for tool in tools])
+
+
+# 生成用于嵌入的工具描述文本
+def _tool_text(tool: mcp.Tool) -> str:
+    """工具名称、描述和参数名称拼成的文本"""
+    properties = (tool.inputSchema or {}).get("properties") or {}
+    return f"{tool.name}: {tool.description or ''}\nparameters: {', '.join(properties)}"
+
+
+# 生成用于检索的对话摘要
+def _conversation_query(
+    messages: list[ChatCompletionMessageParam], max_tokens: int
+) -> str:
+    """取最近的user消息及其后的assistant文本，截取末尾max_tokens个token"""
+    parts: list[str] = []
+    for message in reversed(messages):
+        content = message.get("content")
+        if message.get("role") in ("user", "assistant") and isinstance(content, str):
+            parts.append(content)
+        if message.get("role") == "user":
+            break
+    return tail_text("\n".join(reversed(parts)), max_tokens)
+
+
+# 对话中已经调用过的工具名称
+def _used_tool_names(messages: list[ChatCompletionMessageParam]) -> set[str]:
+    """收集历史中assistant消息调用过的工具名称，保证后续请求仍然包含这些工具"""
+    return {
+        tool_call["function"]["name"]
+        for message in messages
+        for tool_call in message.get("tool_calls") or []
+    }
+
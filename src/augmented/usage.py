@@ -0,0 +1,100 @@
+"""
+用量统计模块：token用量、首token延迟、生成速度和费用的记录与预算
+
+- UsageStats 既表示单次聊天调用的用量，也用于按调用、按invoke、按进程累加
+- 服务端没有返回用量（不支持 include_usage）时用估算值补全，并标记为估算
+- UsageBudget 描述单次invoke的硬性上限（token、费用、耗时）
+"""
+
+from dataclasses import dataclass
+
+from pydantic import BaseModel
+
+
+# 用量统计
+class UsageStats(BaseModel):
+    """一次或多次聊天调用的累计用量"""
+
+    calls: int = 0  # 聊天调用次数
+    prompt_tokens: int = 0  # 提示词token数
+    completion_tokens: int = 0  # 生成token数
+    total_tokens: int = 0  # 总token数
+    cost_usd: float = 0.0  # 费用（美元，未配置价格时为0）
+    duration_s: float = 0.0  # 请求总耗时（秒）
+    ttft_s: float = 0.0  # 首token延迟之和（秒）
+    generation_s: float = 0.0  # 从首token到流结束的时间之和（秒）
+    estimated: bool = False  # 是否包含估算的token数
+
+    # 平均首token延迟
+    @property
+    def avg_ttft_s(self) -> float:
+        """每次调用的平均首token延迟（秒）"""
+        return self.ttft_s / self.calls if self.calls else 0.0
+
+    # 生成速度
+    @property
+    def tokens_per_second(self) -> float:
+        """首token之后每秒生成的token数"""
+        return self.completion_tokens / self.generation_s if self.generation_s > 0 else 0.0
+
+    # 累加另一份用量
+    def add(self, other: "UsageStats") -> None:
+        """把other累加到当前统计中"""
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.total_tokens += other.total_tokens
+        self.cost_usd += other.cost_usd
+        self.duration_s += other.duration_s
+        self.ttft_s += other.ttft_s
+        self.generation_s += other.generation_s
+        self.estimated |= other.estimated
+
+
+# token价格
+@dataclass
+class TokenPricing:
+    """模型的token单价（美元/百万token）"""
+
+    prompt_per_million: float = 0.0  # 提示词单价
+    completion_per_million: float = 0.0  # 生成单价
+
+    # 计算费用
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """按单价计算一次调用的费用"""
+        return (
+            prompt_tokens * self.prompt_per_million
+            + completion_tokens * self.completion_per_million
+        ) / 1_000_000
+
+
+# 单次invoke的用量预算
+@dataclass
+class UsageBudget:
+    """单次invoke的硬性上限，为None的项不限制"""
+
+    max_tokens: int | None = None  # 总token上限
+    max_cost_usd: float | None = None  # 费用上限
+    max_duration_s: float | None = None  # 墙钟时间上限（秒）
+
+    # 判断是否超出预算
+    def exceeded(self, usage: UsageStats, elapsed_s: float) -> str:
+        """返回超出的预算项名称，未超出时返回空字符串"""
+        if self.max_tokens is not None and usage.total_tokens >= self.max_tokens:
+            return "tokens"
+        if self.max_cost_usd is not None and usage.cost_usd >= self.max_cost_usd:
+            return "cost"
+        if self.max_duration_s is not None and elapsed_s >= self.max_duration_s:
+            return "duration"
+        return ""
+
+    # 剩余时间
+    def remaining_s(self, elapsed_s: float) -> float | None:
+        """墙钟时间的剩余秒数，不限制时返回None"""
+        if self.max_duration_s is None:
+            return None
+        return max(0.0, self.max_duration_s - elapsed_s)
+
+
+# 进程级的累计用量
+PROCESS_USAGE = UsageStats()
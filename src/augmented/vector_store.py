@@ -1,5 +1,12 @@
 from dataclasses import dataclass, field
-from typing import Self
+from typing import Iterable, Self
+
+import numpy as np
+
+from augmented.lexical_index import BM25Index
+
+# 嵌入向量类型：HTTP/本地提供者返回float32数组，也兼容普通的浮点数列表
+Embedding = list[float] | np.ndarray
 
 
 # 向量存储项类，包含嵌入向量和对应的文档内容
@@ -7,8 +14,9 @@ from typing import Self
 class VectorStoreItem:
     """向量存储中的单个项目，包含文本的嵌入向量和原始文档内容"""
     
-    embedding: list[float]  # 文本的嵌入向量表示
+    embedding: Embedding  # 文本的嵌入向量表示
     document: str  # 原始文档文本内容
+    source: str = ""  # 文档来源（如文件路径），整篇嵌入时为空
 
 
 # 向量存储类，用于存储和检索向量化的文档
@@ -18,33 +26,193 @@ class VectorStore:
     
     items: list[VectorStoreItem] = field(default_factory=list)  # 存储所有向量项目的列表
 
+    _matrix: np.ndarray | None = field(default=None, init=False, repr=False)  # 归一化后的嵌入矩阵缓存
+    _lexical: tuple[list[VectorStoreItem], BM25Index] | None = field(
+        default=None, init=False, repr=False
+    )  # 词法索引缓存，以及它对应的项目列表
+
     # 添加向量项目到存储中
     def add(self, item: VectorStoreItem) -> Self:
         """向向量存储中添加一个新的向量项目"""
         self.items.append(item)  # 将项目添加到列表中
+        self._matrix = None  # 使嵌入矩阵缓存失效
+        self._lexical_snapshot()  # 增量更新词法索引
         return self  # 返回自身以支持链式调用
 
+    # 批量添加向量项目
+    def add_many(self, items: Iterable[VectorStoreItem]) -> Self:
+        """一次性添加多个向量项目，嵌入矩阵缓存只失效一次"""
+        self.items.extend(items)
+        self._matrix = None  # 使嵌入矩阵缓存失效
+        self._lexical_snapshot()  # 增量更新词法索引
+        return self
+
+    # 替换某个来源的全部项目
+    def replace_source(self, source: str, items: Iterable[VectorStoreItem]) -> Self:
+        """用新的项目替换某个来源的全部旧项目（不存在时相当于添加）
+
+        采用写时复制：构建新列表后整体替换，正在进行的搜索继续使用旧快照，不受影响。
+        词法索引同时更新（保留项目复用已有倒排表，只对新项目分词），降级检索时无需重建。
+        """
+        kept = [i for i, item in enumerate(self.items) if item.source != source]
+        self._replace_items(kept, list(items))
+        return self
+
+    # 删除某个来源的全部项目
+    def remove_source(self, source: str) -> int:
+        """删除某个来源的全部项目，返回删除的数量（同样采用写时复制）"""
+        kept = [i for i, item in enumerate(self.items) if item.source != source]
+        removed = len(self.items) - len(kept)
+        if removed:
+            self._replace_items(kept, [])
+        return removed
+
+    # 用保留的项目加上新项目替换项目列表
+    def _replace_items(self, kept: list[int], added: list[VectorStoreItem]) -> None:
+        """kept为保留项目的下标（升序）；同时更新词法索引，使嵌入矩阵缓存失效"""
+        items = self.items
+        lexical = self._lexical
+        if lexical is not None and lexical[0] is items and len(lexical[1]) == len(items):
+            index = lexical[1].subset(kept)
+        else:
+            index = None  # 索引尚未与当前列表同步，下面整体构建
+        new_items = [items[i] for i in kept]
+        new_items.extend(added)
+        self.items = new_items
+        self._matrix = None  # 使嵌入矩阵缓存失效
+        if index is not None:
+            self._lexical = (new_items, index)
+        self._lexical_snapshot()  # 把新项目加入词法索引
+
     # 搜索与查询向量最相似的项目
     def search(
-        self, query_embedding: list[float], top_k: int = 5
+        self, query_embedding: Embedding, top_k: int = 5
     ) -> list[VectorStoreItem]:
         """根据查询向量搜索最相似的前k个文档"""
-        # 对所有项目按与查询向量的余弦相似度进行排序，取前top_k个
-        result = sorted(
-            self.items,  # 要排序的项目列表
-            key=lambda item: self._cosine_similarity(query_embedding, item.embedding),  # 按相似度排序
-            reverse=True,  # 降序排列（相似度从高到低）
-        )[:top_k]  # 取前top_k个结果
-        return result  # 返回搜索结果
-
-    # 计算两个向量之间的余弦相似度
-    def _cosine_similarity(self, v1: list[float], v2: list[float]) -> float:
-        """计算两个向量之间的余弦相似度"""
-        # 计算向量点积
-        dot_product = sum(a * b for a, b in zip(v1, v2))
-        # 计算第一个向量的模长
-        magnitude_v1 = sum(a**2 for a in v1) ** 0.5
-        # 计算第二个向量的模长
-        magnitude_v2 = sum(b**2 for b in v2) ** 0.5
-        # 返回余弦相似度（点积除以模长的乘积）
-        return dot_product / (magnitude_v1 * magnitude_v2)
+        items, matrix = self._snapshot()
+        similarities = _similarities(matrix, query_embedding)
+        # 按余弦相似度降序取前top_k个结果
+        return [items[i] for i in _top_k_indices(similarities, top_k)]
+
+    # 使用最大边际相关性（MMR）搜索多样化的结果
+    def search_mmr(
+        self,
+        query_embedding: Embedding,
+        top_k: int = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+    ) -> list[VectorStoreItem]:
+        """先按相似度取fetch_k个候选，再用MMR从中选出top_k个彼此不重复的文档
+
+        lambda_mult越大越看重与查询的相关性，越小越看重结果之间的多样性。
+        """
+        items, matrix = self._snapshot()
+        similarities = _similarities(matrix, query_embedding)
+        candidates = _top_k_indices(similarities, max(fetch_k, top_k))
+        if not candidates.size:
+            return []
+        # 候选之间的两两相似度，一次矩阵乘法得到
+        candidate_matrix = matrix[candidates]
+        pairwise = candidate_matrix @ candidate_matrix.T
+        selected = mmr_select(similarities[candidates], pairwise, top_k, lambda_mult)
+        return [items[candidates[i]] for i in selected]
+
+    # 词法检索（BM25），不需要查询向量
+    def search_lexical(self, query: str, top_k: int = 5) -> list[VectorStoreItem]:
+        """按BM25得分返回前k个文档，得分为0的文档不返回"""
+        items, index = self._lexical_snapshot()
+        scores = index.scores(query)
+        return [items[i] for i in _top_k_indices(scores, top_k) if scores[i] > 0]
+
+    # 获取项目列表与词法索引的一致快照
+    def _lexical_snapshot(self) -> tuple[list[VectorStoreItem], BM25Index]:
+        """返回当前项目列表及其BM25索引
+
+        写入方法已经同步更新索引，这里只补上直接修改items造成的差异：
+        只追加时增量更新，列表被外部替换时重建。
+        """
+        items = self.items
+        if self._lexical is None or self._lexical[0] is not items:
+            self._lexical = (items, BM25Index())
+        index = self._lexical[1]
+        for item in items[len(index) :]:
+            index.add(item.document)
+        return items, index
+
+    # 获取项目列表与归一化嵌入矩阵的一致快照
+    def _snapshot(self) -> tuple[list[VectorStoreItem], np.ndarray]:
+        """返回当前项目列表及其按行L2归一化的嵌入矩阵，项目变化后重新构建矩阵"""
+        items = self.items
+        if self._matrix is None or len(self._matrix) != len(items):
+            if items:
+                matrix = np.asarray([item.embedding for item in items], dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                norms[norms == 0] = 1  # 零向量保持为零，避免除零
+                matrix /= norms
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+            # 构建期间列表可能被替换，只有仍是同一列表时才写入缓存
+            if items is self.items:
+                self._matrix = matrix
+            return items, matrix
+        return items, self._matrix
+
+
+# 计算查询向量与矩阵各行的余弦相似度
+def _similarities(matrix: np.ndarray, query_embedding: Embedding) -> np.ndarray:
+    """返回查询向量与归一化矩阵每一行的余弦相似度，形状为 (len(matrix),)"""
+    if not len(matrix):
+        return np.empty(0, dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    if norm:
+        query = query / norm
+    return matrix @ query
+
+
+# 取相似度最高的前k个下标
+def _top_k_indices(similarities: np.ndarray, k: int) -> np.ndarray:
+    """返回按相似度降序排列的前k个下标"""
+    k = min(k, len(similarities))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    # argpartition是O(n)的，只对前k个再排序
+    top = np.argpartition(-similarities, k - 1)[:k]
+    return top[np.argsort(-similarities[top], kind="stable")]
+
+
+# 最大边际相关性选择
+def mmr_select(
+    query_similarities: np.ndarray,
+    pairwise: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> list[int]:
+    """从候选中贪心选出k个：每步选 lambda*相关性 - (1-lambda)*与已选结果的最大相似度 最大者
+
+    Args:
+        query_similarities: 每个候选与查询的相似度，形状为 (n,)
+        pairwise: 候选之间的两两相似度，形状为 (n, n)
+        k: 要选出的数量
+        lambda_mult: 相关性与多样性的权衡系数，取值 [0, 1]
+
+    Returns:
+        被选中候选的下标，按选择顺序排列
+    """
+    n = len(query_similarities)
+    k = min(k, n)
+    selected: list[int] = []
+    if k <= 0:
+        return selected
+    # 每个候选与已选集合的最大相似度，随选择增量更新，避免两两循环
+    max_redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(k):
+        redundancy = np.where(np.isfinite(max_redundancy), max_redundancy, 0)
+        scores = lambda_mult * query_similarities - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_redundancy, pairwise[best], out=max_redundancy)
+    return selected
@@ -0,0 +1,9 @@
+"""测试的公共fixture"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _api_key(monkeypatch):
+    """AsyncChatOpenAI构造时需要API key，测试中不会真正发起请求"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
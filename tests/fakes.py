@@ -0,0 +1,201 @@
+"""测试用的假LLM流和假MCP客户端，不发起任何网络请求"""
+
+import asyncio
+import json
+import types as pytypes
+
+from openai.types import CompletionUsage
+from openai.types.chat.chat_completion_chunk import (
+    ChatCompletionChunk,
+    Choice,
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+
+
+def chunk(content=None, tool_calls=None, finish=None):
+    """一个流式响应块"""
+    return ChatCompletionChunk(
+        id="c",
+        created=0,
+        model="m",
+        object="chat.completion.chunk",
+        choices=[
+            Choice(
+                index=0,
+                delta=ChoiceDelta(content=content, tool_calls=tool_calls),
+                finish_reason=finish,
+            )
+        ],
+    )
+
+
+def usage_chunk(prompt_tokens=10, completion_tokens=5):
+    """流末尾的用量块"""
+    return ChatCompletionChunk(
+        id="c",
+        created=0,
+        model="m",
+        object="chat.completion.chunk",
+        choices=[],
+        usage=CompletionUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+def tool_call(index, id=None, name=None, args=None):
+    """一个工具调用增量"""
+    return [
+        ChoiceDeltaToolCall(
+            index=index,
+            id=id,
+            type="function" if id else None,
+            function=ChoiceDeltaToolCallFunction(name=name, arguments=args),
+        )
+    ]
+
+
+def text_response(text):
+    """只包含文本的完整响应"""
+    return [chunk(text), chunk(finish="stop"), usage_chunk()]
+
+
+class FakeStream:
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for c in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield c
+
+    async def close(self):
+        return None
+
+
+class FakeCompletions:
+    def __init__(self, scripts):
+        self.scripts = scripts if callable(scripts) else list(scripts)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if callable(self.scripts):
+            return FakeStream(self.scripts(kwargs["messages"]))
+        return FakeStream(self.scripts.pop(0))
+
+
+def install(llm, scripts):
+    """把AsyncChatOpenAI的OpenAI客户端替换为假客户端
+
+    scripts为响应列表时按顺序返回；为函数时根据请求的消息生成响应。
+    """
+    completions = FakeCompletions(scripts)
+    llm.llm = pytypes.SimpleNamespace(chat=pytypes.SimpleNamespace(completions=completions))
+    return completions
+
+
+class FakeResult:
+    def __init__(self, text):
+        self.text = text
+
+    def model_dump_json(self):
+        return json.dumps({"content": [{"type": "text", "text": self.text}]})
+
+
+class Gauge:
+    """记录同时进行中的调用数及其峰值"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    def enter(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+
+    def exit(self):
+        self.active -= 1
+
+
+class FakeMCP:
+    """只实现Agent用到的接口的MCP客户端
+
+    参数中的delay覆盖默认的执行时间；failing中的工具执行后抛出RuntimeError；
+    gauge记录该客户端的并发数，shared（可选）在多个客户端之间共享；
+    start_delay/start_error模拟启动缓慢或启动失败。
+    """
+
+    def __init__(
+        self, name, tools, delay=0.0, failing=(), shared=None, start_delay=0.0, start_error=None
+    ):
+        self.name = name
+        self.tools = [_SimpleTool(t) for t in tools]
+        self.delay = delay
+        self.failing = set(failing)
+        self.gauge = Gauge()
+        self.shared = shared
+        self.start_delay = start_delay
+        self.start_error = start_error
+        self.calls = []
+        self.tools_stale = False
+        self.started = False
+
+    async def init(self):
+        await asyncio.sleep(self.start_delay)
+        if self.start_error is not None:
+            raise self.start_error
+        self.started = True
+
+    async def cleanup(self):
+        self.started = False
+
+    def get_tools(self):
+        return self.tools
+
+    async def refresh_tools(self):
+        return False
+
+    async def call_tool(self, name, params):
+        self.calls.append((name, params))
+        gauges = [self.gauge] + ([self.shared] if self.shared else [])
+        for gauge in gauges:
+            gauge.enter()
+        try:
+            await asyncio.sleep(params.get("delay", self.delay))
+            if name in self.failing:
+                raise RuntimeError(f"{name} exploded")
+        finally:
+            for gauge in gauges:
+                gauge.exit()
+        return FakeResult(f"{name}:{json.dumps(params, sort_keys=True)}")
+
+
+class _SimpleTool:
+    """具备Tool常用属性的简单对象"""
+
+    def __init__(self, name, schema=None):
+        self.name = name
+        self.description = f"{name} tool"
+        self.inputSchema = schema or {"type": "object", "properties": {}}
+        self.annotations = None
+
+    def model_copy(self, update):
+        tool = _SimpleTool(self.name, self.inputSchema)
+        for key, value in update.items():
+            setattr(tool, key, value)
+        return tool
@@ -0,0 +1,247 @@
+"""agent模块的测试：事件流、工具调用并发与顺序、错误处理、预算和启动"""
+
+import asyncio
+from contextlib import aclosing
+import json
+import time
+
+import pytest
+
+from augmented.agent import Agent, ToolCallFinishedEvent, ToolCallStartedEvent
+from augmented.usage import UsageBudget
+from fakes import FakeMCP, FakeStream, Gauge, chunk, install, text_response, tool_call, usage_chunk
+
+
+def _tool_calls(*calls):
+    """一次请求多个工具调用的响应，calls为 (id, 工具名称, 参数) 列表"""
+    return [
+        *(
+            chunk(tool_calls=tool_call(i, id=id, name=name, args=json.dumps(args)))
+            for i, (id, name, args) in enumerate(calls)
+        ),
+        chunk(finish="tool_calls"),
+        usage_chunk(),
+    ]
+
+
+async def _started(agent: Agent, scripts) -> Agent:
+    await agent.init()
+    install(agent.llm, scripts)
+    return agent
+
+
+async def _events(agent: Agent, prompt: str) -> list:
+    async with aclosing(agent.invoke_stream(prompt)) as events:
+        return [event async for event in events]
+
+
+def test_tool_events_carry_their_cycle():
+    agent = Agent(mcp_clients=[FakeMCP("srv", ["search"])], model="m", tool_output=None)
+    scripts = [
+        _tool_calls(("a", "search", {"q": 1})),
+        _tool_calls(("b", "search", {"q": 2}), ("c", "search", {"q": 3})),
+        text_response("done"),
+    ]
+
+    async def main():
+        await _started(agent, scripts)
+        try:
+            return await _events(agent, "hi")
+        finally:
+            await agent.cleanup()
+
+    events = asyncio.run(main())
+    started = {e.tool_call_id: e.cycle for e in events if isinstance(e, ToolCallStartedEvent)}
+    finished = {e.tool_call_id: e.cycle for e in events if isinstance(e, ToolCallFinishedEvent)}
+    assert started == finished == {"a": 0, "b": 1, "c": 1}
+    assert events[-1].content == "done" and events[-1].cycles == 3
+
+
+def test_duration_budget_applies_to_a_stalled_stream():
+    agent = Agent(
+        mcp_clients=[FakeMCP("srv", ["search"])],
+        model="m",
+        tool_output=None,
+        budget=UsageBudget(max_duration_s=0.3),
+    )
+
+    async def main():
+        await _started(agent, [])
+        agent.llm.llm.chat.completions.create = _stalled_create
+        try:
+            started = time.perf_counter()
+            events = await _events(agent, "hi")
+            return events, time.perf_counter() - started
+        finally:
+            await agent.cleanup()
+
+    events, elapsed = asyncio.run(main())
+    assert elapsed < 1.0
+    assert events[-1].stop_reason == "budget_exceeded:duration"
+    assert all(m["role"] != "assistant" for m in agent.llm.messages)  # 不完整的响应不写入历史
+
+
+async def _stalled_create(**kwargs):
+    return FakeStream(text_response("late"), delay=2.0)
+
+
+def _run_tools(agent: Agent, *calls) -> tuple[list, list[dict]]:
+    """执行一轮工具调用后给出回答，返回 (事件, 消息历史)"""
+
+    async def main():
+        await _started(agent, [_tool_calls(*calls), text_response("done")])
+        try:
+            return await _events(agent, "hi")
+        finally:
+            await agent.cleanup()
+
+    events = asyncio.run(main())
+    return events, agent.llm.messages
+
+
+def _tool_messages(messages: list[dict]) -> list[tuple[str, str]]:
+    return [(m["tool_call_id"], m["content"]) for m in messages if m["role"] == "tool"]
+
+
+def test_tool_failure_becomes_a_tool_result():
+    mcp = FakeMCP("srv", ["search", "boom"], failing={"boom"})
+    agent = Agent(mcp_clients=[mcp], model="m", tool_output=None)
+    events, messages = _run_tools(agent, ("a", "search", {}), ("b", "boom", {}))
+
+    results = _tool_messages(messages)
+    assert [call_id for call_id, _ in results] == ["a", "b"]
+    assert results[1][1] == "Error: tool `boom` failed: boom exploded"
+    assert events[-1].content == "done"
+    finished = {e.tool_call_id: e.error for e in events if isinstance(e, ToolCallFinishedEvent)}
+    assert finished == {"a": "", "b": "boom exploded"}
+    outputs = {e.tool_call_id: e.output for e in events if isinstance(e, ToolCallFinishedEvent)}
+    assert outputs == dict(results)  # 结束事件带有写入历史的工具输出
+
+
+def test_results_keep_call_order_under_concurrency():
+    mcp = FakeMCP("srv", ["search"])
+    agent = Agent(mcp_clients=[mcp], model="m", tool_output=None)
+    events, messages = _run_tools(
+        agent,
+        ("a", "search", {"delay": 0.1}),
+        ("b", "search", {"delay": 0.0}),
+        ("c", "search", {"delay": 0.05}),
+    )
+    assert [call_id for call_id, _ in _tool_messages(messages)] == ["a", "b", "c"]
+    finished = [e.tool_call_id for e in events if isinstance(e, ToolCallFinishedEvent)]
+    assert finished == ["b", "c", "a"]  # 结束事件按完成顺序产出
+
+
+def test_tool_timeout_excludes_queueing():
+    mcp = FakeMCP("srv", ["search"])
+    agent = Agent(
+        mcp_clients=[mcp],
+        model="m",
+        tool_output=None,
+        tool_timeout_s=0.15,
+        max_concurrent_per_client=1,
+    )
+    _, messages = _run_tools(
+        agent,
+        ("a", "search", {"delay": 1.0}),
+        ("b", "search", {"delay": 0.1}),
+        ("c", "search", {"delay": 0.1}),
+    )
+    results = dict(_tool_messages(messages))
+    assert results["a"] == "Error: tool `search` timed out after 0.15s"
+    # b、c排队的时间不计入超时
+    assert "timed out" not in results["b"] and "timed out" not in results["c"]
+
+
+def test_global_and_per_client_limits():
+    shared = Gauge()
+    first = FakeMCP("one", ["a"], delay=0.05, shared=shared)
+    second = FakeMCP("two", ["b"], delay=0.05, shared=shared)
+    agent = Agent(
+        mcp_clients=[first, second],
+        model="m",
+        tool_output=None,
+        max_concurrent_tools=3,
+        max_concurrent_per_client=2,
+    )
+    _, messages = _run_tools(agent, *((f"{n}{i}", n, {}) for n in "ab" for i in range(4)))
+    assert len(_tool_messages(messages)) == 8
+    assert shared.peak == 3
+    assert first.gauge.peak <= 2 and second.gauge.peak <= 2
+
+
+def test_busy_server_does_not_block_other_servers():
+    slow = FakeMCP("slow", ["slow"], delay=0.3)
+    fast = FakeMCP("fast", ["fast"])
+    agent = Agent(
+        mcp_clients=[slow, fast],
+        model="m",
+        tool_output=None,
+        max_concurrent_tools=2,
+        max_concurrent_per_client=1,
+    )
+    events, _ = _run_tools(
+        agent, ("s1", "slow", {}), ("s2", "slow", {}), ("s3", "slow", {}), ("f", "fast", {})
+    )
+    durations = {e.tool_call_id: e.duration_s for e in events if isinstance(e, ToolCallFinishedEvent)}
+    assert durations["f"] < 0.2  # 不必等待慢服务器的排队调用让出全局名额
+
+
+def test_startup_failure_cleans_up_started_servers():
+    ok = FakeMCP("ok", ["a"])
+    broken = FakeMCP("broken", ["b"], start_error=OSError("no such command"))
+    slow = FakeMCP("slow", ["c"], start_delay=5.0)
+    agent = Agent(mcp_clients=[ok, broken, slow], model="m", startup_timeout_s=0.1)
+
+    async def main():
+        started = time.perf_counter()
+        with pytest.raises(RuntimeError, match="broken, slow") as info:
+            await agent.init()
+        return info.value, time.perf_counter() - started
+
+    error, elapsed = asyncio.run(main())
+    assert elapsed < 1.0  # 每个服务器有独立的启动超时
+    assert isinstance(error.__cause__, OSError)
+    assert not ok.started and agent.mcp_clients == []  # 已启动的服务器被关闭
+
+
+def test_partial_startup_keeps_healthy_servers():
+    ok = FakeMCP("ok", ["a"])
+    slow = FakeMCP("slow", ["c"], start_delay=5.0)
+    agent = Agent(
+        mcp_clients=[ok, slow], model="m", startup_timeout_s=0.1, allow_partial_startup=True
+    )
+
+    async def main():
+        await agent.init()
+        try:
+            return [t.name for t in agent.registry.tools], list(agent.mcp_clients)
+        finally:
+            await agent.cleanup()
+
+    tools, clients = asyncio.run(main())
+    assert tools == ["a"] and clients == [ok]
+    assert not ok.started  # cleanup后关闭
+
+
+def test_partial_startup_still_fails_when_every_server_fails():
+    broken = FakeMCP("broken", ["b"], start_error=OSError("boom"))
+    agent = Agent(mcp_clients=[broken], model="m", allow_partial_startup=True)
+    with pytest.raises(RuntimeError, match="MCP servers failed to start: broken"):
+        asyncio.run(agent.init())
+
+
+def test_console_invoke_prints_tool_calls_and_results(capsys):
+    agent = Agent(mcp_clients=[FakeMCP("srv", ["search"])], model="m", tool_output=None)
+
+    async def main():
+        await _started(agent, [_tool_calls(("a", "search", {"q": "x"})), text_response("done")])
+        try:
+            return await agent.invoke("hi")
+        finally:
+            await agent.cleanup()
+
+    assert asyncio.run(main()) == "done"
+    out = capsys.readouterr().out
+    assert "TOOL USE `search`" in out and '{"q": "x"}' in out
+    assert "call result:" in out and "search:" in out
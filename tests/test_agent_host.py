@@ -0,0 +1,77 @@
+"""agent_host模块的测试：共享MCP客户端的多会话调用"""
+
+import asyncio
+import json
+
+import pytest
+
+from augmented.agent import Agent
+from augmented.agent_host import AgentHost
+from fakes import FakeMCP, chunk, install, text_response, tool_call, usage_chunk
+
+
+def _responder(messages):
+    """没有工具结果时请求一次工具调用，拿到结果后用它作为回答"""
+    last = messages[-1]
+    if last["role"] == "tool":
+        return text_response(f"answer from {last['content']}")
+    prompt = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+    args = json.dumps({"q": prompt})
+    return [
+        chunk(tool_calls=tool_call(0, id=f"call-{prompt}", name="search", args=args)),
+        chunk(finish="tool_calls"),
+        usage_chunk(),
+    ]
+
+
+def _host(**kwargs) -> tuple[AgentHost, FakeMCP]:
+    mcp = FakeMCP("srv", ["search"], delay=0.01)
+    agent = Agent(mcp_clients=[mcp], model="m", tool_output=None)
+    return AgentHost(agent, **kwargs), mcp
+
+
+def test_sessions_share_servers_but_not_history(capsys):
+    host, mcp = _host()
+
+    async def main():
+        async with host:
+            install(host.agent.llm, _responder)
+            a = host.open_session("a")
+            b = host.open_session("b", context="ctx for b")
+            answers = await asyncio.gather(host.invoke(a, "q1"), host.invoke(b, "q2"))
+            histories = {
+                sid: [m.get("content") for m in host._sessions[sid].agent.llm.messages]
+                for sid in (a, b)
+            }
+            return answers, histories
+
+    answers, histories = asyncio.run(main())
+    assert answers[0].startswith("answer from") and "q1" in answers[0]
+    assert "q2" in answers[1]
+    assert "q2" not in str(histories["a"]) and "q1" not in str(histories["b"])
+    assert histories["b"][0] == "ctx for b"
+    assert sorted(params["q"] for _, params in mcp.calls) == ["q1", "q2"]
+    assert not mcp.started  # stop时关闭
+    out = capsys.readouterr().out
+    assert "answer from" not in out  # 宿主不打印LLM输出
+    assert "TOOL USE" not in out and "with args" not in out and "call result" not in out
+
+
+def test_eviction_and_session_errors():
+    host, _ = _host(max_sessions=2)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            host.open_session()  # 尚未启动
+        async with host:
+            host.open_session("a")
+            host.open_session("b")
+            with pytest.raises(ValueError):
+                host.open_session("a")
+            host.open_session("c")  # 淘汰最久未使用的a
+            assert host.sessions == ["b", "c"]
+            assert host.close_session("b") and not host.close_session("b")
+            with pytest.raises(KeyError):
+                await host.invoke("a", "hi")
+
+    asyncio.run(main())
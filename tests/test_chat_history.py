@@ -0,0 +1,116 @@
+"""chat_history模块的测试：token预算、工具调用分组和超预算信号"""
+
+import random
+
+from augmented.chat_history import HistoryManager, message_tokens
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(f"w{rng.randrange(1000)}" for _ in range(n))
+
+
+def _random_history(rng: random.Random) -> list[dict]:
+    """随机生成包含多轮工具调用的历史，user/assistant文本较短，工具结果可能很长"""
+    messages: list[dict] = [{"role": "system", "content": _words(rng, rng.randrange(5, 40))}]
+    call_id = 0
+    for _ in range(rng.randrange(1, 8)):
+        messages.append({"role": "user", "content": _words(rng, rng.randrange(1, 30))})
+        for _ in range(rng.randrange(0, 4)):
+            calls = []
+            for _ in range(rng.randrange(1, 4)):
+                call_id += 1
+                calls.append(
+                    {
+                        "id": f"call_{call_id}",
+                        "type": "function",
+                        "function": {"name": "search", "arguments": '{"q": "x"}'},
+                    }
+                )
+            messages.append({"role": "assistant", "content": None, "tool_calls": calls})
+            for call in calls:
+                messages.append(
+                    {
+                        "role": "tool",
+                        "tool_call_id": call["id"],
+                        "content": _words(rng, rng.randrange(1, 800)),
+                    }
+                )
+        messages.append({"role": "assistant", "content": _words(rng, rng.randrange(1, 30))})
+    return messages
+
+
+def _total(messages: list[dict]) -> int:
+    return sum(message_tokens(m) for m in messages)
+
+
+def _assert_groups_intact(messages: list[dict]) -> None:
+    """每个tool结果都紧跟在声明它的tool_calls之后，每个tool_calls的结果都齐全"""
+    expected: list[str] = []
+    for message in messages:
+        if message["role"] == "tool":
+            assert expected and message["tool_call_id"] == expected.pop(0)
+        else:
+            assert not expected
+            expected = [c["id"] for c in message.get("tool_calls") or []]
+    assert not expected
+
+
+def test_fit_returns_messages_unchanged_within_budget():
+    messages = [{"role": "system", "content": "hi"}, {"role": "user", "content": "hello"}]
+    manager = HistoryManager(max_tokens=1000)
+    assert manager.fit(messages, pinned=1) == messages
+    assert manager.overflow_tokens == 0
+
+
+def test_fit_stays_within_budget_and_keeps_tool_groups():
+    rng = random.Random(0)
+    for _ in range(500):
+        messages = _random_history(rng)
+        manager = HistoryManager(
+            max_tokens=rng.randrange(300, 3000),
+            keep_recent_turns=rng.randrange(1, 4),
+            elided_tool_tokens=rng.choice([32, 128, 512]),
+        )
+        fitted = manager.fit(messages, pinned=1)
+        assert fitted[0] == messages[0]
+        assert _total(fitted) <= manager.max_tokens
+        assert manager.overflow_tokens == 0
+        assert [m for m in messages if m["role"] == "user"][-1] in fitted
+        _assert_groups_intact(fitted[1:])
+
+
+def test_fit_keeps_latest_user_message():
+    messages = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "old question"},
+        {"role": "assistant", "content": "old answer " * 500},
+        {"role": "user", "content": "latest question"},
+    ]
+    fitted = HistoryManager(max_tokens=100, keep_recent_turns=2).fit(messages, pinned=1)
+    assert fitted == [messages[0], messages[-1]]
+
+
+def test_fit_keeps_current_question_when_its_tool_output_is_over_budget():
+    messages = [{"role": "system", "content": "sys"}, {"role": "user", "content": "question"}]
+    for i in range(10):
+        call = {"id": f"call_{i}", "type": "function", "function": {"name": "f", "arguments": "{}"}}
+        messages.append({"role": "assistant", "content": None, "tool_calls": [call]})
+        messages.append({"role": "tool", "tool_call_id": call["id"], "content": "x " * 4000})
+    manager = HistoryManager(max_tokens=2000, elided_tool_tokens=1000)
+    fitted = manager.fit(messages, pinned=1)
+
+    assert [m["role"] for m in fitted[:2]] == ["system", "user"]
+    assert fitted[-1]["tool_call_id"] == "call_9"  # 丢弃的是问题之后较早的工具调用
+    assert _total(fitted) <= 2000 and manager.overflow_tokens == 0
+    _assert_groups_intact(fitted[1:])
+
+
+def test_fit_reports_overflow_when_pinned_messages_exceed_budget():
+    messages = [
+        {"role": "system", "content": "context " * 200},
+        {"role": "user", "content": "question"},
+    ]
+    manager = HistoryManager(max_tokens=50)
+    fitted = manager.fit(messages, pinned=1)
+    assert fitted[0] == messages[0]
+    assert manager.overflow_tokens == _total(fitted) - 50 > 0
@@ -0,0 +1,63 @@
+"""chat_openai模块的测试：流式事件、工具调用汇总，以及默认不写标准输出"""
+
+import asyncio
+
+from augmented.chat_openai import (
+    AsyncChatOpenAI,
+    ResponseDoneEvent,
+    TextDeltaEvent,
+    ToolCallReadyEvent,
+)
+from fakes import chunk, install, text_response, tool_call, usage_chunk
+
+
+def test_chat_does_not_print_by_default(capsys):
+    llm = AsyncChatOpenAI("m")
+    install(llm, [text_response("hello")])
+    response = asyncio.run(llm.chat("hi"))
+    assert response.content == "hello"
+    assert "hello" not in capsys.readouterr().out  # 只有日志标题，没有生成的文本
+
+
+def test_chat_prints_when_asked(capsys):
+    llm = AsyncChatOpenAI("m")
+    install(llm, [text_response("hello")])
+    asyncio.run(llm.chat("hi", print_llm_output=True))
+    assert "hello\n" in capsys.readouterr().out
+
+
+def test_chat_stream_assembles_tool_calls_and_usage():
+    llm = AsyncChatOpenAI("m")
+    install(
+        llm,
+        [
+            [
+                chunk(tool_calls=tool_call(0, id="a", name="search", args='{"q":')),
+                chunk(tool_calls=tool_call(0, args='"x"}')),
+                chunk(tool_calls=tool_call(1, id="b", name="fetch", args="{}")),
+                chunk(finish="tool_calls"),
+                usage_chunk(prompt_tokens=7, completion_tokens=3),
+            ]
+        ],
+    )
+
+    async def collect():
+        return [event async for event in llm.chat_stream("hi")]
+
+    events = asyncio.run(collect())
+    ready = [e.tool_call.id for e in events if isinstance(e, ToolCallReadyEvent)]
+    assert ready == ["a", "b"]  # 第一个调用在第二个开始时就已完整
+    assert not any(isinstance(e, TextDeltaEvent) for e in events)
+    done = events[-1]
+    assert isinstance(done, ResponseDoneEvent)
+    assert [c.function.arguments for c in done.response.tool_calls] == ['{"q":"x"}', "{}"]
+    assert done.response.usage.prompt_tokens == 7 and llm.usage.total_tokens == 10
+    assert llm.messages[-1]["role"] == "assistant"
+
+
+def test_fork_has_independent_messages_and_pinned_context():
+    llm = AsyncChatOpenAI("m", system_prompt="sys")
+    branch = llm.fork(context="ctx")
+    assert [m["content"] for m in branch.messages] == ["sys", "ctx"]
+    assert [m["content"] for m in llm.messages] == ["sys"]
+    assert branch._pinned_messages == 2
@@ -0,0 +1,102 @@
+"""chunking模块的测试：token估算、超长段落切分和流式分块"""
+
+from pathlib import Path
+
+import pytest
+
+from augmented.chunking import (
+    MarkdownChunker,
+    estimate_tokens,
+    head_text,
+    MAX_BLOCK_CHARS,
+    iter_file_blocks,
+    tail_text,
+)
+
+
+def test_estimate_tokens_counts_cjk_chars_words_and_punctuation():
+    assert estimate_tokens("你好，world!") == 5
+
+
+def test_head_and_tail_text():
+    text = "one two three four"
+    assert head_text(text, 2).strip() == "one two"
+    assert tail_text(text, 2) == "three four"
+    assert head_text(text, 10) == text
+
+
+def test_split_oversized_keeps_cjk_text_intact():
+    chunker = MarkdownChunker(max_tokens=16, overlap_tokens=2)
+    block = "这是第一句话。这是第二句话！这是第三句话？这是第四句话；结束。"
+    pieces = list(chunker._split_oversized(block))
+    assert len(pieces) > 1
+    assert "".join(pieces) == block  # 不插入空格，分隔符原样保留
+    assert all(" " not in piece for piece in pieces)
+
+
+def test_split_oversized_keeps_english_spacing():
+    chunker = MarkdownChunker(max_tokens=8, overlap_tokens=2)
+    block = "First sentence here. Second sentence here. Third one."
+    pieces = list(chunker._split_oversized(block))
+    assert " ".join(pieces) == block
+    assert all(estimate_tokens(piece) <= 6 for piece in pieces)
+
+
+def test_split_oversized_hard_cuts_long_runs():
+    chunker = MarkdownChunker(max_tokens=8, overlap_tokens=2)
+    pieces = list(chunker._split_oversized("字" * 20))
+    assert "".join(pieces) == "字" * 20
+    assert all(estimate_tokens(piece) <= 6 for piece in pieces)
+
+
+def test_chunks_respect_max_tokens_and_overlap():
+    chunker = MarkdownChunker(max_tokens=20, overlap_tokens=5)
+    blocks = [f"段落{i}的内容。" * 3 for i in range(10)]
+    chunks = list(chunker.chunk_blocks(blocks, source="doc"))
+    assert len(chunks) > 1
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+    assert all(c.source == "doc" for c in chunks)
+    assert all(estimate_tokens(c.text) <= 20 for c in chunks)
+
+
+def test_heading_starts_new_chunk():
+    chunker = MarkdownChunker(max_tokens=50, overlap_tokens=5)
+    chunks = list(chunker.chunk_blocks(["intro text", "# Title", "body text"]))
+    assert [c.text for c in chunks] == ["intro text", "# Title\n\nbody text"]
+
+
+def test_iter_file_blocks_splits_on_headings_and_blank_lines(tmp_path: Path):
+    path = tmp_path / "doc.md"
+    path.write_text("# H1\nline one\nline two\n\npara two\n## H2\n", encoding="utf-8")
+    assert list(iter_file_blocks(path)) == [
+        "# H1",
+        "line one\nline two",
+        "para two",
+        "## H2",
+    ]
+
+
+def test_iter_file_blocks_reads_long_lines_in_bounded_pieces(tmp_path: Path):
+    path = tmp_path / "one-line.txt"
+    line = "word " * (MAX_BLOCK_CHARS // 2)  # 约5个块长，没有换行
+    path.write_text(f"{line}\n# not a heading", encoding="utf-8")
+    blocks = list(iter_file_blocks(path))
+    assert len(blocks) > 3
+    assert all(len(block) <= MAX_BLOCK_CHARS for block in blocks)
+    # 只会在读取边界处把单词切开，不丢失内容
+    assert "".join("".join(blocks).split()) == "".join(f"{line}# not a heading".split())
+
+
+def test_heading_only_matches_at_line_start(tmp_path: Path):
+    path = tmp_path / "doc.md"
+    path.write_text("x" * (MAX_BLOCK_CHARS - 1) + "# tail\n# Real\n", encoding="utf-8")
+    blocks = list(iter_file_blocks(path))
+    assert blocks[-1] == "# Real"
+    assert not any(block.startswith("#") for block in blocks[:-1])
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        MarkdownChunker(max_tokens=0)
+    with pytest.raises(ValueError):
+        MarkdownChunker(max_tokens=10, overlap_tokens=10)
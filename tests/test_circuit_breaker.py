@@ -0,0 +1,54 @@
+"""circuit_breaker模块的测试：打开、冷却后半开探测、关闭和共享实例"""
+
+import pytest
+
+from augmented import circuit_breaker
+from augmented.circuit_breaker import CircuitBreaker, CircuitOpenError, shared_breaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(name="llm", failure_threshold=3, reset_timeout_s=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # 成功清零连续失败次数
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow() and not breaker.available
+    clock[0] += 4
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.check()
+    assert info.value.name == "llm" and info.value.retry_after_s == 6
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.available
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow() and not breaker.available
+
+    breaker.release()  # 探测被取消，允许下一个探测
+    assert breaker.allow()
+    breaker.record_failure()  # 探测失败，重新打开
+    assert breaker.state == "open" and breaker.retry_after_s == 10
+
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+def test_shared_breaker_returns_one_instance_per_name():
+    assert shared_breaker("test-endpoint") is shared_breaker("test-endpoint")
+    assert shared_breaker("test-endpoint") is not shared_breaker("other-endpoint")
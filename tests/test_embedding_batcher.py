@@ -0,0 +1,83 @@
+"""embedding_batcher模块的测试：合并并发请求，以及出错时不让调用方一直等待"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from augmented.embedding_batcher import EmbeddingMicroBatcher
+
+
+def _fake_embed(calls: list[list[str]], drop: int = 0):
+    async def embed_batch(texts: list[str]) -> np.ndarray:
+        calls.append(texts)
+        await asyncio.sleep(0)
+        rows = [[float(len(text)), 1.0] for text in texts]
+        return np.asarray(rows[: len(rows) - drop], dtype=np.float32)
+
+    return embed_batch
+
+
+def _run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=2))  # 挂起的调用方会超时失败
+
+
+def test_concurrent_submits_share_one_batch():
+    calls: list[list[str]] = []
+
+    async def main():
+        batcher = EmbeddingMicroBatcher(_fake_embed(calls), max_wait_ms=10)
+        results = await asyncio.gather(*(batcher.submit("x" * i) for i in range(1, 6)))
+        return batcher, results
+
+    batcher, results = _run(main())
+    assert calls == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+    assert [float(r[0]) for r in results] == [1, 2, 3, 4, 5]
+    assert batcher.stats.batches == 1 and batcher.stats.avg_batch_size == 5
+
+
+def test_max_batch_size_flushes_immediately():
+    calls: list[list[str]] = []
+
+    async def main():
+        batcher = EmbeddingMicroBatcher(_fake_embed(calls), max_wait_ms=1000, max_batch_size=2)
+        await asyncio.gather(*(batcher.submit(str(i)) for i in range(4)))
+
+    _run(main())
+    assert calls == [["0", "1"], ["2", "3"]]
+
+
+def test_short_response_fails_every_caller():
+    calls: list[list[str]] = []
+
+    async def main():
+        batcher = EmbeddingMicroBatcher(_fake_embed(calls, drop=1), max_wait_ms=5)
+        return await asyncio.gather(
+            *(batcher.submit(str(i)) for i in range(3)), return_exceptions=True
+        )
+
+    results = _run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_provider_error_propagates():
+    async def failing(texts: list[str]) -> np.ndarray:
+        raise RuntimeError("boom")
+
+    async def main():
+        batcher = EmbeddingMicroBatcher(failing, max_wait_ms=1)
+        await batcher.submit("q")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        _run(main())
+
+
+def test_none_result_gives_none_to_every_caller():
+    async def unavailable(texts: list[str]) -> None:
+        return None
+
+    async def main():
+        batcher = EmbeddingMicroBatcher(unavailable, max_wait_ms=1)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+
+    assert _run(main()) == [None, None]
@@ -0,0 +1,76 @@
+"""embedding_cache模块的测试：LRU淘汰、在途合并和失败不缓存"""
+
+import asyncio
+
+import numpy as np
+
+from augmented.embedding_cache import QueryEmbeddingCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("a", np.ones(2))
+    cache.put("b", np.ones(2))
+
+    async def compute():
+        raise AssertionError("should hit the cache")
+
+    asyncio.run(cache.get_or_compute("a", compute))  # a变为最近使用
+    cache.put("c", np.ones(2))
+    assert len(cache) == 2
+    assert set(cache._entries) == {"a", "c"}
+    assert cache.stats.hits == 1
+
+
+def test_concurrent_queries_share_one_computation():
+    cache = QueryEmbeddingCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return np.array([1.0, 0.0])
+
+    async def main():
+        results = await asyncio.gather(*(cache.get_or_compute("q", compute) for _ in range(5)))
+        again = await cache.get_or_compute("q", compute)
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results) and again is results[0]
+    assert (cache.stats.misses, cache.stats.coalesced, cache.stats.hits) == (1, 4, 1)
+    assert cache.stats.saved_calls == 5
+
+
+def test_cancelled_waiter_does_not_cancel_shared_computation():
+    cache = QueryEmbeddingCache()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return np.array([1.0])
+
+    async def main():
+        first = asyncio.ensure_future(cache.get_or_compute("q", compute))
+        second = asyncio.ensure_future(cache.get_or_compute("q", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()).tolist() == [1.0]
+    assert len(cache) == 1
+
+
+def test_failed_results_are_not_cached():
+    cache = QueryEmbeddingCache()
+    responses = [None, np.array([1.0])]
+
+    async def compute():
+        return responses.pop(0)
+
+    async def main():
+        return [await cache.get_or_compute("q", compute) for _ in range(3)]
+
+    first, second, third = asyncio.run(main())
+    assert first is None and second.tolist() == [1.0] and third is second
+    assert cache.stats.misses == 2
@@ -0,0 +1,75 @@
+"""embedding_provider模块的测试：本地哈希嵌入和base64向量解码"""
+
+import asyncio
+import base64
+
+import numpy as np
+
+from augmented.embedding_provider import LocalHashingEmbeddingProvider, decode_embeddings
+
+DOCS = [
+    "the quick brown fox jumps over the lazy dog",
+    "向量检索使用嵌入表示文本",
+    "a fox and a dog",
+    "",
+]
+
+
+def _dense_reference(provider: LocalHashingEmbeddingProvider, texts: list[str]) -> np.ndarray:
+    """按定义构造稠密词频矩阵，用于核对稀疏实现"""
+    matrix = np.zeros((len(texts), provider.n_features), dtype=np.float64)
+    for row, text in enumerate(texts):
+        for feature in provider._features(text):
+            if feature >= 0:
+                matrix[row, feature] += 1
+            else:
+                matrix[row, ~feature] -= 1
+    nonzero = matrix != 0
+    matrix[nonzero] = np.sign(matrix[nonzero]) * (1 + np.log(np.abs(matrix[nonzero])))
+    return matrix
+
+
+def test_embeddings_are_normalized_and_deterministic():
+    provider = LocalHashingEmbeddingProvider(dim=64, n_features=1 << 10)
+    first = provider.embed_sync(DOCS)
+    second = LocalHashingEmbeddingProvider(dim=64, n_features=1 << 10).embed_sync(DOCS)
+    assert first.shape == (4, 64) and first.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(first[:3], axis=1), 1, rtol=1e-5)
+    assert not first[3].any()  # 空文本为零向量
+    np.testing.assert_array_equal(first, second)
+
+
+def test_sparse_embedding_matches_dense_definition():
+    provider = LocalHashingEmbeddingProvider(dim=32, n_features=256).fit(DOCS)
+    dense = _dense_reference(provider, DOCS) * provider._idf
+    expected = dense @ provider._projection
+    norms = np.linalg.norm(expected, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    np.testing.assert_allclose(provider.embed_sync(DOCS), expected / norms, atol=1e-5)
+
+
+def test_fit_accepts_a_stream_and_weights_rare_terms():
+    provider = LocalHashingEmbeddingProvider(dim=32, n_features=1 << 12)
+    provider.fit(text for text in ["common rare", "common", "common"])
+    common = provider._term_row("common")[0]
+    rare = provider._term_row("rare")[0]
+    assert provider._idf[rare].min() > provider._idf[common].max()
+
+
+def test_similar_texts_score_higher():
+    provider = LocalHashingEmbeddingProvider()
+    query, near, far = provider.embed_sync(["brown fox", "the quick brown fox", "向量检索"])
+    assert query @ near > query @ far
+
+
+def test_async_embed_runs_off_the_event_loop():
+    provider = LocalHashingEmbeddingProvider(dim=16, n_features=256)
+    result = asyncio.run(provider.embed(["hello world"]))
+    np.testing.assert_array_equal(result, provider.embed_sync(["hello world"]))
+
+
+def test_decode_base64_and_float_lists():
+    vectors = np.arange(6, dtype="<f4").reshape(2, 3)
+    raw = [base64.b64encode(row.tobytes()).decode() for row in vectors]
+    np.testing.assert_array_equal(decode_embeddings(raw), vectors)
+    np.testing.assert_array_equal(decode_embeddings(vectors.tolist()), vectors)
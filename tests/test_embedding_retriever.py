@@ -0,0 +1,61 @@
+"""embedding_retriever模块的测试：带截止时间的检索及其降级路径"""
+
+import asyncio
+
+import numpy as np
+
+from augmented.embedding_provider import LocalHashingEmbeddingProvider
+from augmented.embedding_retriever import EembeddingRetriever
+from augmented.vector_store import VectorStoreItem
+
+DOCUMENTS = ["python asyncio event loop", "numpy vector math", "banana bread recipe"]
+
+
+class _RaisingProvider:
+    async def embed(self, texts: list[str]) -> np.ndarray | None:
+        raise ConnectionError("provider down")
+
+
+class _SlowProvider:
+    async def embed(self, texts: list[str]) -> np.ndarray | None:
+        await asyncio.sleep(1)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def _retriever(provider) -> EembeddingRetriever:
+    retriever = EembeddingRetriever("test", provider=provider)
+    retriever.vector_store.add_many(
+        VectorStoreItem(embedding=np.ones(4, dtype=np.float32), document=d) for d in DOCUMENTS
+    )
+    return retriever
+
+
+def test_provider_error_falls_back_to_lexical_search():
+    retriever = _retriever(_RaisingProvider())
+    result = asyncio.run(retriever.retrieve_with_deadline("banana", top_k=1))
+    assert result.degraded and result.reason == "embedding_failed"
+    assert [i.document for i in result.items] == ["banana bread recipe"]
+    assert retriever.slo_stats.embedding_failures == 1
+
+
+def test_timeout_falls_back_to_lexical_search():
+    retriever = _retriever(_SlowProvider())
+    result = asyncio.run(retriever.retrieve_with_deadline("numpy", top_k=1, timeout_s=0.01))
+    assert result.degraded and result.reason == "timeout"
+    assert [i.document for i in result.items] == ["numpy vector math"]
+
+
+def test_successful_embedding_uses_vector_search():
+    provider = LocalHashingEmbeddingProvider(dim=64)
+    retriever = EembeddingRetriever("local", provider=provider)
+
+    async def main():
+        embeddings = await retriever.embed_batch(DOCUMENTS)
+        retriever.vector_store.add_many(
+            VectorStoreItem(embedding=e, document=d) for d, e in zip(DOCUMENTS, embeddings)
+        )
+        return await retriever.retrieve_with_deadline("asyncio event loop", top_k=1)
+
+    result = asyncio.run(main())
+    assert not result.degraded
+    assert [i.document for i in result.items] == ["python asyncio event loop"]
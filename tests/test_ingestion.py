@@ -0,0 +1,51 @@
+"""ingestion模块的测试：用本地嵌入提供者跑完整条流水线"""
+
+import asyncio
+from pathlib import Path
+
+import numpy as np
+
+from augmented.chunking import MarkdownChunker
+from augmented.embedding_provider import LocalHashingEmbeddingProvider
+from augmented.embedding_retriever import EembeddingRetriever
+from augmented.ingestion import IngestionService
+
+
+def _write_docs(directory: Path, count: int) -> list[Path]:
+    paths = []
+    for i in range(count):
+        path = directory / f"doc{i}.md"
+        path.write_text(f"# Doc {i}\n\n" + f"段落{i}。\n\n" * 20, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def test_ingest_embeds_and_stores_every_chunk(tmp_path: Path):
+    retriever = EembeddingRetriever("local", provider=LocalHashingEmbeddingProvider(dim=32))
+    service = IngestionService(
+        retriever, chunker=MarkdownChunker(max_tokens=16, overlap_tokens=0), batch_size=4
+    )
+    stats = asyncio.run(service.ingest(_write_docs(tmp_path, 3)))
+    assert stats.files_read == 3
+    assert stats.chunks > 3 and stats.chunks_stored == stats.chunks
+    assert stats.batches_failed == 0
+    assert len(retriever.vector_store.items) == stats.chunks
+
+
+def test_failed_batches_are_counted_and_skipped(tmp_path: Path):
+    class FlakyProvider:
+        calls = 0
+
+        async def embed(self, texts: list[str]) -> np.ndarray | None:
+            FlakyProvider.calls += 1
+            if FlakyProvider.calls % 2:
+                return None
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    retriever = EembeddingRetriever("flaky", provider=FlakyProvider())
+    service = IngestionService(
+        retriever, chunker=MarkdownChunker(max_tokens=16, overlap_tokens=0), batch_size=2
+    )
+    stats = asyncio.run(service.ingest(_write_docs(tmp_path, 2)))
+    assert stats.batches_failed > 0 and stats.batches_embedded > 0
+    assert stats.chunks_stored < stats.chunks
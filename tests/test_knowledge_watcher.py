@@ -0,0 +1,123 @@
+"""knowledge_watcher模块的测试：轮询和inotify两种模式下的增量索引"""
+
+import asyncio
+from pathlib import Path
+import time
+
+import pytest
+
+from augmented.chunking import MarkdownChunker
+from augmented.embedding_provider import LocalHashingEmbeddingProvider
+from augmented.embedding_retriever import EembeddingRetriever
+from augmented.knowledge_watcher import KnowledgeBaseWatcher, _Inotify
+
+
+def _inotify_available(directory: Path) -> bool:
+    inotify = _Inotify.open(directory)
+    if inotify is None:
+        return False
+    inotify.close()
+    return True
+
+
+def _watcher(directory: Path, use_inotify: bool) -> KnowledgeBaseWatcher:
+    retriever = EembeddingRetriever("local", provider=LocalHashingEmbeddingProvider(dim=32))
+    return KnowledgeBaseWatcher(
+        directory,
+        retriever,
+        chunker=MarkdownChunker(max_tokens=32, overlap_tokens=0),
+        debounce_s=0.05,
+        poll_interval_s=0.05,
+        use_inotify=use_inotify,
+    )
+
+
+def _documents(watcher: KnowledgeBaseWatcher) -> dict[str, str]:
+    """来源文件名 -> 该文件在向量存储中的全部文本"""
+    documents: dict[str, str] = {}
+    for item in watcher.retriever.vector_store.items:
+        name = Path(item.source).name
+        documents[name] = documents.get(name, "") + item.document
+    return documents
+
+
+async def _until(condition, timeout_s: float = 3.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.parametrize("use_inotify", [False, True], ids=["polling", "inotify"])
+def test_create_modify_delete(tmp_path: Path, use_inotify: bool):
+    if use_inotify and not _inotify_available(tmp_path):
+        pytest.skip("inotify unavailable")
+    (tmp_path / "a.md").write_text("alpha", encoding="utf-8")
+    (tmp_path / "ignored.txt").write_text("not indexed", encoding="utf-8")
+    watcher = _watcher(tmp_path, use_inotify)
+
+    async def main():
+        await watcher.start()
+        try:
+            assert (watcher._inotify is not None) is use_inotify
+            assert _documents(watcher) == {"a.md": "alpha"}  # 启动时的全量同步
+
+            (tmp_path / "b.md").write_text("beta", encoding="utf-8")
+            await _until(lambda: "b.md" in _documents(watcher))
+            (tmp_path / "a.md").write_text("alpha two", encoding="utf-8")
+            await _until(lambda: _documents(watcher).get("a.md") == "alpha two")
+            (tmp_path / "b.md").unlink()
+            await _until(lambda: "b.md" not in _documents(watcher))
+        finally:
+            await watcher.stop()
+
+    asyncio.run(main())
+    assert _documents(watcher) == {"a.md": "alpha two"}
+    assert watcher.stats.files_removed == 1 and watcher.stats.errors == 0
+
+
+def test_debounce_coalesces_rapid_writes(tmp_path: Path):
+    if not _inotify_available(tmp_path):
+        pytest.skip("inotify unavailable")
+    watcher = _watcher(tmp_path, use_inotify=True)
+    watcher.debounce_s = 0.2
+    path = tmp_path / "a.md"
+
+    async def main():
+        await watcher.start()
+        try:
+            for i in range(5):
+                path.write_text(f"version {i}", encoding="utf-8")
+                await asyncio.sleep(0.02)
+            await _until(lambda: _documents(watcher).get("a.md") == "version 4")
+            await asyncio.sleep(0.3)
+        finally:
+            await watcher.stop()
+
+    asyncio.run(main())
+    assert watcher.stats.events >= 5
+    assert watcher.stats.files_indexed == 1  # 连续写入只重新嵌入一次
+
+
+def test_deleted_directory_falls_back_to_polling(tmp_path: Path):
+    directory = tmp_path / "kb"
+    directory.mkdir()
+    if not _inotify_available(directory):
+        pytest.skip("inotify unavailable")
+    (directory / "a.md").write_text("alpha", encoding="utf-8")
+    watcher = _watcher(directory, use_inotify=True)
+
+    async def main():
+        await watcher.start()
+        try:
+            (directory / "a.md").unlink()
+            directory.rmdir()
+            await _until(lambda: watcher._inotify is None and not _documents(watcher))
+            # 目录恢复后由轮询继续索引
+            directory.mkdir()
+            (directory / "b.md").write_text("beta", encoding="utf-8")
+            await _until(lambda: _documents(watcher) == {"b.md": "beta"})
+        finally:
+            await watcher.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""llm_router模块的测试：故障转移、对冲、熔断和不可重试错误"""
+
+import asyncio
+import types as pytypes
+
+import httpx
+import openai
+import pytest
+
+from augmented.circuit_breaker import CircuitBreaker, CircuitOpenError
+from augmented.llm_router import EndpointRouter, LLMEndpoint
+from fakes import FakeStream, text_response
+
+_REQUEST = httpx.Request("POST", "https://llm.example.com/v1/chat/completions")
+
+
+def _status_error(status):
+    response = httpx.Response(status, request=_REQUEST)
+    return openai.APIStatusError(f"status {status}", response=response, body=None)
+
+
+class _FakeEndpointClient:
+    """按顺序返回脚本中的结果：异常直接抛出，数字表示首个块之前的延迟（秒）"""
+
+    def __init__(self, endpoint, *script):
+        self.script = list(script)
+        self.calls = 0
+        self.closed = 0
+        endpoint.client = pytypes.SimpleNamespace(
+            chat=pytypes.SimpleNamespace(completions=pytypes.SimpleNamespace(create=self.create))
+        )
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        step = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(step, BaseException):
+            raise step
+        stream = FakeStream(text_response("ok"), delay=step)
+        original_close = stream.close
+
+        async def close():
+            self.closed += 1
+            await original_close()
+
+        stream.close = close
+        return stream
+
+
+def _router(*scripts, threshold=5, **kwargs):
+    endpoints = [
+        LLMEndpoint(
+            base_url=f"https://llm{i}.example.com/v1",
+            breaker=CircuitBreaker(failure_threshold=threshold),
+        )
+        for i in range(len(scripts))
+    ]
+    clients = [_FakeEndpointClient(e, *script) for e, script in zip(endpoints, scripts)]
+    return EndpointRouter(endpoints, **kwargs), clients
+
+
+async def _content(router):
+    async with await router.stream(model="m", messages=[], stream=True) as stream:
+        chunks = [chunk async for chunk in stream]
+    return stream.endpoint, chunks
+
+
+def test_fails_over_on_retryable_errors():
+    router, clients = _router([_status_error(503)], [0.0])
+    endpoint, chunks = asyncio.run(_content(router))
+    assert endpoint is router.endpoints[1] and chunks
+    assert (router.stats.failovers, router.stats.failures) == (1, 1)
+    assert router.endpoints[0].error_rate > 0
+    assert [c.calls for c in clients] == [1, 1]
+
+
+def test_non_retryable_errors_do_not_fail_over_or_open_breakers():
+    router, clients = _router([_status_error(400)], [0.0], threshold=2)
+
+    async def main():
+        for _ in range(5):
+            with pytest.raises(openai.APIStatusError):
+                await router.stream(model="m", messages=[], stream=True)
+
+    asyncio.run(main())
+    assert [c.calls for c in clients] == [5, 0]
+    assert all(e.breaker.state == "closed" and e.breaker.available for e in router.endpoints)
+    assert (router.stats.failovers, router.stats.failures) == (0, 0)
+
+
+def test_hedges_slow_primary_and_cancels_loser():
+    router, clients = _router([0.5], [0.0], hedge_delay_s=0.05)
+    endpoint, _ = asyncio.run(_content(router))
+    assert endpoint is router.endpoints[1]
+    assert (router.stats.hedges, router.stats.hedge_wins) == (1, 1)
+    assert clients[0].closed == 1  # 落败的请求被取消并关闭
+    assert router.endpoints[0].ttft_samples  # 落败方的等待时长计入样本
+    assert router.endpoints[0].breaker.available
+
+
+def test_open_breakers_are_skipped():
+    router, clients = _router([_status_error(503)], [_status_error(503)], threshold=1)
+
+    async def main():
+        with pytest.raises(openai.APIStatusError):
+            await router.stream(model="m", messages=[], stream=True)
+        with pytest.raises(CircuitOpenError):
+            await router.stream(model="m", messages=[], stream=True)
+
+    asyncio.run(main())
+    assert [e.breaker.state for e in router.endpoints] == ["open", "open"]
+    assert [c.calls for c in clients] == [1, 1]
@@ -0,0 +1,97 @@
+"""response_cache模块的测试：精确命中、在途合并、发起者失败和语义命中"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from augmented.response_cache import ResponseCache
+
+
+class _FakeProvider:
+    """按文本返回固定向量的嵌入提供者"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    async def embed(self, texts):
+        return np.asarray([self.vectors[t] for t in texts], dtype=np.float32)
+
+
+def _messages(question):
+    return [{"role": "system", "content": "sys"}, {"role": "user", "content": question}]
+
+
+def _response(content, tool_calls=()):
+    return SimpleNamespace(content=content, tool_calls=list(tool_calls))
+
+
+def test_exact_hit_after_put():
+    async def main():
+        cache = ResponseCache()
+        key, cached = await cache.get("m", _messages("hi"), None)
+        assert cached is None
+        cache.put(key, _response("hello"))
+        _, cached = await cache.get("m", _messages("hi"), None)
+        _, other = await cache.get("other-model", _messages("hi"), None)
+        return cache, cached, other
+
+    cache, cached, other = asyncio.run(main())
+    assert cached.content == "hello" and other is None
+    assert (cache.stats.misses, cache.stats.exact_hits) == (2, 1)
+
+
+def test_concurrent_requests_wait_for_the_leader():
+    async def main():
+        cache = ResponseCache()
+        key, leader = await cache.get("m", _messages("hi"), None)
+        waiter = asyncio.ensure_future(cache.get("m", _messages("hi"), None))
+        await asyncio.sleep(0)
+        cache.put(key, _response("hello"))
+        return cache, leader, await waiter
+
+    cache, leader, (_, shared) = asyncio.run(main())
+    assert leader is None and shared.content == "hello"
+    assert (cache.stats.misses, cache.stats.coalesced) == (1, 1)
+
+
+def test_waiter_becomes_leader_when_leader_releases():
+    async def main():
+        cache = ResponseCache()
+        key, _ = await cache.get("m", _messages("hi"), None)
+        waiter = asyncio.ensure_future(cache.get("m", _messages("hi"), None))
+        await asyncio.sleep(0)
+        cache.release(key)
+        return cache, await waiter
+
+    cache, (_, response) = asyncio.run(main())
+    assert response is None  # 等待者成为新的发起者
+    assert (cache.stats.misses, cache.stats.coalesced) == (2, 0)
+
+
+def test_semantic_hit_skips_tool_call_responses():
+    provider = _FakeProvider(
+        {
+            "what is mcp": [1.0, 0.0],
+            "what's mcp": [0.99, 0.1],
+            "list files": [0.0, 1.0],
+            "list the files": [0.1, 0.99],
+            "unrelated": [-1.0, 0.0],
+        }
+    )
+
+    async def main():
+        cache = ResponseCache(semantic_threshold=0.95, provider=provider)
+        key, _ = await cache.get("m", _messages("what is mcp"), None)
+        cache.put(key, _response("a protocol"))
+        key, _ = await cache.get("m", _messages("list files"), None)
+        cache.put(key, _response(None, tool_calls=[{"id": "call_1"}]))
+        return [
+            (await cache.get("m", _messages(q), None))[1]
+            for q in ("what's mcp", "list the files", "unrelated")
+        ], cache
+
+    (similar, tool_call, unrelated), cache = asyncio.run(main())
+    assert similar.content == "a protocol"
+    assert tool_call is None and unrelated is None
+    assert cache.stats.semantic_hits == 1
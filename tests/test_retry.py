@@ -0,0 +1,56 @@
+"""retry模块的测试：可重试错误的判断和退避时间"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import openai
+import pytest
+
+from augmented.retry import RetryPolicy, retry_after_s
+
+_REQUEST = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+
+
+def _status_error(status, headers=None):
+    response = httpx.Response(status, headers=headers, request=_REQUEST)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+@pytest.mark.parametrize(
+    "err, retryable",
+    [
+        (_status_error(429), True),
+        (_status_error(408), True),
+        (_status_error(503), True),
+        (_status_error(400), False),
+        (_status_error(401), False),
+        (openai.APIConnectionError(request=_REQUEST), True),
+        (openai.APITimeoutError(request=_REQUEST), True),
+        (httpx.ReadError("reset"), True),
+        (openai.APIError("stream error", request=_REQUEST, body=None), True),
+        (ValueError("bad"), False),
+    ],
+)
+def test_is_retryable(err, retryable):
+    assert RetryPolicy.is_retryable(err) is retryable
+
+
+def test_retry_after_headers():
+    assert retry_after_s(_status_error(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_s(_status_error(429, {"retry-after": "3"})) == 3
+    assert retry_after_s(_status_error(429, {"retry-after": "soon"})) is None
+    assert retry_after_s(_status_error(429)) is None
+    assert retry_after_s(ValueError()) is None
+    when = datetime.now(timezone.utc) + timedelta(seconds=60)
+    seconds = retry_after_s(_status_error(503, {"retry-after": format_datetime(when, usegmt=True)}))
+    assert 55 < seconds <= 60
+
+
+def test_delay_uses_full_jitter_and_respects_retry_after():
+    policy = RetryPolicy(base_delay_s=0.5, max_delay_s=4)
+    err = _status_error(503)
+    for attempt in range(6):
+        assert 0 <= policy.delay(attempt, err) <= min(4, 0.5 * 2**attempt)
+    assert policy.delay(0, _status_error(429, {"retry-after": "2"})) == 2
+    assert policy.delay(0, _status_error(429, {"retry-after": "60"})) is None
@@ -0,0 +1,69 @@
+"""schema_validator模块的测试：常用关键字、bool/int区分和未知关键字放行"""
+
+import pytest
+
+from augmented.schema_validator import compile_schema
+
+
+@pytest.mark.parametrize(
+    "schema, value",
+    [
+        ({"enum": [1]}, True),
+        ({"enum": [True]}, 1),
+        ({"enum": [0, "a"]}, False),
+        ({"const": 1}, True),
+        ({"const": False}, 0),
+        ({"const": [1, 2]}, [True, 2]),
+        ({"const": {"a": 1}}, {"a": True}),
+    ],
+)
+def test_enum_and_const_distinguish_bool_from_int(schema, value):
+    assert compile_schema(schema)(value, "$")
+
+
+@pytest.mark.parametrize(
+    "schema, value",
+    [
+        ({"enum": [1, "a"]}, 1),
+        ({"enum": [1]}, 1.0),
+        ({"enum": [True]}, True),
+        ({"const": None}, None),
+        ({"const": {"a": [1, False]}}, {"a": [1, False]}),
+    ],
+)
+def test_enum_and_const_accept_equal_values(schema, value):
+    assert compile_schema(schema)(value, "$") == []
+
+
+def test_object_schema_reports_paths():
+    validate = compile_schema(
+        {
+            "type": "object",
+            "required": ["path", "limit"],
+            "properties": {
+                "path": {"type": "string", "minLength": 1},
+                "limit": {"type": "integer", "minimum": 1},
+                "tags": {"type": "array", "items": {"type": "string"}},
+            },
+            "additionalProperties": False,
+        }
+    )
+    assert validate({"path": "a", "limit": 3, "tags": ["x"]}, "$") == []
+    assert validate({"path": "", "limit": True, "tags": [1], "x": 0}, "$") == [
+        "$.path: must have at least 1 characters",
+        "$.limit: expected integer, got boolean",
+        "$.tags[0]: expected string, got integer",
+        "$: unexpected property 'x'",
+    ]
+    assert validate({}, "$") == [
+        "$: missing required property 'path'",
+        "$: missing required property 'limit'",
+    ]
+
+
+def test_combinators_and_unknown_keywords():
+    validate = compile_schema({"anyOf": [{"type": "string"}, {"type": "null"}]})
+    assert validate(None, "$") == []
+    assert validate(1, "$") == ["$: does not match any schema in anyOf"]
+    assert compile_schema({"$ref": "#/defs/x", "format": "uri"})(1, "$") == []
+    assert compile_schema({"pattern": "("})("x", "$") == []
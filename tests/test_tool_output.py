@@ -0,0 +1,59 @@
+"""tool_output模块的测试：文本提取、HTML转换、截断和产物落盘"""
+
+import asyncio
+import base64
+from pathlib import Path
+from types import SimpleNamespace
+
+from augmented.chunking import estimate_tokens
+from augmented.tool_output import DEFAULT_ARTIFACT_DIR, ToolOutputCompactor
+
+
+def _result(*content, is_error=False):
+    return SimpleNamespace(content=list(content), isError=is_error)
+
+
+def _text(text):
+    return SimpleNamespace(type="text", text=text)
+
+
+def test_default_artifact_dir_is_outside_the_project():
+    project_root = Path(__file__).resolve().parents[1]
+    assert not DEFAULT_ARTIFACT_DIR.resolve().is_relative_to(project_root)
+
+
+def test_extracts_text_and_converts_html():
+    html = "<html><head><script>x()</script></head><body><p>Hello</p><p>world</p></body></html>"
+    text = asyncio.run(ToolOutputCompactor().compact("fetch", _result(_text("a"), _text(html))))
+    assert text == "a\n\nHello\n\nworld"
+
+
+def test_marks_errors():
+    text = asyncio.run(ToolOutputCompactor().compact("t", _result(is_error=True)))
+    assert text == "Error: tool `t` failed"
+
+
+def test_truncates_long_text_and_saves_full_output(tmp_path):
+    long_text = " ".join(f"w{i}" for i in range(1000))
+    compactor = ToolOutputCompactor(max_tokens=100, artifact_dir=tmp_path)
+    text = asyncio.run(compactor.compact("web/fetch", _result(_text(long_text))))
+
+    assert text.startswith("w0 w1") and text.endswith("w999")
+    assert estimate_tokens(text) < 150
+    [artifact] = tmp_path.iterdir()
+    assert artifact.name.startswith("web_fetch-") and artifact.suffix == ".txt"
+    assert artifact.read_text() == long_text
+    assert f"full output saved to {artifact}" in text
+
+
+def test_binary_content_is_saved_or_omitted(tmp_path):
+    image = SimpleNamespace(
+        type="image", data=base64.b64encode(b"\x89PNG").decode(), mimeType="image/png"
+    )
+    text = asyncio.run(ToolOutputCompactor(artifact_dir=tmp_path).compact("shot", _result(image)))
+    [artifact] = tmp_path.iterdir()
+    assert artifact.suffix == ".png" and artifact.read_bytes() == b"\x89PNG"
+    assert text == f"[image image/png, 4 bytes saved to {artifact}]"
+
+    text = asyncio.run(ToolOutputCompactor().compact("shot", _result(image)))
+    assert text == "[image image/png, 4 bytes omitted]"
@@ -0,0 +1,54 @@
+"""tool_registry模块的测试：名称冲突加前缀、路由和校验函数缓存"""
+
+from augmented.tool_registry import ToolRegistry
+
+from fakes import FakeMCP, _SimpleTool
+
+
+def _client(name, tools):
+    client = FakeMCP(name, [])
+    client.tools = [_SimpleTool(tool, schema) for tool, schema in tools.items()]
+    return client
+
+
+def test_colliding_tool_names_get_server_prefix():
+    fs = _client("file system", {"read": None, "list": None})
+    web = _client("web", {"read": None, "fetch": None})
+    registry = ToolRegistry()
+    registry.build([fs, web])
+
+    assert sorted(t.name for t in registry.tools) == [
+        "fetch",
+        "file_system__read",
+        "list",
+        "web__read",
+    ]
+    route = registry.resolve("web__read")
+    assert route.client is web and route.tool_name == "read"
+    assert registry.resolve("list").client is fs
+    assert registry.resolve("read") is None
+    assert fs.tools[0].name == "read"  # 原始工具定义不被修改
+
+
+def test_validate_uses_input_schema():
+    schema = {"type": "object", "required": ["mode"], "properties": {"mode": {"enum": [1, 2]}}}
+    registry = ToolRegistry()
+    registry.build([_client("srv", {"set": schema})])
+    route = registry.resolve("set")
+    assert registry.validate(route, {"mode": 1}) == []
+    assert registry.validate(route, {"mode": True}) == ["$.mode: must be one of [1, 2]"]
+    assert registry.validate(route, {}) == ["$: missing required property 'mode'"]
+
+
+def test_rebuild_reuses_validators_for_unchanged_schemas():
+    schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+    client = _client("srv", {"search": schema})
+    registry = ToolRegistry()
+    registry.build([client])
+    validator = registry.resolve("search").validator
+
+    client.tools = [_SimpleTool("search", dict(schema)), _SimpleTool("other")]
+    registry.build([client])
+    assert registry.version == 2
+    assert len(registry) == 2
+    assert registry.resolve("search").validator is validator
@@ -0,0 +1,66 @@
+"""tool_result_cache模块的测试：按工具启用、副作用工具不缓存、并发合并和TTL"""
+
+import asyncio
+from types import SimpleNamespace
+
+from augmented import tool_result_cache
+from augmented.tool_result_cache import ToolResultCache
+
+
+def _result(text, is_error=False):
+    return SimpleNamespace(content=[text], isError=is_error)
+
+
+def test_ttl_only_for_configured_read_only_tools():
+    cache = ToolResultCache(ttl_s={"search": 60, "srv/fetch": 30, "write_file": 60})
+    read_only = SimpleNamespace(annotations=SimpleNamespace(readOnlyHint=True))
+    destructive = SimpleNamespace(annotations=SimpleNamespace(destructiveHint=True))
+
+    assert cache.ttl_for("any", read_only, "search") == 60
+    assert cache.ttl_for("srv", None, "fetch") == 30
+    assert cache.ttl_for("other", None, "fetch") is None
+    assert cache.ttl_for("srv", None, "write_file") is None
+    assert cache.ttl_for("srv", destructive, "search") is None
+
+
+def test_concurrent_calls_are_coalesced_and_cached():
+    cache = ToolResultCache(ttl_s={"search": 60})
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return _result("ok")
+
+    async def main():
+        results = await asyncio.gather(
+            *(cache.get_or_call("srv", "search", {"q": "x", "n": 1}, 60, call) for _ in range(5))
+        )
+        # 参数顺序不同也命中同一条缓存
+        again = await cache.get_or_call("srv", "search", {"n": 1, "q": "x"}, 60, call)
+        return results, again
+
+    results, again = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results) and again is results[0]
+    assert (cache.stats.misses, cache.stats.coalesced, cache.stats.hits) == (1, 4, 1)
+
+
+def test_errors_are_not_cached_and_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tool_result_cache.time, "time", lambda: now[0])
+    cache = ToolResultCache(ttl_s={"search": 60})
+    responses = [_result("boom", is_error=True), _result("a"), _result("b")]
+
+    async def call():
+        return responses.pop(0)
+
+    async def get():
+        return await cache.get_or_call("srv", "search", {}, 60, call)
+
+    assert asyncio.run(get()).isError
+    assert cache.stats.uncacheable == 1
+    assert asyncio.run(get()).content == ["a"]
+    assert asyncio.run(get()).content == ["a"]
+    now[0] += 61
+    assert asyncio.run(get()).content == ["b"]
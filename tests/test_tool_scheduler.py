@@ -0,0 +1,69 @@
+"""tool_scheduler模块的测试：按会话轮转分配并发名额"""
+
+import asyncio
+
+from augmented.tool_scheduler import FairSlots, FairToolScheduler
+
+
+def test_waiting_sessions_are_served_round_robin():
+    async def main():
+        slots = FairSlots(1)
+        order: list[str] = []
+
+        async def job(session: str) -> None:
+            await slots.acquire(session)
+            try:
+                order.append(session)
+                await asyncio.sleep(0.001)
+            finally:
+                slots.release()
+
+        tasks = [asyncio.create_task(job("A")) for _ in range(4)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(job("B")) for _ in range(2)]
+        await asyncio.gather(*tasks)
+        return slots, "".join(order)
+
+    slots, order = asyncio.run(main())
+    assert order == "AABABA"  # B不必等A的所有调用都完成
+    assert slots.in_use == 0 and slots.waiting == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def main():
+        slots = FairSlots(1)
+        await slots.acquire("A")
+        waiter = asyncio.create_task(slots.acquire("B"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert slots.waiting == 0
+        slots.release()
+        await asyncio.wait_for(slots.acquire("C"), 1)  # 名额已归还
+        return slots.in_use
+
+    assert asyncio.run(main()) == 1
+
+
+def test_scheduler_enforces_per_client_and_global_limits():
+    async def main():
+        scheduler = FairToolScheduler(max_concurrent=3, max_concurrent_per_client=2)
+        clients = [object(), object()]
+        running: dict[int, int] = {0: 0, 1: 0}
+        peaks = {"total": 0, 0: 0, 1: 0}
+
+        async def call(session: str, client: int) -> None:
+            async with scheduler.slot(session, clients[client]):
+                running[client] += 1
+                peaks[client] = max(peaks[client], running[client])
+                peaks["total"] = max(peaks["total"], sum(running.values()))
+                await asyncio.sleep(0.005)
+                running[client] -= 1
+
+        await asyncio.gather(
+            *(call(f"s{i % 3}", i % 2) for i in range(12))
+        )
+        return peaks
+
+    peaks = asyncio.run(main())
+    assert peaks["total"] <= 3 and peaks[0] <= 2 and peaks[1] <= 2
@@ -0,0 +1,77 @@
+"""tool_selector模块的测试：top-n挑选、必须包含的工具和嵌入失败时的退回"""
+
+import asyncio
+
+import numpy as np
+
+from augmented.tool_selector import ToolSelector
+from fakes import _SimpleTool
+
+
+class _KeywordProvider:
+    """按关键词生成向量的嵌入提供者，fail为True时模拟失败"""
+
+    keywords = ("weather", "file", "search", "email", "calendar")
+
+    def __init__(self):
+        self.fail = False
+        self.batches = []
+
+    async def embed(self, texts):
+        self.batches.append(list(texts))
+        if self.fail:
+            return None
+        return np.asarray(
+            [[float(k in text.lower()) + 0.01 for k in self.keywords] for text in texts],
+            dtype=np.float32,
+        )
+
+
+def _tools():
+    return [_SimpleTool(f"{k}_tool") for k in _KeywordProvider.keywords]
+
+
+def _select(selector, messages, tools=None):
+    return [t.name for t in asyncio.run(selector.select(tools or _tools(), messages))]
+
+
+def test_selects_top_n_in_original_order():
+    selector = ToolSelector(provider=_KeywordProvider(), top_n=2)
+    messages = [{"role": "user", "content": "search my email"}]
+    assert _select(selector, messages) == ["search_tool", "email_tool"]
+
+
+def test_always_include_and_used_tools_are_kept():
+    selector = ToolSelector(provider=_KeywordProvider(), top_n=1, always_include={"file_tool"})
+    messages = [
+        {"role": "user", "content": "what's on my calendar"},
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {"id": "1", "type": "function", "function": {"name": "weather_tool", "arguments": "{}"}}
+            ],
+        },
+        {"role": "tool", "tool_call_id": "1", "content": "sunny"},
+        {"role": "user", "content": "calendar please"},
+    ]
+    assert _select(selector, messages) == ["weather_tool", "file_tool", "calendar_tool"]
+
+
+def test_falls_back_to_all_tools():
+    provider = _KeywordProvider()
+    selector = ToolSelector(provider=provider, top_n=2)
+    all_names = [t.name for t in _tools()]
+    assert _select(selector, []) == all_names  # 没有对话内容
+    provider.fail = True
+    assert _select(selector, [{"role": "user", "content": "email"}]) == all_names
+    assert _select(ToolSelector(provider=provider, top_n=10), [{"role": "user", "content": "x"}]) == all_names
+
+
+def test_tool_descriptions_are_embedded_once():
+    provider = _KeywordProvider()
+    selector = ToolSelector(provider=provider, top_n=2)
+    messages = [{"role": "user", "content": "email"}]
+    _select(selector, messages)
+    _select(selector, messages)
+    assert [len(batch) for batch in provider.batches] == [5, 1, 1]  # 第二次只嵌入查询
@@ -0,0 +1,33 @@
+"""usage模块的测试：用量累加、派生指标、费用和预算判断"""
+
+import pytest
+
+from augmented.usage import TokenPricing, UsageBudget, UsageStats
+
+
+def test_add_accumulates_and_derives_rates():
+    total = UsageStats()
+    total.add(UsageStats(calls=1, prompt_tokens=100, completion_tokens=20, total_tokens=120,
+                         ttft_s=0.2, generation_s=1.0))
+    total.add(UsageStats(calls=1, prompt_tokens=50, completion_tokens=30, total_tokens=80,
+                         ttft_s=0.4, generation_s=1.5, estimated=True))
+    assert (total.calls, total.total_tokens, total.estimated) == (2, 200, True)
+    assert total.avg_ttft_s == pytest.approx(0.3)
+    assert total.tokens_per_second == pytest.approx(20)
+    assert UsageStats().avg_ttft_s == UsageStats().tokens_per_second == 0
+
+
+def test_pricing_cost():
+    pricing = TokenPricing(prompt_per_million=2.5, completion_per_million=10)
+    assert pricing.cost(1_000_000, 100_000) == pytest.approx(3.5)
+
+
+def test_budget_exceeded_and_remaining():
+    budget = UsageBudget(max_tokens=1000, max_cost_usd=0.5, max_duration_s=10)
+    assert budget.exceeded(UsageStats(total_tokens=999, cost_usd=0.1), 9.9) == ""
+    assert budget.exceeded(UsageStats(total_tokens=1000), 0) == "tokens"
+    assert budget.exceeded(UsageStats(cost_usd=0.5), 0) == "cost"
+    assert budget.exceeded(UsageStats(), 10) == "duration"
+    assert budget.remaining_s(4) == 6 and budget.remaining_s(12) == 0
+    assert UsageBudget().remaining_s(100) is None
+    assert UsageBudget().exceeded(UsageStats(total_tokens=10**9), 10**9) == ""
@@ -0,0 +1,60 @@
+"""vector_store模块的测试：向量检索、MMR以及随写入同步更新的词法索引"""
+
+import numpy as np
+
+from augmented.lexical_index import BM25Index
+from augmented.vector_store import VectorStore, VectorStoreItem
+
+
+def _item(document: str, source: str = "", vector: list[float] | None = None) -> VectorStoreItem:
+    return VectorStoreItem(embedding=np.asarray(vector or [1.0, 0.0]), document=document, source=source)
+
+
+def test_search_orders_by_cosine_similarity():
+    store = VectorStore().add_many(
+        [_item("x", vector=[1, 0]), _item("y", vector=[0, 1]), _item("xy", vector=[1, 1])]
+    )
+    assert [i.document for i in store.search([1, 0.1], top_k=2)] == ["x", "xy"]
+
+
+def test_mmr_prefers_diverse_results():
+    store = VectorStore().add_many(
+        [_item("a", vector=[1, 0]), _item("a2", vector=[1, 0.01]), _item("b", vector=[0.6, 0.8])]
+    )
+    results = store.search_mmr([1, 0.2], top_k=2, fetch_k=3, lambda_mult=0.3)
+    assert [i.document for i in results] == ["a2", "b"]
+
+
+def test_lexical_index_tracks_writes_without_rebuilding():
+    store = VectorStore()
+    store.add_many([_item("apple pie recipe", "a.md"), _item("banana bread", "b.md")])
+    store.add(_item("cherry tart", "c.md"))
+    store.replace_source("a.md", [_item("apple crumble", "a.md")])
+    assert store.remove_source("b.md") == 1
+
+    # 写入后索引已与当前列表对应，检索时不需要重建
+    assert store._lexical is not None and store._lexical[0] is store.items
+    assert [i.document for i in store.search_lexical("apple")] == ["apple crumble"]
+    assert [i.document for i in store.search_lexical("cherry")] == ["cherry tart"]
+    assert store.search_lexical("banana") == []
+
+
+def test_incremental_index_matches_full_rebuild():
+    store = VectorStore()
+    for n in range(6):
+        store.add(_item(f"doc {n} shared words number{n}", f"s{n % 3}"))
+    store.replace_source("s1", [_item("replacement shared", "s1")])
+    store.remove_source("s2")
+
+    rebuilt = BM25Index()
+    for item in store.items:
+        rebuilt.add(item.document)
+    for query in ["shared", "doc number0", "replacement"]:
+        np.testing.assert_allclose(store._lexical[1].scores(query), rebuilt.scores(query))
+
+
+def test_external_item_changes_are_picked_up():
+    store = VectorStore()
+    store.add(_item("first"))
+    store.items = [_item("second")]
+    assert [i.document for i in store.search_lexical("second")] == ["second"]